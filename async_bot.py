@@ -0,0 +1,105 @@
+import asyncio
+import time
+from waits import AsyncWaiter
+from dropdown import AsyncDropdown
+from steps import run_steps_async
+from playwright.async_api import async_playwright
+from bot import BotBase, SESSION_PATH
+
+
+class AsyncBot(BotBase):
+    """Bot on playwright.async_api: one browser and login, one page per facility in flight
+
+    The facility/route/zip steps are Bot's, run with run_steps_async; the difference is that every facility
+    is synced on its own page, so up to `concurrency` facilities are edited at once while the others wait on
+    the semaphore. Progress and summary callbacks are called exactly as Bot calls them, from the thread
+    running the loop.
+    """
+
+    playwright_api = staticmethod(async_playwright)
+    waiter_class = AsyncWaiter
+    dropdown_class = AsyncDropdown
+
+    def __init__(self, url, filepath, progress_callback=None, summary_callback=None, plan=None, concurrency=4,
+                 session_path=SESSION_PATH):
+        super().__init__(url, filepath, progress_callback, summary_callback, plan, session_path)
+        self.concurrency = concurrency
+        self.semaphore = None
+
+    async def start_browser(self):
+        return await run_steps_async(self._start_browser())
+
+    async def load_page(self):
+        return await run_steps_async(self._load_page())
+
+    async def close_browser(self):
+        await run_steps_async(self._close_browser())
+
+    async def open_page(self):
+        """A new page of the logged-in context on the dashboard"""
+        page = await self.context.new_page()
+        await page.goto(self.url)
+        if not await run_steps_async(self._session_valid(page)):
+            # the SSO button is shown again but goes straight through with the session cookies
+            await run_steps_async(self._log_in(page))
+        return page
+
+    def _go_to_facility(self, page, country, serviceArea, facility):
+        # a new page starts from the top, so every facility selects its country and service area again
+        return ((yield from self._select_country(page, country))
+                and (yield from self._select_service_area(page, country, serviceArea))
+                and (yield from self._select_facility(page, serviceArea, facility)))
+
+    async def sync_facility(self, country, serviceArea, facility, routes):
+        """Sync one facility on its own page; returns the routes added, or None if the facility was not reached"""
+        async with self.semaphore:
+            page = await self.open_page()
+            try:
+                self._send_progress_update(f"Processing facility: {facility} ({serviceArea})", "info")
+                if not await run_steps_async(self._go_to_facility(page, country, serviceArea, facility)):
+                    return None
+                return await run_steps_async(self._sync_facility(page, serviceArea, facility, routes))
+            except Exception as e:
+                self._send_progress_update(f"❌ Error syncing facility '{facility}': {e}", "error")
+                return None
+            finally:
+                await page.close()
+
+    async def sync_service_area(self, country, serviceArea, facilities):
+        results = await asyncio.gather(*(self.sync_facility(country, serviceArea, fa, routes)
+                                         for fa, routes in facilities.items()))
+        done = [routes for routes in results if routes is not None]
+        self._send_service_area_complete(serviceArea, len(done), sum(done))
+
+    async def sync_plan(self, plan):
+        """Sync every facility of a plan, at most self.concurrency at a time"""
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        started = time.time()
+        await asyncio.gather(*(self.sync_service_area(country, sa, facilities)
+                               for country, serviceAreas in plan.tree.items()
+                               for sa, facilities in serviceAreas.items()))
+        self._send_progress_update(f"Synced {len(plan.tree)} countries in {time.time() - started:.1f}s "
+                                   f"with {self.concurrency} concurrent pages", "info")
+
+    async def bot_main(self):
+        if not await self.start_browser():
+            self._send_progress_update("Failed to start browser", "error")
+            return
+        try:
+            if not await self.load_page():
+                self._send_progress_update("Failed to load page", "error")
+                return
+            await self.sync_plan(self.get_plan())
+            self._send_wait_report()
+            self._send_final_summary()
+        finally:
+            await self.close_browser()
+
+
+def run_async_bot(url, filepath, progress_callback=None, summary_callback=None, plan=None, concurrency=4,
+                  session_path=SESSION_PATH, reconcile=False):
+    """run_bot for the async engine; blocks the calling thread until the sync is done"""
+    bot = AsyncBot(url, filepath, progress_callback, summary_callback, plan, concurrency, session_path)
+    bot.reconcile = reconcile
+    asyncio.run(bot.bot_main())
+    return bot.summary
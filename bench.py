@@ -0,0 +1,601 @@
+import sys
+import os
+import io
+import json
+import time
+import random
+import platform
+import shutil
+import tempfile
+import argparse
+import sqlite3
+import subprocess
+import contextlib
+from openpyxl import Workbook
+from A4GDB import A4GDB, check_query_plans, HOT_QUERIES, parse_att, iter_zip_batches, route_zips, np, SyncPlan, \
+    connect, resolve_db, DB_NAME, workbooks, parse_cached, CACHE_BYTES #DB class
+from chips import add_chips, chip_count
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def make_kt_workbook(path, rows):
+    """Write a synthetic TacticalTours workbook with the columns load_kt reads"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('TacticalTours')
+    header = [f"Col{i}" for i in range(12)]
+    header[0], header[9], header[11] = "Route", "SA", "Facility"
+    ws.append(header)
+    for i in range(rows):
+        row = [None] * 12
+        row[0] = f"R{i:06d}"
+        row[9] = f"S{(i // 5000) % 676:03d}"
+        row[11] = f"F{(i // 500) % 1000:03d}"
+        ws.append(row)
+    wb.save(path)
+
+
+def make_att_workbook(path, rows, width=1, per_route=1):
+    """Write a synthetic ATTPostalCode_SP1 workbook of (route, code1, code2) ranges"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('ATTPostalCode_SP1')
+    ws.append(["Route", "From", "To"])
+    for i in range(rows):
+        code1 = (i * width) % 99000
+        ws.append([f"R{i // per_route:06d}", code1, code1 + width - 1])
+    wb.save(path)
+
+
+def _batch(file, data):
+    return {'file': file, 'rows': len(data), 'data': data, 'seconds': 0.0}
+
+
+@contextlib.contextmanager
+def scratch_dir(prefix="a4g_bench_"):
+    """A temporary folder for workbooks or a scratch A4G.db, removed with its sidecars afterwards"""
+    cwd = os.getcwd()
+    folder = tempfile.mkdtemp(prefix=prefix)
+    try:
+        yield folder
+    finally:
+        # loads chdir into their scratch folder, which Windows can't remove while it is the working directory
+        os.chdir(cwd)
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def bench_compact(rows, width, samples=2000):
+    """Load the same synthetic data into both layouts and compare file size and hot-query latency"""
+    kt = [(f"R{i:06d}", f"S{(i // 5000) % 676:03d}", f"F{(i // 500) % 1000:03d}") for i in range(rows)]
+    att = [(f"R{i:06d}", (i * width) % 99000, (i * width) % 99000 + width - 1) for i in range(rows)]
+    params = {
+        'countries': [()],
+        'service_areas': [("US",)],
+        'facilities': [(sa,) for sa in sorted({r[1] for r in kt})],
+        'facility_routes': [(fac,) for fac in sorted({r[2] for r in kt})],
+        'route_ranges': [(r[0],) for r in kt[::max(1, rows // samples)]],
+        'routes_with_zips': [()],
+    }
+
+    results = []
+    for compact in (False, True):
+        with scratch_dir() as workdir:
+            os.chdir(workdir)
+            db = A4GDB(workdir, workdir, compact=compact)
+            with contextlib.redirect_stdout(io.StringIO()):
+                with db.bulk_load():
+                    db.write_kt(_batch("kt.xlsx", kt))
+                    db.write_att(_batch("att.xlsx", att))
+                db.publish()
+            db.conn.close()
+
+            conn = connect()
+            cur = conn.cursor()
+            latency = {}
+            for name, query in HOT_QUERIES.items():
+                start = time.perf_counter()
+                for p in params[name]:
+                    cur.execute(query, p).fetchall()
+                latency[name] = (time.perf_counter() - start) / len(params[name]) * 1000
+            conn.close()
+            result = {'compact': compact, 'db_bytes': os.path.getsize(resolve_db()), 'latency_ms': latency}
+        results.append(result)
+        print(f"{'compact' if compact else 'plain'}: {result['db_bytes'] / 1024 / 1024:.1f} MB")
+        for name, ms in latency.items():
+            print(f"  {name}: {ms:.3f} ms")
+    return results
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_loader(kind, file, streaming):
+    """Load one workbook into a scratch A4G.db and return timing for this process"""
+    with scratch_dir() as workdir:
+        os.chdir(workdir)
+        # cache_bytes=0 so the child times parsing the workbook, not reading its sidecar
+        db = A4GDB(workdir, workdir, streaming=streaming, cache_bytes=0)
+        start = time.perf_counter()
+        # the loaders print per row; keep the console out of the measurement
+        with contextlib.redirect_stdout(io.StringIO()):
+            if kind == "kt":
+                db.load_kt(file)
+            else:
+                db.load_att(file)
+        elapsed = time.perf_counter() - start
+        db.conn.close()
+    rows = db.load_stats[-1]['rows']
+    return {
+        'kind': kind,
+        'streaming': streaming,
+        'rows': rows,
+        'seconds': elapsed,
+        'rows_per_sec': rows / elapsed if elapsed > 0 else 0.0,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def _mb(value):
+    return "n/a" if value is None else f"{value:.0f} MB"
+
+
+def _run_child(kind, file, streaming):
+    # each mode runs in its own process so peak RSS is not shared between them
+    cmd = [sys.executable, os.path.abspath(__file__), "child", kind, file]
+    if streaming:
+        cmd.append("--streaming")
+    out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def bench_streaming(rows):
+    with scratch_dir("a4g_bench_src_") as folder:
+        files = {
+            'kt': os.path.join(folder, "kt.xlsx"),
+            'att': os.path.join(folder, "att.xlsx"),
+        }
+        print(f"Generating {rows} row workbooks in {folder}...")
+        make_kt_workbook(files['kt'], rows)
+        make_att_workbook(files['att'], rows)
+
+        results = []
+        for kind, file in files.items():
+            legacy = _run_child(kind, file, False)
+            streamed = _run_child(kind, file, True)
+            results.extend([legacy, streamed])
+            print(f"{kind.upper()} full load: {legacy['seconds']:.1f}s "
+                  f"({legacy['rows_per_sec']:,.0f} rows/sec), peak RSS {_mb(legacy['peak_rss_mb'])}")
+            print(f"{kind.upper()} streaming: {streamed['seconds']:.1f}s "
+                  f"({streamed['rows_per_sec']:,.0f} rows/sec), peak RSS {_mb(streamed['peak_rss_mb'])}")
+            print(f"{kind.upper()} speedup: {legacy['seconds'] / streamed['seconds']:.2f}x")
+        return results
+
+
+def bench_expand(codes, width, per_route):
+    """Expand an ATT sheet of `codes` total zips with the per-code loop and the vectorised path"""
+    rows = codes // width
+    with scratch_dir("a4g_bench_src_") as folder:
+        file = os.path.join(folder, "att.xlsx")
+        print(f"Generating {rows} ranges ({rows * width} codes) in {file}...")
+        # overlapping ranges inside a route give the dedup something to do
+        make_att_workbook(file, rows, width, per_route)
+        data = sorted(parse_att(file)['data'])
+
+    start = time.perf_counter()
+    loop = {}
+    for route, code1, code2 in data:
+        zips = loop.setdefault(route, set())
+        for code in range(code1, code2 + 1):
+            zips.add(str(code).zfill(5))
+    loop = {route: sorted(zips) for route, zips in loop.items()}
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorised = dict(iter_zip_batches([(route, code1, code2) for route, code1, code2 in data]))
+    vector_seconds = time.perf_counter() - start
+
+    if vectorised != loop:
+        raise RuntimeError("Vectorised expansion does not match the per-code loop")
+    total = sum(len(zips) for zips in loop.values())
+    engine = "numpy" if np is not None else "pure Python fallback"
+    print(f"{len(loop)} routes, {total} distinct zips")
+    print(f"per-code loop: {loop_seconds:.2f}s ({total / loop_seconds:,.0f} zips/sec)")
+    print(f"vectorised ({engine}): {vector_seconds:.2f}s ({total / vector_seconds:,.0f} zips/sec)")
+    print(f"speedup: {loop_seconds / vector_seconds:.2f}x")
+    return {'routes': len(loop), 'zips': total, 'loop_seconds': loop_seconds, 'vector_seconds': vector_seconds}
+
+
+# zip bands per country: PR 006-009, VI 008 and the US everywhere above them
+ZIP_BANDS = {'US': (1000, 99999), 'PR': (600, 988), 'VI': (801, 851)}
+
+# generator settings for the ingestion suite; every one can be overridden from the command line
+SUITE_DEFAULTS = {
+    'sas': 40,
+    'facilities_per_sa': 5,
+    'routes_per_facility': 20,
+    'ranges_per_route': 4,
+    'range_width': 25,
+    'mix': "US:90,PR:5,VI:5",
+    'kt_files': 2,
+    'att_files': 4,
+    'seed': 1,
+}
+
+
+def parse_mix(mix):
+    """Turn "US:90,PR:5,VI:5" into normalised country weights"""
+    weights = {}
+    for part in mix.split(","):
+        country, _, weight = part.partition(":")
+        country = country.strip().upper()
+        if country not in ZIP_BANDS:
+            raise ValueError(f"Unknown country in mix: {country}")
+        weights[country] = float(weight or 1)
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError(f"Mix has no weight: {mix}")
+    return {country: weight / total for country, weight in weights.items()}
+
+
+def _split(rows, parts):
+    size = -(-len(rows) // max(1, parts))
+    return [rows[i:i + size] for i in range(0, len(rows), size)] or [[]]
+
+
+def generate_dataset(folder, config):
+    """Write synthetic KT and ATT workbooks under folder/KT and folder/ATT; returns (kt_folder, att_folder, counts)"""
+    rng = random.Random(config['seed'])
+    weights = parse_mix(config['mix'])
+    # the country of an SA comes from A4GDB's own lists, so PR and VI reuse the real SA codes
+    named = {'PR': ["PSE", "SJU"], 'VI': ["STT", "STX"]}
+
+    kt, att, countries = [], [], {}
+    facility = route = 0
+    for i in range(config['sas']):
+        country = rng.choices(list(weights), list(weights.values()))[0]
+        sa = named[country][i % 2] if country in named else f"U{i:03d}"
+        countries[country] = countries.get(country, 0) + 1
+        low, high = ZIP_BANDS[country]
+        for _ in range(config['facilities_per_sa']):
+            facility += 1
+            for _ in range(config['routes_per_facility']):
+                route += 1
+                kt.append((f"R{route:06d}", sa, f"F{facility:05d}"))
+                for _ in range(config['ranges_per_route']):
+                    start = rng.randint(low, max(low, high - config['range_width'] + 1))
+                    att.append((f"R{route:06d}", start, min(high, start + config['range_width'] - 1)))
+
+    kt_folder = os.path.join(folder, "KT")
+    att_folder = os.path.join(folder, "ATT")
+    os.makedirs(kt_folder, exist_ok=True)
+    os.makedirs(att_folder, exist_ok=True)
+    for n, part in enumerate(_split(kt, config['kt_files'])):
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet('TacticalTours')
+        header = [f"Col{i}" for i in range(12)]
+        header[0], header[9], header[11] = "Route", "SA", "Facility"
+        ws.append(header)
+        for rt, sa, fac in part:
+            row = [None] * 12
+            row[0], row[9], row[11] = rt, sa, fac
+            ws.append(row)
+        wb.save(os.path.join(kt_folder, f"kt_{n:03d}.xlsx"))
+    for n, part in enumerate(_split(att, config['att_files'])):
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet('ATTPostalCode_SP1')
+        ws.append(["Route", "From", "To"])
+        for row in part:
+            ws.append(list(row))
+        wb.save(os.path.join(att_folder, f"att_{n:03d}.xlsx"))
+
+    counts = {'kt_rows': len(kt), 'att_rows': len(att), 'facilities': facility, 'routes': route,
+              'codes': sum(end - start + 1 for _, start, end in att), 'sas_by_country': countries}
+    return kt_folder, att_folder, counts
+
+
+def time_sync_plan(cur):
+    """Build the SyncPlan Bot.bot_main walks, then expand every route's zips from it"""
+    start = time.perf_counter()
+    plan = SyncPlan.build(cur)
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    zips = sum(len(plan.zips(ranges)) for sas in plan.tree.values() for facilities in sas.values()
+               for routes in facilities.values() for ranges in routes.values())
+    walk = time.perf_counter() - start
+    return {'build_seconds': build, 'walk_seconds': walk, 'seconds': build + walk, 'zips': zips,
+            'json_bytes': len(json.dumps(plan.to_dict())), 'counts': plan.summary()}
+
+
+def time_planning_queries(cur):
+    """Walk the hierarchy with one query per level, the way Bot.bot_main did before SyncPlan"""
+    timings = {name: [0.0, 0] for name in ('countries', 'service_areas', 'facilities', 'facility_routes', 'route_zips')}
+
+    def timed(name, fn):
+        start = time.perf_counter()
+        result = fn()
+        timings[name][0] += time.perf_counter() - start
+        timings[name][1] += 1
+        return result
+
+    zips = 0
+    start = time.perf_counter()
+    for (country,) in timed('countries', lambda: cur.execute(HOT_QUERIES['countries']).fetchall()):
+        for (sa,) in timed('service_areas', lambda: cur.execute(HOT_QUERIES['service_areas'], (country,)).fetchall()):
+            for (fac,) in timed('facilities', lambda: cur.execute(HOT_QUERIES['facilities'], (sa,)).fetchall()):
+                for (rt,) in timed('facility_routes',
+                                   lambda: cur.execute(HOT_QUERIES['facility_routes'], (fac,)).fetchall()):
+                    zips += len(timed('route_zips', lambda: list(route_zips(cur, rt))))
+    total = time.perf_counter() - start
+    queries = {name: {'calls': calls, 'seconds': seconds, 'mean_ms': seconds / calls * 1000 if calls else 0.0}
+               for name, (seconds, calls) in timings.items()}
+    return {'seconds': total, 'zips': zips, 'queries': queries}
+
+
+def run_suite_load(kt_folder, att_folder, workers):
+    """Time kt_files, att_files and the commit of one bulk load into a fresh A4G.db, then the planning walk"""
+    with scratch_dir() as workdir:
+        os.chdir(workdir)
+        return _suite_load(kt_folder, att_folder, workers, workdir)
+
+
+def _suite_load(kt_folder, att_folder, workers, workdir):
+    # cache_bytes=0 so every run measures parsing, not the sidecar cache
+    db = A4GDB(att_folder, kt_folder, workers=workers, cache_bytes=0)
+    phases = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        with db.bulk_load():
+            db.kt_files()
+            phases['kt_files'] = time.perf_counter() - start
+            db.att_files()
+            phases['att_files'] = time.perf_counter() - start - phases['kt_files']
+            commit_start = time.perf_counter()
+        phases['commit'] = time.perf_counter() - commit_start
+        db.publish()
+        phases['total'] = time.perf_counter() - start
+    rows = {kind: sum(s['rows'] for s in db.load_stats if os.path.dirname(s['file']) == folder)
+            for kind, folder in (('kt', kt_folder), ('att', att_folder))}
+    planning = time_planning_queries(db.cur)
+    planning['plan'] = time_sync_plan(db.cur)
+    db.conn.close()
+    return {
+        'phases': phases,
+        'rows': rows,
+        'throughput': {
+            'kt_rows_per_sec': rows['kt'] / phases['kt_files'] if phases['kt_files'] > 0 else 0.0,
+            'att_rows_per_sec': rows['att'] / phases['att_files'] if phases['att_files'] > 0 else 0.0,
+            'rows_per_sec': (rows['kt'] + rows['att']) / phases['total'] if phases['total'] > 0 else 0.0,
+        },
+        'planning': planning,
+        'db_bytes': os.path.getsize(resolve_db(os.path.join(workdir, DB_NAME))),
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def run_memory_load(kt_folder, att_folder, in_memory, cached=False):
+    """Wall-clock one full load, built on disk or in memory, up to the published generation"""
+    with scratch_dir() as workdir:
+        os.chdir(workdir)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            db = A4GDB(att_folder, kt_folder, cache_bytes=CACHE_BYTES if cached else 0, in_memory=in_memory)
+            with db.bulk_load():
+                db.kt_files()
+                db.att_files()
+            db.publish()
+        seconds = time.perf_counter() - start
+        db.conn.close()
+        return {'in_memory': in_memory, 'cached': cached, 'seconds': seconds,
+                'db_bytes': os.path.getsize(resolve_db()), 'peak_rss_mb': _peak_rss_mb()}
+
+
+def bench_memory(config):
+    """Compare a direct disk load with an in-memory build persisted through the backup API"""
+    with scratch_dir("a4g_bench_src_") as folder:
+        kt_folder, att_folder, counts = generate_dataset(folder, config)
+        print(f"{counts['kt_rows']} KT rows, {counts['att_rows']} ATT ranges in {folder}")
+        results = []
+        # parsing dominates a cold load; the warm runs read sidecars so the database writes show
+        for cached in (False, True):
+            if cached:
+                for kind, folder in (('KT', kt_folder), ('ATT', att_folder)):
+                    for file in workbooks(folder):
+                        # the sidecar is written as the rows are read
+                        for _ in parse_cached(kind, file)['data']:
+                            pass
+            timings = []
+            for in_memory in (False, True):
+                cmd = [sys.executable, os.path.abspath(__file__), "memory-child", kt_folder, att_folder]
+                if in_memory:
+                    cmd.append("--in-memory")
+                if cached:
+                    cmd.append("--cached")
+                out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+                result = json.loads(out.strip().splitlines()[-1])
+                results.append(result)
+                timings.append(result['seconds'])
+                print(f"{'warm' if cached else 'cold'} {'in-memory' if in_memory else 'disk'}: "
+                      f"{result['seconds']:.2f}s, peak RSS {_mb(result['peak_rss_mb'])}")
+            print(f"{'warm' if cached else 'cold'} in-memory speedup: {timings[0] / timings[1]:.2f}x")
+        return results
+
+
+def bench_suite(config, out, workers=1, folder=None):
+    """Generate a dataset, load it in a separate process and write the results as JSON
+
+    The workbooks go to a temporary folder that is removed afterwards, or are kept in `folder` if given.
+    """
+    if folder:
+        return _suite(config, out, workers, folder)
+    with scratch_dir("a4g_bench_src_") as folder:
+        return _suite(config, out, workers, folder)
+
+
+def _suite(config, out, workers, folder):
+    print(f"Generating synthetic workbooks in {folder}...")
+    start = time.perf_counter()
+    kt_folder, att_folder, counts = generate_dataset(folder, config)
+    generate_seconds = time.perf_counter() - start
+    print(f"{counts['kt_rows']} KT rows, {counts['att_rows']} ATT ranges ({counts['codes']} codes) "
+          f"in {generate_seconds:.1f}s")
+
+    # the load runs in its own process so peak RSS covers only the loader
+    cmd = [sys.executable, os.path.abspath(__file__), "suite-child", kt_folder, att_folder, "--workers", str(workers)]
+    run = json.loads(subprocess.run(cmd, check=True, capture_output=True, text=True).stdout.strip().splitlines()[-1])
+
+    results = {
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'workers': workers,
+        'config': config,
+        'dataset': counts,
+        **run,
+    }
+    with open(out, "w") as f:
+        json.dump(results, f, indent=2)
+
+    phases = run['phases']
+    print(f"kt_files: {phases['kt_files']:.2f}s ({run['throughput']['kt_rows_per_sec']:,.0f} rows/sec)")
+    print(f"att_files: {phases['att_files']:.2f}s ({run['throughput']['att_rows_per_sec']:,.0f} rows/sec)")
+    print(f"commit + indexes: {phases['commit']:.2f}s, total {phases['total']:.2f}s")
+    print(f"planning walk, query per level: {run['planning']['seconds']:.2f}s for {run['planning']['zips']} zips")
+    plan = run['planning']['plan']
+    print(f"planning walk, SyncPlan: {plan['seconds']:.2f}s for {plan['zips']} zips "
+          f"(build {plan['build_seconds']:.2f}s, {plan['json_bytes'] / 1024:.0f} KB as JSON)")
+    print(f"DB size {run['db_bytes'] / 1024 / 1024:.1f} MB, peak RSS {_mb(run['peak_rss_mb'])}")
+    print(f"Results written to {out}")
+    return results
+
+
+# Stand-in for the rules dialog's chip list: Enter in #chipInput turns the value into a chip
+MOCK_RULES_DIALOG = """
+<html><body>
+<div id="rules-dialog">
+  <div id="chips"></div>
+  <input id="chipInput">
+</div>
+<script>
+  const input = document.getElementById('chipInput');
+  input.addEventListener('keydown', (event) => {
+    if (event.keyCode !== 13 || !input.value) {
+      return;
+    }
+    const chip = document.createElement('mat-chip-row');
+    chip.className = 'mat-mdc-chip';
+    chip.innerHTML = '<span>' + input.value + '</span><mat-icon>cancel</mat-icon>';
+    document.getElementById('chips').appendChild(chip);
+    input.value = '';
+  });
+</script>
+</body></html>
+"""
+
+
+def bench_chips(zips, repeat=3):
+    """Time per-zip and bulk chip entry for one route against the mock dialog in headless Chromium"""
+    from playwright.sync_api import sync_playwright
+
+    codes = [str(code).zfill(5) for code in range(10000, 10000 + zips)]
+    results = {}
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        page = browser.new_page()
+        for bulk in (False, True):
+            seconds = []
+            for _ in range(repeat):
+                page.set_content(MOCK_RULES_DIALOG)
+                start = time.perf_counter()
+                mode = add_chips(page, codes, bulk)
+                seconds.append(time.perf_counter() - start)
+                if chip_count(page) != zips:
+                    raise RuntimeError(f"{mode}: {chip_count(page)} chips for {zips} zips")
+            results[mode] = min(seconds)
+            print(f"{mode}: {min(seconds):.3f}s for {zips} zips ({zips / min(seconds):,.0f} zips/sec)")
+        browser.close()
+    print(f"bulk speedup: {results['per_zip'] / results['bulk']:.1f}x")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="A4GDB ingestion benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    streaming = sub.add_parser("streaming", help="full vs read-only workbook loading")
+    streaming.add_argument("--rows", type=int, default=500_000)
+
+    compact = sub.add_parser("compact", help="plain vs compact schema size and query latency")
+    compact.add_argument("--rows", type=int, default=200_000)
+    compact.add_argument("--width", type=int, default=20)
+
+    plans = sub.add_parser("plans", help="fail if a hot query plans a full table scan")
+    plans.add_argument("--db", default="A4G.db")
+
+    expand = sub.add_parser("expand", help="per-code loop vs vectorised ATT range expansion")
+    expand.add_argument("--codes", type=int, default=1_000_000)
+    expand.add_argument("--width", type=int, default=50)
+    expand.add_argument("--per-route", type=int, default=20)
+
+    suite = sub.add_parser("suite", help="synthetic end-to-end load and planning benchmark")
+    for name, default in SUITE_DEFAULTS.items():
+        suite.add_argument(f"--{name.replace('_', '-')}", type=type(default), default=default)
+    suite.add_argument("--workers", type=int, default=1)
+    suite.add_argument("--folder", help="where to write the workbooks (default: a temp folder)")
+    suite.add_argument("--out", default="bench_results.json", help="results file (git-ignored by default name)")
+
+    memory = sub.add_parser("memory", help="direct disk load vs in-memory build with backup to disk")
+    for name, default in SUITE_DEFAULTS.items():
+        memory.add_argument(f"--{name.replace('_', '-')}", type=type(default), default=default)
+
+    memory_child = sub.add_parser("memory-child")
+    memory_child.add_argument("kt_folder")
+    memory_child.add_argument("att_folder")
+    memory_child.add_argument("--in-memory", action="store_true")
+    memory_child.add_argument("--cached", action="store_true")
+
+    chips = sub.add_parser("chips", help="per-zip vs bulk chip entry against a mock rules dialog")
+    chips.add_argument("--zips", type=int, default=300)
+
+    suite_child = sub.add_parser("suite-child")
+    suite_child.add_argument("kt_folder")
+    suite_child.add_argument("att_folder")
+    suite_child.add_argument("--workers", type=int, default=1)
+
+    child = sub.add_parser("child")
+    child.add_argument("kind", choices=["kt", "att"])
+    child.add_argument("file")
+    child.add_argument("--streaming", action="store_true")
+
+    args = parser.parse_args()
+    if args.command == "child":
+        print(json.dumps(run_loader(args.kind, args.file, args.streaming)))
+    elif args.command == "streaming":
+        bench_streaming(args.rows)
+    elif args.command == "compact":
+        bench_compact(args.rows, args.width)
+    elif args.command == "chips":
+        bench_chips(args.zips)
+    elif args.command == "memory-child":
+        print(json.dumps(run_memory_load(args.kt_folder, args.att_folder, args.in_memory, args.cached)))
+    elif args.command == "memory":
+        bench_memory({name: getattr(args, name) for name in SUITE_DEFAULTS})
+    elif args.command == "suite-child":
+        print(json.dumps(run_suite_load(args.kt_folder, args.att_folder, args.workers)))
+    elif args.command == "suite":
+        config = {name: getattr(args, name) for name in SUITE_DEFAULTS}
+        bench_suite(config, os.path.abspath(args.out), args.workers, args.folder)
+    elif args.command == "expand":
+        bench_expand(args.codes, args.width, args.per_route)
+    elif args.command == "plans":
+        conn = connect(args.db)
+        for name, plan in check_query_plans(conn.cursor()).items():
+            print(f"{name}: {' | '.join(plan)}")
+        conn.close()
@@ -1,17 +1,166 @@
 import sys
 import os
-import time
-import shutil
-import sqlite3
-from A4GDB import A4GDB #DB class
+import json
+import subprocess
+import threading
+from contextlib import closing
+from A4GDB import A4GDB, SyncPlan, route_zips, connect #DB class
+from chips import chip_steps
+from waits import Waiter, SLOW_WAIT
+from dropdown import Dropdown
+from steps import run_steps
+from rules import RULES_SCRIPT, TICK_SCRIPT, ROW_SELECTOR, ROW_CHECKBOX, parse_rules, rows_to_tick, diff_rules
 from playwright.sync_api import sync_playwright
 from config import username, password, webpage
 
 
-class Bot:
-    def __init__(self, url, filepath, progress_callback=None, summary_callback=None):
-        shutil.rmtree("C:/POcodeBot/edge-profile", ignore_errors=True)
-        
+def empty_summary():
+    """Summary of a sync that has not done anything yet"""
+    return {
+        'missing_service_areas': [],
+        'missing_facilities': [],
+        'missing_routes': [],
+        'successful_service_areas': [],
+        'successful_facilities': [],
+        'successful_routes_count': 0,
+        'unchanged_routes_count': 0,
+        'routes_without_zip_codes': []
+    }
+
+
+def format_summary(summary):
+    """Format a Bot summary dict as the execution summary report"""
+    summary_lines = []
+    summary_lines.append("\n")
+    summary_lines.append("="*80)
+    summary_lines.append("                          EXECUTION SUMMARY")
+    summary_lines.append("="*80)
+    
+    # Service Areas
+    summary_lines.append("\n📍 SERVICE AREAS:")
+    if summary['successful_service_areas']:
+        summary_lines.append(f"  ✅ Successfully processed ({len(summary['successful_service_areas'])}): {', '.join(summary['successful_service_areas'])}")
+    
+    if summary['missing_service_areas']:
+        summary_lines.append(f"  ❌ Not found ({len(summary['missing_service_areas'])}): {', '.join(summary['missing_service_areas'])}")
+    
+    if not summary['successful_service_areas'] and not summary['missing_service_areas']:
+        summary_lines.append("  🟡 No service areas processed")
+    
+    # Facilities
+    summary_lines.append("\n🏢 FACILITIES:")
+    if summary['successful_facilities']:
+        summary_lines.append(f"  ✅ Successfully processed ({len(summary['successful_facilities'])}): {', '.join(summary['successful_facilities'])}")
+    
+    if summary['missing_facilities']:
+        summary_lines.append(f"  ❌ Not found ({len(summary['missing_facilities'])}): {', '.join(summary['missing_facilities'])}")
+    
+    if not summary['successful_facilities'] and not summary['missing_facilities']:
+        summary_lines.append("  🟡 No facilities processed")
+    
+    # Routes
+    summary_lines.append("\n🚛 ROUTES:")
+    if summary['successful_routes_count'] > 0:
+        summary_lines.append(f"  ✅ Successfully processed: {summary['successful_routes_count']} routes")
+
+    unchanged_routes = summary.get('unchanged_routes_count', 0)
+    if unchanged_routes > 0:
+        summary_lines.append(f"  ⏭️ Already in sync: {unchanged_routes} routes")
+    
+    if summary['missing_routes']:
+        summary_lines.append(f"  ❌ Not found ({len(summary['missing_routes'])}): {', '.join(summary['missing_routes'])}")
+    
+    if summary['routes_without_zip_codes']:
+        summary_lines.append(f"  📮 No zip codes found ({len(summary['routes_without_zip_codes'])}): {', '.join(summary['routes_without_zip_codes'])}")
+    
+    if summary['successful_routes_count'] == 0 and not unchanged_routes and not summary['missing_routes'] and not summary['routes_without_zip_codes']:
+        summary_lines.append("  🟡 No routes processed")
+    
+    # Overall Statistics
+    summary_lines.append("\n📊 STATISTICS:")
+    total_service_areas = len(summary['successful_service_areas']) + len(summary['missing_service_areas'])
+    total_facilities = len(summary['successful_facilities']) + len(summary['missing_facilities'])
+    synced_routes = summary['successful_routes_count'] + summary.get('unchanged_routes_count', 0)
+    total_routes = synced_routes + len(summary['missing_routes']) + len(summary['routes_without_zip_codes'])
+    
+    if total_service_areas > 0:
+        success_rate_sa = (len(summary['successful_service_areas']) / total_service_areas) * 100
+        summary_lines.append(f"  Service Areas: {len(summary['successful_service_areas'])}/{total_service_areas} successful ({success_rate_sa:.1f}%)")
+    
+    if total_facilities > 0:
+        success_rate_fac = (len(summary['successful_facilities']) / total_facilities) * 100
+        summary_lines.append(f"  Facilities: {len(summary['successful_facilities'])}/{total_facilities} successful ({success_rate_fac:.1f}%)")
+    
+    if total_routes > 0:
+        success_rate_routes = (synced_routes / total_routes) * 100
+        summary_lines.append(f"  Routes: {synced_routes}/{total_routes} successful ({success_rate_routes:.1f}%)")
+    
+    summary_lines.append("\n" + "="*80)
+    summary_lines.append("                        END OF SUMMARY")
+    summary_lines.append("="*80 + "\n")
+    
+    return "\n".join(summary_lines)
+
+
+DASHBOARD_TITLE = "Route Allocation Dashboard"
+
+# Cookies and local storage of a logged-in browser context; holds the SSO session, so it lives in the
+# user's home directory rather than the working directory (often a checkout) and only its owner can read it,
+# see save_session
+SESSION_PATH = os.path.join(os.path.expanduser("~"), ".a4g", "a4g-session.json")
+
+# Resolves once the page shows either the dashboard (session still valid) or the SSO button (expired)
+SESSION_CHECK = "title => document.title === title || !!document.getElementById('sso-button')"
+
+
+def _owner_only(path):
+    # Windows ignores mode bits: drop the ACL entries inherited from the folder and grant only this user.
+    # If icacls fails the file keeps the ACL of the user's profile folder, which other users can't read
+    user = os.environ.get("USERNAME")
+    if not user:
+        return
+    domain = os.environ.get("USERDOMAIN")
+    account = f"{domain}\\{user}" if domain else user
+    subprocess.run(["icacls", path, "/inheritance:r", "/grant:r", f"{account}:F"], capture_output=True, check=False)
+
+
+def save_session(state, path):
+    """Write a context's storage_state; replaced atomically since parallel workers may save at once
+
+    The file is created owner-only: mode 0600 in a 0700 folder on POSIX, and on Windows an ACL granting
+    only the current user, set before the cookies are written.
+    """
+    os.makedirs(os.path.dirname(path) or ".", mode=0o700, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    # created with mode 0600 instead of chmod-ed afterwards, so the cookies are never readable by others
+    with os.fdopen(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+        if os.name == "nt":
+            _owner_only(tmp)
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def drop_session(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class BotBase:
+    """State, reporting and page steps shared by Bot and async_bot.AsyncBot
+
+    The steps make every decision of a sync; a subclass sets the Playwright API, waiter and dropdown
+    classes they drive and runs them, see steps.py.
+    """
+
+    # set by Bot and AsyncBot
+    playwright_api = None
+    waiter_class = None
+    dropdown_class = None
+
+    def __init__(self, url, filepath, progress_callback=None, summary_callback=None, plan=None, session_path=SESSION_PATH):
+
         #paths and url
         self.EDGE_PATH = r"C:\\Program Files (x86)\\Microsoft\\Edge\\Application\\msedge.exe"  # or wherever msedge.exe is
         self.url = url
@@ -31,28 +180,42 @@ class Bot:
         
         self.page = None
         self.context = None
+        self.browser = None
         self.playwright = None
 
-        #DB connection
-        self.conn = sqlite3.connect('A4G.db')
+        # storage_state saved after a login and reused by later runs and workers; None logs in every run
+        self.session_path = session_path
+
+        # page-event waits, timed per call site; log_waits reports every wait, not only slow ones
+        self.waiter = None
+        self.log_waits = False
+
+        #DB connection; the sync keeps reading this generation even if a new load is published meanwhile
+        self.conn = connect()
         self.cur = self.conn.cursor()
+
+        # SyncPlan (or the path of a saved one) to walk; built from the database when not given
+        self.plan = plan
+
+        # type each route's zips into the chip input in one page script; False keeps one fill per zip
+        self.bulk_chips = True
+
+        # compare each facility's rules table with the plan and only replace the routes that differ,
+        # instead of deleting every rule and adding all of them again
+        self.reconcile = False
         
         # Callback functions
         self.progress_callback = progress_callback
         self.summary_callback = summary_callback
         
         # Summary tracking
-        self.summary = {
-            'missing_service_areas': [],
-            'missing_facilities': [],
-            'missing_routes': [],
-            'successful_service_areas': [],
-            'successful_facilities': [],
-            'successful_routes_count': 0,
-            'routes_without_zip_codes': []
-        }
+        self.summary = empty_summary()
         
+        # text -> index maps of the country and service area selects, which don't change during a run
+        self.option_cache = {}
+
         # Current context for tracking
+        self.current_country = None
         self.current_service_area = None
         self.current_facility = None
 
@@ -100,97 +263,101 @@ class Bot:
             'successful_service_areas': self.summary['successful_service_areas'].copy(),
             'successful_facilities': self.summary['successful_facilities'].copy(),
             'successful_routes_count': self.summary['successful_routes_count'],
+            'unchanged_routes_count': self.summary['unchanged_routes_count'],
             'routes_without_zip_codes': self.summary['routes_without_zip_codes'].copy()
         }
 
     def get_formatted_summary(self):
         """Get formatted summary as string for display"""
-        summary_lines = []
-        summary_lines.append("\n")
-        summary_lines.append("="*80)
-        summary_lines.append("                          EXECUTION SUMMARY")
-        summary_lines.append("="*80)
-        
-        # Service Areas
-        summary_lines.append("\n📍 SERVICE AREAS:")
-        if self.summary['successful_service_areas']:
-            summary_lines.append(f"  ✅ Successfully processed ({len(self.summary['successful_service_areas'])}): {', '.join(self.summary['successful_service_areas'])}")
-        
-        if self.summary['missing_service_areas']:
-            summary_lines.append(f"  ❌ Not found ({len(self.summary['missing_service_areas'])}): {', '.join(self.summary['missing_service_areas'])}")
-        
-        if not self.summary['successful_service_areas'] and not self.summary['missing_service_areas']:
-            summary_lines.append("  🟡 No service areas processed")
-        
-        # Facilities
-        summary_lines.append("\n🏢 FACILITIES:")
-        if self.summary['successful_facilities']:
-            summary_lines.append(f"  ✅ Successfully processed ({len(self.summary['successful_facilities'])}): {', '.join(self.summary['successful_facilities'])}")
-        
-        if self.summary['missing_facilities']:
-            summary_lines.append(f"  ❌ Not found ({len(self.summary['missing_facilities'])}): {', '.join(self.summary['missing_facilities'])}")
-        
-        if not self.summary['successful_facilities'] and not self.summary['missing_facilities']:
-            summary_lines.append("  🟡 No facilities processed")
-        
-        # Routes
-        summary_lines.append("\n🚛 ROUTES:")
-        if self.summary['successful_routes_count'] > 0:
-            summary_lines.append(f"  ✅ Successfully processed: {self.summary['successful_routes_count']} routes")
-        
-        if self.summary['missing_routes']:
-            summary_lines.append(f"  ❌ Not found ({len(self.summary['missing_routes'])}): {', '.join(self.summary['missing_routes'])}")
-        
-        if self.summary['routes_without_zip_codes']:
-            summary_lines.append(f"  📮 No zip codes found ({len(self.summary['routes_without_zip_codes'])}): {', '.join(self.summary['routes_without_zip_codes'])}")
-        
-        if self.summary['successful_routes_count'] == 0 and not self.summary['missing_routes'] and not self.summary['routes_without_zip_codes']:
-            summary_lines.append("  🟡 No routes processed")
-        
-        # Overall Statistics
-        summary_lines.append("\n📊 STATISTICS:")
-        total_service_areas = len(self.summary['successful_service_areas']) + len(self.summary['missing_service_areas'])
-        total_facilities = len(self.summary['successful_facilities']) + len(self.summary['missing_facilities'])
-        total_routes = self.summary['successful_routes_count'] + len(self.summary['missing_routes']) + len(self.summary['routes_without_zip_codes'])
-        
-        if total_service_areas > 0:
-            success_rate_sa = (len(self.summary['successful_service_areas']) / total_service_areas) * 100
-            summary_lines.append(f"  Service Areas: {len(self.summary['successful_service_areas'])}/{total_service_areas} successful ({success_rate_sa:.1f}%)")
-        
-        if total_facilities > 0:
-            success_rate_fac = (len(self.summary['successful_facilities']) / total_facilities) * 100
-            summary_lines.append(f"  Facilities: {len(self.summary['successful_facilities'])}/{total_facilities} successful ({success_rate_fac:.1f}%)")
-        
-        if total_routes > 0:
-            success_rate_routes = (self.summary['successful_routes_count'] / total_routes) * 100
-            summary_lines.append(f"  Routes: {self.summary['successful_routes_count']}/{total_routes} successful ({success_rate_routes:.1f}%)")
-        
-        summary_lines.append("\n" + "="*80)
-        summary_lines.append("                        END OF SUMMARY")
-        summary_lines.append("="*80 + "\n")
-        
-        return "\n".join(summary_lines)
+        return format_summary(self.summary)
+
+    def _record(self, key, item):
+        # the async engine selects one service area on several pages; list it once
+        if item not in self.summary[key]:
+            self.summary[key].append(item)
+
+    def waiter_for(self, page):
+        """The waiter of a page; other pages than the first share its stats, so the wait report covers them"""
+        if page is self.page:
+            return self.waiter
+        waiter = self.waiter_class(page, self._log_wait)
+        waiter.stats = self.waiter.stats
+        return waiter
+
+    def _log_wait(self, name, seconds, ok):
+        if not ok:
+            self._send_progress_update(f"⏱ Wait for {name} timed out after {seconds:.2f}s", "warning")
+        elif self.log_waits or seconds >= SLOW_WAIT:
+            self._send_progress_update(f"⏱ {name}: {seconds * 1000:.0f} ms", "info")
+
+    def _send_wait_report(self):
+        if self.waiter and self.waiter.stats:
+            self._send_progress_update("Wait times:\n  " + "\n  ".join(self.waiter.report()), "info")
+
+    def print_summary(self):
+        """Keep original print_summary for backward compatibility"""
+        summary_text = self.get_formatted_summary()
+        print(summary_text)
+
+    def load_data(self):
+        self._send_progress_update("LOADING DATA", "info")
+
+    def get_plan(self):
+        """The whole Country -> SA -> Facility -> Route -> zips tree, read once up front"""
+        plan = self.plan
+        if plan is None:
+            plan = SyncPlan.build(self.cur)
+        elif isinstance(plan, str):
+            plan = SyncPlan.load(plan)
+        counts = plan.summary()
+        self._send_progress_update(f"Sync plan: {counts['service_areas']} service areas, {counts['facilities']} facilities, "
+                                   f"{counts['routes']} routes, {counts['zips']} zip codes", "info")
+        return plan
+
+    # The page steps below are generators of page calls, see steps.py; Bot runs them with run_steps and
+    # AsyncBot with run_steps_async. Each takes the page it works on.
 
     # Initialize Playwright and keep it alive
-    def start_browser(self):
+    def _start_browser(self):
         self._send_progress_update("Starting browser...", "info")
-        self.playwright = sync_playwright().start()
-        self.context = self.playwright.chromium.launch(
-            #user_data_dir="C:/POcodeBot/edge-profile",
+        self.playwright = yield lambda: self.playwright_api().start()
+        self.browser = yield lambda: self.playwright.chromium.launch(
             executable_path=self.EDGE_PATH,
             headless=True,
             #slow_mo=500
         )
-        self.page = self.context.new_page()
+        # start from the saved session when there is one; load_page checks it is still valid.
+        # Pages of one context share its cookies
+        state = self.session_path if self.session_path and os.path.exists(self.session_path) else None
+        self.context = yield lambda: self.browser.new_context(storage_state=state)
+        self.page = yield lambda: self.context.new_page()
+        self.waiter = self.waiter_class(self.page, self._log_wait)
         self._send_progress_update("Browser started successfully", "success")
         return True
 
+    def _session_valid(self, page):
+        """Whether the page landed on the dashboard rather than the SSO login"""
+        waiter = self.waiter_for(page)
+        if not (yield lambda: waiter.condition("dashboard or login", SESSION_CHECK, DASHBOARD_TITLE, timeout=15000)):
+            return False
+        return (yield lambda: page.title()) == DASHBOARD_TITLE
+
     # Loads initial page and logs in
-    def load_page(self):
+    def _load_page(self):
         try:
             self._send_progress_update("Loading webpage...", "info")
-            self.page.goto(self.url)
-            self.log_in()
+            yield lambda: self.page.goto(self.url)
+            if (yield from self._session_valid(self.page)):
+                self._send_progress_update("Saved session is valid, skipping login", "success")
+                return True
+            if self.session_path and os.path.exists(self.session_path):
+                self._send_progress_update("Saved session has expired, logging in again", "warning")
+            if not (yield from self._log_in(self.page)):
+                if self.session_path:
+                    drop_session(self.session_path)
+                return False
+            if self.session_path:
+                save_session((yield lambda: self.context.storage_state()), self.session_path)
             self._send_progress_update("Page loaded and logged in successfully", "success")
             return True
         except Exception as e:
@@ -198,256 +365,170 @@ class Bot:
             return False
 
     # Close browser and cleanup
-    def close_browser(self):
+    def _close_browser(self):
         try:
             self._send_progress_update("Closing browser...", "info")
             if self.context:
-                self.context.close()
+                yield lambda: self.context.close()
+            if self.browser:
+                yield lambda: self.browser.close()
             if self.playwright:
-                self.playwright.stop()
+                yield lambda: self.playwright.stop()
             self._send_progress_update("Browser closed successfully", "success")
         except Exception as e:
             self._send_progress_update(f"Error closing browser: {e}", "error")
 
     # Logs in to A4G
-    def log_in(self):
+    def _log_in(self, page):
         try:
             self._send_progress_update("Logging in...", "info")
             # Add explicit wait for the login button
-            self.page.wait_for_selector("id=sso-button", timeout=10000)
-            self.page.click("id=sso-button")
-            self.wait_for_title("Route Allocation Dashboard", 15)
-            self.page.click()
+            yield lambda: page.wait_for_selector("id=sso-button", timeout=10000)
+            yield lambda: page.click("id=sso-button")
+            if not (yield from self._wait_for_title(page, DASHBOARD_TITLE, 15)):
+                return False
             self._send_progress_update("Login successful", "success")
+            return True
         except Exception as e:
             self._send_progress_update(f"Login failed: {e}", "error")
-            
-    def wait_for_title(self, expected_title, timeout=15):
+            return False
+
+    def _wait_for_title(self, page, expected_title, timeout=15):
+        waiter = self.waiter_for(page)
         self._send_progress_update(f"Waiting for page title to become '{expected_title}'...", "info")
-        start = time.time()
-        while time.time() - start < timeout:
-            current_title = self.page.title()
-            if current_title == expected_title:
-                self._send_progress_update("✅ Title matched!", "success")
-                time.sleep(1.5)  # Reduced from 10 seconds
-                return True
-            time.sleep(1)  # wait 1 second before checking again
-        self._send_progress_update(f"❌ Timeout reached. Current title: '{current_title}'", "error")
-        return False
-    
-    def go_to_country(self, country):
+        if not (yield lambda: waiter.title(expected_title, timeout * 1000)):
+            title = yield lambda: page.title()
+            self._send_progress_update(f"❌ Timeout reached. Current title: '{title}'", "error")
+            return False
+        self._send_progress_update("✅ Title matched!", "success")
+        # the dashboard fills its dropdowns from the API after the title is set
+        yield lambda: waiter.visible("id=country-select")
+        return True
+
+    def _select_country(self, page, country):
         self._send_progress_update(f"Navigating to country: {country}", "info")
         try:
-            # Wait for the service area dropdown to be available
-            self.page.wait_for_selector("id=country-select", timeout=10000)
-            
-            # Click the dropdown
-            self.page.click("id=country-select")
-            
-            # Wait for dropdown options to be visible
-            self.page.wait_for_selector("span.mdc-list-item__primary-text", timeout=5000)
-            
-            # Try to find and click the specific service area
-            service_area_locator = self.page.locator("span.mdc-list-item__primary-text", has_text=country)
-            
-            # Check if the service area option exists
-            if service_area_locator.count() > 0:
-                service_area_locator.click()
+            dropdown = self.dropdown_class(page, "country-select", self.option_cache)
+            if (yield lambda: dropdown.choose(country)):
                 self._send_progress_update(f"Successfully selected country: {country}", "success")
                 return True
-            else:
-                # Print available options for debugging
-                available_options = self.page.locator("span.mdc-list-item__primary-text").all_text_contents()
-                self._send_progress_update(f"❌ Country '{country}' not found. Available: {available_options}", "error")
-                return False
-                
+            self._send_progress_update(f"❌ Country '{country}' not found. Available: {dropdown.available}", "error")
+            return False
+
         except Exception as e:
             self._send_progress_update(f"Error navigating to country '{country}': {e}", "error")
             return False
 
-    def go_to_serviceArea(self, serviceArea):
+    def _select_service_area(self, page, country, serviceArea):
         self._send_progress_update(f"Navigating to service area: {serviceArea}", "info")
         try:
-            # Wait for the service area dropdown to be available
-            self.page.wait_for_selector("id=service-area-select", timeout=10000)
-            
-            # Click the dropdown
-            self.page.click("id=service-area-select")
-            
-            # Wait for dropdown options to be visible
-            self.page.wait_for_selector("span.mdc-list-item__primary-text", timeout=5000)
-            
-            # Try to find and click the specific service area
-            service_area_locator = self.page.locator("span.mdc-list-item__primary-text", has_text=serviceArea)
-
-            # Check if the service area option exists
-            if service_area_locator.count() > 0:
-                service_area_locator.click()
+            # the service areas listed depend on the selected country
+            dropdown = self.dropdown_class(page, "service-area-select", self.option_cache, country)
+            if (yield lambda: dropdown.choose(serviceArea)):
                 self._send_progress_update(f"Successfully selected service area: {serviceArea}", "success")
-                self.current_service_area = serviceArea
-                self.summary['successful_service_areas'].append(serviceArea)
+                self._record('successful_service_areas', serviceArea)
                 return True
-            else:
-                # Print available options for debugging
-                available_options = self.page.locator("span.mdc-list-item__primary-text").all_text_contents()
-                self._send_progress_update(f"❌ Service area '{serviceArea}' not found. Available: {available_options}", "error")
-                self.summary['missing_service_areas'].append(serviceArea)
-                return False
-                
+            self._send_progress_update(f"❌ Service area '{serviceArea}' not found. Available: {dropdown.available}", "error")
+            self._record('missing_service_areas', serviceArea)
+            return False
+
         except Exception as e:
             self._send_progress_update(f"Error navigating to service area '{serviceArea}': {e}", "error")
-            self.summary['missing_service_areas'].append(serviceArea)
+            self._record('missing_service_areas', serviceArea)
             return False
-        
-    def go_to_facility(self, facility):
+
+    def _select_facility(self, page, serviceArea, facility):
         self._send_progress_update(f"Navigating to facility: {facility}", "info")
         try:
-            # Wait for the facility dropdown to be available
-            self.page.wait_for_selector("id=facility-select", timeout=10000)
-            
-            # Click the dropdown
-            self.page.click("id=facility-select")
-            
-            # Wait for dropdown options to be visible (any option, not specific facility)
-            self.page.wait_for_selector("span.mdc-list-item__primary-text", timeout=10000)
-            
-            # Get all available options first for debugging
-            available_options = self.page.locator("span.mdc-list-item__primary-text").all_text_contents()
-            
-            # Try to find the specific facility
-            facility_locator = self.page.locator("span.mdc-list-item__primary-text", has_text=facility)
-            
-            # Check if the facility option exists
-            facility_count = facility_locator.count()
-            if facility_count > 0:
-                facility_locator.click()
-                
+            dropdown = self.dropdown_class(page, "facility-select")
+            if (yield lambda: dropdown.choose(facility)):
                 # Optional: Wait for the selection to take effect
-                try:
-                    # Wait for dropdown to close (facility-select should be visible again)
-                    self.page.wait_for_selector("id=facility-select", state="visible", timeout=10000)
+                waiter = self.waiter_for(page)
+                if (yield lambda: waiter.visible("id=facility-select")):
                     self._send_progress_update(f"Successfully selected facility: {facility}", "success")
-                    self.current_facility = facility
-                    self.summary['successful_facilities'].append(facility)
-                    return True
-                except:
+                else:
                     self._send_progress_update(f"⚠️ Facility '{facility}' was clicked but selection may not have completed", "warning")
-                    self.current_facility = facility
-                    self.summary['successful_facilities'].append(facility)
-                    return True  # Still return True since we found and clicked the facility
-                    
-            else:
-                cleaned_options = [opt.strip() for opt in available_options if opt.strip()]
-                self._send_progress_update(f"❌ Facility '{facility}' not found. Available: {cleaned_options}", "error")
-                self.summary['missing_facilities'].append(f"{facility} (in {self.current_service_area})")
-                
-                # Close the dropdown since we opened it but didn't select anything
-                try:
-                    self.page.keyboard.press("Escape")
-                except:
-                    pass
-                    
-                return False
-                    
+                self.summary['successful_facilities'].append(facility)
+                return True  # Still return True since we found and clicked the facility
+
+            self._send_progress_update(f"❌ Facility '{facility}' not found. Available: {dropdown.available}", "error")
+            self.summary['missing_facilities'].append(f"{facility} (in {serviceArea})")
+            return False
+
         except Exception as e:
             self._send_progress_update(f"❌ Error navigating to facility '{facility}': {e}", "error")
-            self.summary['missing_facilities'].append(f"{facility} (in {self.current_service_area})")
-            
+            self.summary['missing_facilities'].append(f"{facility} (in {serviceArea})")
+
             # Try to close any open dropdowns in case of error
             try:
-                self.page.keyboard.press("Escape")
-            except:
+                yield lambda: page.keyboard.press("Escape")
+            except Exception:
                 pass
-                
+
             return False
 
-    def add_postal_codes(self, route):
-        self.cur.execute(f"SELECT DISTINCT Zip FROM ZipCode WHERE Rt = '{route}';")
-        zipCodes = self.cur.fetchall()
+    def _add_postal_codes(self, page, route, ranges, serviceArea, facility):
+        # ranges come from the sync plan; the query is only for callers without one
+        zipCodes = SyncPlan.zips(ranges) if ranges is not None else list(route_zips(self.cur, route))
+        where = f"at {facility} in {serviceArea}"
 
         # Try to select the route
         try:
-            self.page.click("id=rules-dialog-route-select")
-            
-            # Wait for dropdown options to be visible
-            self.page.wait_for_selector("span.mdc-list-item__primary-text", timeout=1000)
-            
-            # Check if the route exists in the dropdown
-            route_locator = self.page.locator("span.mdc-list-item__primary-text", has_text=route)
-            
-            if route_locator.count() > 0:
-                route_locator.click()
-                
-                # Continue with cycle selection
-                self.page.click("id=rules-dialog-cycle-select")
-                
-                for label in ["A", "B"]:
-                    try:
-                        self.page.wait_for_selector(f"mat-option:has-text('{label}')", timeout=3000)
-                        self.page.click(f"mat-option:has-text('{label}')")
-                    except Exception as e:
-                        self._send_progress_update(f"Could not select cycle {label}: {e}", "warning")
-                
-                self.page.mouse.click(0, 0)
-                if zipCodes:
-                    self._send_progress_update(f"Adding {len(zipCodes)} postal codes for route {route}", "info")
-                    # Add all postal codes first
-                    for zipCode in zipCodes:
-                        self.page.fill("#chipInput", zipCode[0])
-                        self.page.keyboard.press("Enter")
-                else:
-                    self._send_progress_update(f"No zip codes for route: {route}", "warning")
-                    self.summary['routes_without_zip_codes'].append(f"{route} (at {self.current_facility} in {self.current_service_area})")
-                    self.page.click("id=rules-dialog-cancel")
-                    return False
-
-                self.page.click("id=rules-dialog-submit")
-                self._send_progress_update(f"✅ Successfully added postal codes for route: {route}", "success")
-                self.summary['successful_routes_count'] += 1
-                return True
-                
-            else:
-                # Route not found - get available routes for debugging
-                available_routes = self.page.locator("span.mdc-list-item__primary-text").all_text_contents()
-                cleaned_routes = [route.strip() for route in available_routes if route.strip()]
-                
-                self._send_progress_update(f"❌ Route '{route}' not found. Available: {cleaned_routes}", "error")
-                self.summary['missing_routes'].append(f"{route} (at {self.current_facility} in {self.current_service_area})")
-                
+            # every route dialog of a facility lists the same routes, so they are read once per facility
+            dropdown = self.dropdown_class(page, "rules-dialog-route-select", self.option_cache,
+                                           (serviceArea, facility), timeout=1000)
+            if not (yield lambda: dropdown.choose(route)):
+                self._send_progress_update(f"❌ Route '{route}' not found. Available: {dropdown.available}", "error")
+                self.summary['missing_routes'].append(f"{route} ({where})")
+
                 # Close the dialog since we can't proceed
-                self.page.click("id=rules-dialog-cancel")
+                yield lambda: page.click("id=rules-dialog-cancel")
                 return False
-                
+
+            # Continue with cycle selection; both cycles are picked in one open of the multi-select
+            cycles = self.dropdown_class(page, "rules-dialog-cycle-select", self.option_cache, timeout=3000)
+            yield lambda: cycles.open()
+            for label in ["A", "B"]:
+                try:
+                    if not (yield lambda: cycles.pick(label)):
+                        self._send_progress_update(f"Could not select cycle {label}: not in {cycles.available}", "warning")
+                except Exception as e:
+                    self._send_progress_update(f"Could not select cycle {label}: {e}", "warning")
+
+            yield lambda: page.mouse.click(0, 0)
+            if not zipCodes:
+                self._send_progress_update(f"No zip codes for route: {route}", "warning")
+                self.summary['routes_without_zip_codes'].append(f"{route} ({where})")
+                yield lambda: page.click("id=rules-dialog-cancel")
+                return False
+
+            self._send_progress_update(f"Adding {len(zipCodes)} postal codes for route {route}", "info")
+            # Add all postal codes first
+            if (yield from chip_steps(page, zipCodes, self.bulk_chips)) == 'fallback':
+                self._send_progress_update(f"Bulk chip entry was incomplete for {route}; added the rest one by one", "warning")
+            yield lambda: page.click("id=rules-dialog-submit")
+            self._send_progress_update(f"✅ Successfully added postal codes for route: {route}", "success")
+            self.summary['successful_routes_count'] += 1
+            return True
+
         except Exception as e:
             self._send_progress_update(f"❌ Error selecting route '{route}': {e}", "error")
-            self.summary['missing_routes'].append(f"{route} (at {self.current_facility} in {self.current_service_area})")
+            self.summary['missing_routes'].append(f"{route} ({where})")
             # Try to cancel the dialog to clean up
             try:
-                self.page.click("id=rules-dialog-cancel")
-            except:
+                yield lambda: page.click("id=rules-dialog-cancel")
+            except Exception:
                 pass
             return False
-    
-    def _wait_for_stable_state(self, selector, timeout=5000):
-        """Wait for element to be stable (present and not changing)"""
-        try:
-            self.page.wait_for_selector(selector, timeout=timeout)
-            # Quick stability check - wait for element to remain unchanged
-            time.sleep(0.1)  # Very short wait for stability
-            return True
-        except:
-            return False
-    
-    def delete_postal_codes(self):
+
+    def _delete_postal_codes(self, page):
         try:
-            # Quick check if there are any rows in the table body
-            rows = self.page.locator("tr[role='row'][mat-row]")
-            
-            # Use a shorter timeout for the initial check
+            waiter = self.waiter_for(page)
+            # Quick check if there are any rows in the table body, with a short timeout
             try:
-                self.page.wait_for_selector("tr[role='row'][mat-row]", timeout=1000)
-                row_count = rows.count()
-            except:
+                yield lambda: page.wait_for_selector(ROW_SELECTOR, timeout=1000)
+                row_count = yield lambda: page.locator(ROW_SELECTOR).count()
+            except Exception:
                 row_count = 0
 
             if row_count == 0:
@@ -455,126 +536,255 @@ class Bot:
                 return
 
             self._send_progress_update("Deleting existing postal codes...", "info")
-            
+
             # Wait for checkbox to appear with shorter timeout
-            if self._wait_for_stable_state("label.checkbox-container", timeout=3000):
-                # Click the "select all" checkbox
-                self.page.click("label.checkbox-container", force=True)
-                
-                # Quick delete sequence
-                self.page.click("id=delete-button")
-                self.page.locator("id=dialog-yes").click()
-
-                # Wait for and click submit button
-                if self._wait_for_stable_state("id=submit-button", timeout=3000):
-                    self.page.click("id=submit-button")
-
-                    # Brief wait for panel to reload
-                    time.sleep(0.5)
-                    self.page.click("id=postal-code-rules-panel")
-                    self._send_progress_update("✅ Deleted existing postal codes", "success")
-                else:
-                    self._send_progress_update("⚠️ Could not find submit button after delete", "warning")
-            else:
+            if not (yield lambda: waiter.stable(ROW_CHECKBOX, timeout=3000)):
                 self._send_progress_update("⚠️ Could not find checkbox for selecting postal codes", "warning")
+                return
+
+            # Click the "select all" checkbox, then the quick delete sequence
+            yield lambda: page.click(ROW_CHECKBOX, force=True)
+            yield lambda: page.click("id=delete-button")
+            yield lambda: page.locator("id=dialog-yes").click()
+
+            # Wait for and click submit button
+            if not (yield lambda: waiter.stable("id=submit-button", timeout=3000)):
+                self._send_progress_update("⚠️ Could not find submit button after delete", "warning")
+                return
+            yield lambda: waiter.saved(lambda: page.click("id=submit-button"))
+
+            # the table re-renders without rows once the deletion is saved
+            if not (yield lambda: waiter.hidden(ROW_SELECTOR)):
+                self._send_progress_update("⚠️ Postal code rows still shown after delete", "warning")
+            yield lambda: page.click("id=postal-code-rules-panel")
+            self._send_progress_update("✅ Deleted existing postal codes", "success")
 
         except Exception as e:
             self._send_progress_update(f"❌ Error in delete_postal_codes: {e}", "error")
 
-    def print_summary(self):
-        """Keep original print_summary for backward compatibility"""
-        summary_text = self.get_formatted_summary()
-        print(summary_text)
+    def _add_routes(self, page, serviceArea, facility, routes):
+        """Add each route of {route: ranges} through the rules dialog; returns how many were added"""
+        waiter = self.waiter_for(page)
+        yield lambda: waiter.stable("id=postal-code-rules-panel")
+        added = 0
+        for route, ranges in routes.items():
+            yield lambda: waiter.visible("id=add-button")
+            yield lambda: page.click("id=add-button")
+            self._send_progress_update(f"  Processing Route: {route} ({facility})", "info")
+            # Add postal codes for the route once the rules dialog is up
+            yield lambda: waiter.visible("id=rules-dialog-route-select")
+            if (yield from self._add_postal_codes(page, route, ranges, serviceArea, facility)):
+                added += 1
+        return added
 
-    def load_data(self):
-        self._send_progress_update("LOADING DATA", "info")
+    def _read_rules(self, page, routes):
+        """The open rules table as parse_rules returns it, or None when it can't be read completely"""
+        try:
+            waiter = self.waiter_for(page)
+            # the header row is rendered with the facility's rules; wait for the rows under it to settle
+            yield lambda: waiter.visible("th[role='columnheader']")
+            yield lambda: waiter.stable("id=postal-code-rules-panel")
+            return parse_rules((yield lambda: page.evaluate(RULES_SCRIPT, [ROW_SELECTOR])), routes)
+        except Exception as e:
+            self._send_progress_update(f"❌ Error reading postal code rules: {e}", "error")
+            return None
 
-    def bot_main(self):
-        # Fixed data structure building
-        self._send_progress_update("Building data structure...", "info")
-        
-        # Start browser and load the page
-        if not self.start_browser():
-            self._send_progress_update("Failed to start browser", "error")
-            return
-            
-        if not self.load_page():
-            self._send_progress_update("Failed to load page", "error")
-            self.close_browser()
-            return
-        self.cur.execute("SELECT DISTINCT CTRY FROM Service_Area;")
-        countries = self.cur.fetchall()
-        for country in countries:
-            self.go_to_country(country[0])
-            try:
+    def _delete_rules(self, page, row_routes, routes):
+        """Tick the rows of the given routes and delete them; False if the deletion didn't go through"""
+        try:
+            waiter = self.waiter_for(page)
+            # the rows are checked against what read_rules saw before any of them is ticked
+            ticks = rows_to_tick(row_routes, routes)
+            if not (yield lambda: page.locator(ROW_SELECTOR).evaluate_all(TICK_SCRIPT, [ticks, ROW_CHECKBOX])):
+                self._send_progress_update("⚠️ Rules table changed since it was read, nothing deleted", "warning")
+                return False
+            remaining = sum(route not in routes for route in row_routes)
+            yield lambda: page.click("id=delete-button")
+            yield lambda: page.locator("id=dialog-yes").click()
+            if not (yield lambda: waiter.stable("id=submit-button", timeout=3000)):
+                self._send_progress_update("⚠️ Could not find submit button after delete", "warning")
+                return False
+            yield lambda: waiter.saved(lambda: page.click("id=submit-button"))
+            # the table re-renders without the deleted rows once the deletion is saved
+            if not (yield lambda: waiter.rows(ROW_SELECTOR, remaining)):
+                self._send_progress_update(f"⚠️ Rules of {sorted(routes)} still shown after delete", "warning")
+                return False
+            yield lambda: page.click("id=postal-code-rules-panel")
+            return True
+        except Exception as e:
+            self._send_progress_update(f"❌ Error deleting rules of {sorted(routes)}: {e}", "error")
+            return False
 
-                self.cur.execute(f"SELECT SA FROM Service_Area WHERE CTRY = '{country[0]}';")
-                serviceAreas = self.cur.fetchall()
-                
+    def _reconcile_facility(self, page, serviceArea, facility, routes):
+        """Bring the open facility's rules in line with {route: ranges}, touching only the routes that differ
+
+        Returns the number of routes added, or None if the rules table could not be read or the stale
+        rules not deleted; the caller then replaces every rule as before.
+        """
+        desired = {route: SyncPlan.zips(ranges) for route, ranges in routes.items()}
+        parsed = yield from self._read_rules(page, desired)
+        if parsed is None:
+            self._send_progress_update(f"⚠️ Could not read every postal code rule of {facility}", "warning")
+            return None
+        current, row_routes = parsed
+        delete, add, unchanged = diff_rules(current, desired)
+        if delete or add:
+            self._send_progress_update(f"{facility}: rules differ for {len(delete)} routes to delete and {len(add)} "
+                                       f"to add; {len(unchanged)} already in sync", "info")
+            if delete and not (yield from self._delete_rules(page, row_routes, set(delete))):
+                return None
+
+        for route, zipCodes in desired.items():
+            if not zipCodes:
+                self._send_progress_update(f"No zip codes for route: {route}", "warning")
+                self.summary['routes_without_zip_codes'].append(f"{route} (at {facility} in {serviceArea})")
+        self.summary['unchanged_routes_count'] += len(unchanged)
+        if not delete and not add:
+            self._send_progress_update(f"✅ {facility} already in sync ({len(unchanged)} routes)", "success")
+            return 0
+
+        added = yield from self._add_routes(page, serviceArea, facility, {route: routes[route] for route in add})
+        yield lambda: page.click("id=submit-button")
+        return added
+
+    def _sync_facility(self, page, serviceArea, facility, routes):
+        """Replace the selected facility's rules with {route: ranges}; returns the number of routes added"""
+        #go to postal code tab
+        yield lambda: page.click("id=postal-code-rules-panel")
+        if self.reconcile:
+            added = yield from self._reconcile_facility(page, serviceArea, facility, routes)
+            if added is not None:
+                return added
+            self._send_progress_update(f"⚠️ Replacing every rule of {facility} instead", "warning")
+        yield from self._delete_postal_codes(page)
+        added = yield from self._add_routes(page, serviceArea, facility, routes)
+        yield lambda: page.click("id=submit-button")
+        return added
+
+
+class Bot(BotBase):
+    """Syncs the plan on one sync_api page, selecting each country, service area and facility in turn"""
+
+    playwright_api = staticmethod(sync_playwright)
+    waiter_class = Waiter
+    dropdown_class = Dropdown
+
+    def start_browser(self):
+        return run_steps(self._start_browser())
+
+    def load_page(self):
+        return run_steps(self._load_page())
+
+    def close_browser(self):
+        run_steps(self._close_browser())
+
+    def log_in(self):
+        return run_steps(self._log_in(self.page))
+
+    def wait_for_title(self, expected_title, timeout=15):
+        return run_steps(self._wait_for_title(self.page, expected_title, timeout))
+
+    def go_to_country(self, country):
+        if not run_steps(self._select_country(self.page, country)):
+            return False
+        self.current_country = country
+        return True
+
+    def go_to_serviceArea(self, serviceArea):
+        if not run_steps(self._select_service_area(self.page, self.current_country, serviceArea)):
+            return False
+        self.current_service_area = serviceArea
+        return True
+
+    def go_to_facility(self, facility):
+        if not run_steps(self._select_facility(self.page, self.current_service_area, facility)):
+            return False
+        self.current_facility = facility
+        return True
+
+    def add_postal_codes(self, route, ranges=None):
+        return run_steps(self._add_postal_codes(self.page, route, ranges, self.current_service_area,
+                                                self.current_facility))
+
+    def delete_postal_codes(self):
+        run_steps(self._delete_postal_codes(self.page))
+
+    def sync_plan(self, plan):
+        """Walk a plan on the logged-in page"""
+        for country, serviceAreas in plan.tree.items():
+            self.go_to_country(country)
+            try:
                 total_service_areas = len(serviceAreas)
-                self._send_progress_update(f"Found {total_service_areas} service areas to process in {country[0]}", "info")
+                self._send_progress_update(f"Found {total_service_areas} service areas to process in {country}", "info")
                 # Process each service area
-                for i, sa in enumerate(serviceAreas, 1):
-                    self._send_progress_update(f"\n--- Processing Service Area {i}/{total_service_areas}: {sa[0]} ---", "info")
+                for i, (sa, facilities) in enumerate(serviceAreas.items(), 1):
+                    self._send_progress_update(f"\n--- Processing Service Area {i}/{total_service_areas}: {sa} ---", "info")
                     
-                    success = self.go_to_serviceArea(sa[0])
+                    success = self.go_to_serviceArea(sa)
                     if not success:
-                        self._send_progress_update(f"Failed to navigate to service area: {sa[0]}", "error")
+                        self._send_progress_update(f"Failed to navigate to service area: {sa}", "error")
                         # Send service area completion even if failed
-                        self._send_service_area_complete(sa[0], 0, 0)
+                        self._send_service_area_complete(sa, 0, 0)
                         continue
                         
-                    self.cur.execute(f"SELECT FAC FROM Facility WHERE SA='{sa[0]}';")
-                    facilities = self.cur.fetchall()
                     facilities_processed = 0
                     routes_processed = 0
                     
-                    for fa in facilities:
-                        self._send_progress_update(f"Processing facility: {fa[0]}", "info")
-                        success = self.go_to_facility(fa[0])
+                    for fa, routes in facilities.items():
+                        self._send_progress_update(f"Processing facility: {fa}", "info")
+                        success = self.go_to_facility(fa)
                         if not success:
-                            self._send_progress_update(f"Failed to navigate to facility: {fa[0]}", "error")
+                            self._send_progress_update(f"Failed to navigate to facility: {fa}", "error")
                             continue
                             
                         facilities_processed += 1
-                        
-                        #go to postal code tab
-                        self.page.click("id=postal-code-rules-panel")
-                        self.delete_postal_codes()
-                        self.cur.execute(f"""
-                            SELECT Rt 
-                            FROM Route r 
-                            WHERE FAC = '{fa[0]}' 
-                            AND EXISTS (
-                                SELECT 1 
-                                FROM ZipCode z 
-                                WHERE z.Rt = r.Rt
-                            );
-                        """)
-                        routes = self.cur.fetchall()
-                        r_count = 0                    
-                        for route in routes:
-                            if r_count == 0:
-                                time.sleep(.7)
-                            self.page.click("id=add-button")
-                            self._send_progress_update(f"  Processing Route: {route[0]}", "info")
-                            # Add postal codes for the route
-                            if r_count == 0:
-                                time.sleep(.7)
-                            if self.add_postal_codes(route[0]):
-                                routes_processed += 1
-                            r_count += 1
-
-                        self.page.click("id=submit-button")
+                        routes_processed += run_steps(self._sync_facility(self.page, sa, fa, routes))
                     
                     # Send service area completion callback
-                    self._send_service_area_complete(sa[0], facilities_processed, routes_processed)
+                    self._send_service_area_complete(sa, facilities_processed, routes_processed)
                             
                 
             except Exception as e:
                 self._send_progress_update(f"Error in bot_main: {e}", "error")
             finally:
-                self._send_progress_update(f"COUNTRY {country[0]} Completed")
+                self._send_progress_update(f"COUNTRY {country} Completed")
+
+    def run_shard(self, logged_in=None):
+        """Sync this bot's plan in its own browser; used by run_parallel
+
+        logged_in: threading.Event set once load_page has finished, whether or not it succeeded
+        """
+        if not self.start_browser():
+            self._send_progress_update("Failed to start browser", "error")
+            return False
+        try:
+            loaded = self.load_page()
+            if logged_in:
+                logged_in.set()
+            if not loaded:
+                self._send_progress_update("Failed to load page", "error")
+                return False
+            self.sync_plan(self.get_plan())
+            self._send_wait_report()
+            return True
+        finally:
+            self.close_browser()
+
+    def bot_main(self):
+        # Fixed data structure building
+        self._send_progress_update("Building data structure...", "info")
+        
+        # Start browser and load the page
+        if not self.start_browser():
+            self._send_progress_update("Failed to start browser", "error")
+            return
+            
+        if not self.load_page():
+            self._send_progress_update("Failed to load page", "error")
+            self.close_browser()
+            return
+        self.sync_plan(self.get_plan())
+        self._send_wait_report()
         self._send_final_summary()
                 
         # Keep browser open for debugging
@@ -582,7 +792,89 @@ class Bot:
             input("Press Enter to close browser...")
         self.close_browser()
 
-def run_bot(url, filepath, progress_callback=None, summary_callback=None):
+def merge_summaries(summaries):
+    """Combine the summaries of several bots; names seen by more than one shard are listed once"""
+    merged = empty_summary()
+    for summary in summaries:
+        for key, value in summary.items():
+            if isinstance(value, list):
+                seen = merged.setdefault(key, [])
+                seen.extend(item for item in value if item not in seen)
+            else:
+                merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+def run_parallel(url, filepath, workers, progress_callback=None, summary_callback=None, plan=None, by="facility",
+                 session_path=SESSION_PATH, reconcile=False):
+    """Sync the plan in up to `workers` shards of similar estimated cost, one thread and browser each
+
+    by: "facility" or "service_area", the unit a shard is built from
+    """
+    if plan is None:
+        with closing(connect()) as conn:
+            plan = SyncPlan.build(conn.cursor())
+    elif isinstance(plan, str):
+        plan = SyncPlan.load(plan)
+    shards = plan.shard(workers, by)
+    if not shards:
+        message = "Nothing to sync: the plan has no facilities"
+        if progress_callback:
+            progress_callback(message, "warning")
+        else:
+            print(message)
+
+    def shard_callback(n):
+        def callback(message, status="info"):
+            if progress_callback:
+                # service area completions are dicts the GUI reads as they are
+                progress_callback(message if isinstance(message, dict) else f"[shard {n}] {message}", status)
+            else:
+                print(f"[shard {n}] {message}")
+        return callback
+
+    # Playwright's sync API is bound to the thread that started it, so every thread builds its own Bot
+    bots = [None] * len(shards)
+
+    ready = threading.Event()
+
+    def work(n, shard):
+        try:
+            bots[n] = Bot(url, filepath, shard_callback(n + 1), None, shard, session_path)
+            bots[n].reconcile = reconcile
+            bots[n].run_shard(ready if n == 0 else None)
+        except Exception as e:
+            shard_callback(n + 1)(f"Shard failed: {e}", "error")
+        finally:
+            ready.set()
+
+    for n, shard in enumerate(shards, 1):
+        counts = shard.summary()
+        shard_callback(n)(f"{counts['facilities']} facilities, {counts['routes']} routes, {counts['zips']} zip codes "
+                          f"(estimated cost {counts['cost']:.0f})", "info")
+    threads = [threading.Thread(target=work, args=(n, shard), daemon=True) for n, shard in enumerate(shards)]
+    # the first shard logs in (or checks the saved session) alone; the others then start from its session
+    if threads:
+        threads[0].start()
+        ready.wait()
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    summary = merge_summaries([bot.summary for bot in bots if bot is not None])
+    if summary_callback:
+        summary_callback(format_summary(summary))
+    else:
+        print(format_summary(summary))
+    return summary
+
+
+ENGINES = ("sync", "async")
+
+
+def run_bot(url, filepath, progress_callback=None, summary_callback=None, plan=None, workers=1, engine="sync",
+            session_path=SESSION_PATH, reconcile=False):
     """Initialize the Bot with the URL and Excel of Data we are using
     
     Args:
@@ -593,11 +885,31 @@ def run_bot(url, filepath, progress_callback=None, summary_callback=None):
                           Status can be: "info", "success", "error", "warning", "service_area_complete"
         summary_callback: Function to call when execution is complete
                          Signature: callback(summary_text)
+        plan: SyncPlan, or the path of one saved with SyncPlan.save(), to sync instead of the database
+        workers: Number of browsers syncing shards of the plan in parallel, see run_parallel;
+            with the async engine, the number of facilities synced at once on pages of one browser
+        engine: "sync" (Bot) or "async" (async_bot.AsyncBot)
+        session_path: Where the logged-in session is saved and reused; None logs in on every run
+        reconcile: Only delete and re-add the routes whose zips differ from the rules already shown
     """
-    bot = Bot(url, filepath, progress_callback, summary_callback)
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}, expected one of {ENGINES}")
+    if engine == "async":
+        from async_bot import run_async_bot
+        return run_async_bot(url, filepath, progress_callback, summary_callback, plan, max(workers, 1), session_path,
+                             reconcile)
+    if workers > 1:
+        return run_parallel(url, filepath, workers, progress_callback, summary_callback, plan,
+                            session_path=session_path, reconcile=reconcile)
+    bot = Bot(url, filepath, progress_callback, summary_callback, plan, session_path)
+    bot.reconcile = reconcile
     bot.bot_main()
 
 if __name__ == "__main__":
     filepath = ""
     url = webpage
-    run_bot(url, filepath)
+    # optional arguments: number of parallel browsers (or pages, for async), the engine, and --reconcile
+    args = [arg for arg in sys.argv[1:] if arg != "--reconcile"]
+    workers = int(args[0]) if len(args) > 0 else 1
+    engine = args[1] if len(args) > 1 else "sync"
+    run_bot(url, filepath, workers=workers, engine=engine, reconcile="--reconcile" in sys.argv)
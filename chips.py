@@ -0,0 +1,80 @@
+import re
+
+from steps import run_steps
+
+# Postal codes go into the rules dialog as Angular Material chips: one chip per zip typed into
+# #chipInput and committed with Enter.
+CHIP_INPUT = "#chipInput"
+CHIP_SELECTOR = "mat-chip-row, mat-chip, .mat-mdc-chip"
+
+# zips sent per page.evaluate call; keeps a single call from blocking the page for too long
+CHIP_BATCH = 1000
+
+# Types every zip of a batch in one call: set the value, fire input, then a keydown Enter that
+# MatChipInput accepts (it checks keyCode, which a constructed KeyboardEvent leaves at 0).
+BULK_SCRIPT = """
+([selector, zips]) => {
+    const input = document.querySelector(selector);
+    if (!input) {
+        return -1;
+    }
+    for (const zip of zips) {
+        input.value = zip;
+        input.dispatchEvent(new Event('input', {bubbles: true}));
+        const enter = new KeyboardEvent('keydown', {key: 'Enter', code: 'Enter', bubbles: true, cancelable: true});
+        Object.defineProperty(enter, 'keyCode', {get: () => 13});
+        Object.defineProperty(enter, 'which', {get: () => 13});
+        input.dispatchEvent(enter);
+    }
+    return zips.length;
+}
+"""
+
+COUNT_SCRIPT = "([selector, expected]) => document.querySelectorAll(selector).length >= expected"
+
+
+def chip_count(page):
+    return page.locator(CHIP_SELECTOR).count()
+
+
+def add_chips(page, zips, bulk=True):
+    """Add a route's zips as chips; returns 'bulk', 'fallback' (bulk, then per zip for the rest) or 'per_zip'"""
+    return run_steps(chip_steps(page, zips, bulk))
+
+
+def chip_steps(page, zips, bulk=True):
+    """add_chips as steps, see steps.py; Bot and AsyncBot run these inside their own steps"""
+    if not bulk:
+        yield from _add_each(page, zips)
+        return 'per_zip'
+    if (yield from _add_bulk(page, zips)) == len(zips):
+        return 'bulk'
+    shown = yield from _chip_zips(page)
+    yield from _add_each(page, [zipCode for zipCode in zips if zipCode not in shown])
+    return 'fallback'
+
+
+def _chip_zips(page):
+    """The zips shown as chips; a chip's text also holds its remove icon"""
+    texts = yield lambda: page.locator(CHIP_SELECTOR).all_text_contents()
+    return {match for text in texts for match in re.findall(r"\d{5}", text)}
+
+
+def _add_each(page, zips):
+    """One fill and one Enter per zip"""
+    for zipCode in zips:
+        yield lambda: page.fill(CHIP_INPUT, zipCode)
+        yield lambda: page.keyboard.press("Enter")
+
+
+def _add_bulk(page, zips, timeout=5000):
+    """Type zips in batches of CHIP_BATCH per browser call; returns how many chips appeared"""
+    before = yield lambda: page.locator(CHIP_SELECTOR).count()
+    for i in range(0, len(zips), CHIP_BATCH):
+        if (yield lambda: page.evaluate(BULK_SCRIPT, [CHIP_INPUT, zips[i:i + CHIP_BATCH]])) < 0:
+            return 0
+    try:
+        yield lambda: page.wait_for_function(COUNT_SCRIPT, arg=[CHIP_SELECTOR, before + len(zips)], timeout=timeout)
+    except Exception:
+        pass  # counted below; whatever is missing goes through the per-zip path
+    return (yield lambda: page.locator(CHIP_SELECTOR).count()) - before
@@ -1,164 +1,1859 @@
 import sqlite3
 import sys
 import os
+import time
+import json
+import csv
+import io
+import struct
+import hashlib
+import threading
+import heapq
+import queue
+from array import array
+from bisect import bisect_right
+from contextlib import contextmanager, closing, suppress
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Manager
 from openpyxl import Workbook, load_workbook
 from openpyxl.utils import get_column_letter
 
+try:
+    import numpy as np
+except ImportError:  # ranges are expanded with the pure-Python iter_zips instead
+    np = None
+
+# parameterised inserts, in the order the tables have to be written (parents first)
+INSERTS = {
+    'Service_Area': "INSERT INTO Service_Area (SA, CTRY) VALUES (?, ?)",
+    'Facility': "INSERT INTO Facility (FAC, SA) VALUES (?, ?)",
+    'Route': "INSERT INTO Route (Rt, FAC, Src) VALUES (?, ?, ?)",
+    'ZipRange': "INSERT INTO ZipRange (Rt, Start, End, Src) VALUES (?, ?, ?, ?)",
+}
+
+# managed indexes: built once the rows are in, never maintained row by row during a bulk load
+INDEXES = {
+    'idx_service_area_ctry': "CREATE INDEX IF NOT EXISTS idx_service_area_ctry ON Service_Area (CTRY)",
+    'idx_facility_sa': "CREATE INDEX IF NOT EXISTS idx_facility_sa ON Facility (SA)",
+    'idx_route_fac': "CREATE INDEX IF NOT EXISTS idx_route_fac ON Route (FAC, Rt)",
+    'idx_route_rt': "CREATE INDEX IF NOT EXISTS idx_route_rt ON Route (Rt, FAC)",
+    'idx_route_src': "CREATE INDEX IF NOT EXISTS idx_route_src ON Route (Src)",
+    'idx_ziprange_rt': "CREATE INDEX IF NOT EXISTS idx_ziprange_rt ON ZipRange (Rt, Start, End)",
+    'idx_ziprange_src': "CREATE INDEX IF NOT EXISTS idx_ziprange_src ON ZipRange (Src, Rt)",
+}
+
+# the queries the bot and GUI run on every sync; check_query_plans() keeps them off table scans
+HOT_QUERIES = {
+    'countries': "SELECT DISTINCT CTRY FROM Service_Area",
+    'service_areas': "SELECT SA FROM Service_Area WHERE CTRY = ?",
+    'facilities': "SELECT FAC FROM Facility WHERE SA = ?",
+    'facility_routes': """
+        SELECT Rt
+        FROM Route r
+        WHERE FAC = ?
+        AND EXISTS (
+            SELECT 1
+            FROM ZipRange z
+            WHERE z.Rt = r.Rt
+        )""",
+    'route_ranges': "SELECT Start, End FROM ZipRange WHERE Rt = ?",
+    'routes_with_zips': """
+        SELECT DISTINCT r.Rt
+        FROM Route r
+        WHERE EXISTS (
+            SELECT 1
+            FROM ZipRange z
+            WHERE z.Rt = r.Rt
+        )
+        ORDER BY r.Rt""",
+}
+
+# indexes for the compact layout; its primary keys already cover the route and facility lookups
+COMPACT_INDEXES = {
+    'idx_service_area_c_ctry': "CREATE INDEX IF NOT EXISTS idx_service_area_c_ctry ON Service_Area_C (CTRY, SA)",
+    'idx_facility_c_sa': "CREATE INDEX IF NOT EXISTS idx_facility_c_sa ON Facility_C (SA_Id)",
+    'idx_route_c_rt': "CREATE INDEX IF NOT EXISTS idx_route_c_rt ON Route_C (Rt_Id)",
+    'idx_route_c_src': "CREATE INDEX IF NOT EXISTS idx_route_c_src ON Route_C (Src_Id)",
+    'idx_ziprange_c_src': "CREATE INDEX IF NOT EXISTS idx_ziprange_c_src ON ZipRange_C (Src_Id)",
+}
+
+# bumped whenever the tables change shape; an incremental load rebuilds older databases.
+# user_version stores SCHEMA_VERSION, plus COMPACT_LAYOUT when the compact schema is in use.
+SCHEMA_VERSION = 2
+COMPACT_LAYOUT = 1000
+
+# everything a layout owns, dropped (whatever its type) when the schema is rebuilt
+LAYOUT_OBJECTS = ['ZipCode', 'ZipRange', 'Route', 'Facility', 'Service_Area', 'Source_Key', 'Source_File',
+                  'ZipRange_C', 'Route_C', 'Route_Name', 'Source_Name', 'Facility_C', 'Service_Area_C']
+
+# Compact layout: names interned to integer ids, zips as integers, WITHOUT ROWID tables keyed by
+# composite primary keys. Views with INSTEAD OF triggers expose the same Service_Area, Facility,
+# Route and ZipRange rows as the plain layout, so every reader and writer stays unchanged.
+# It trades read speed for size: every read through a view joins the name tables back in, which
+# covering indexes can't avoid. At 100k routes with 20-wide ranges `bench.py compact` shows the file
+# shrinking from 17.2 to 9.8 MB while facility_routes goes from 0.6 to 1.2 ms and routes_with_zips
+# from 170 to 310 ms, so it suits size-bound deployments rather than faster syncs.
+COMPACT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS Service_Area_C (
+    SA_Id INTEGER PRIMARY KEY,
+    SA CHAR(3) NOT NULL UNIQUE,
+    CTRY CHAR(2));
+
+CREATE TABLE IF NOT EXISTS Facility_C (
+    FAC_Id INTEGER PRIMARY KEY,
+    FAC CHAR(3) NOT NULL UNIQUE,
+    SA_Id INTEGER);
+
+CREATE TABLE IF NOT EXISTS Route_Name (
+    Rt_Id INTEGER PRIMARY KEY,
+    Rt VARCHAR(10) NOT NULL UNIQUE);
+
+CREATE TABLE IF NOT EXISTS Source_Name (
+    Src_Id INTEGER PRIMARY KEY,
+    Src TEXT NOT NULL UNIQUE);
+
+CREATE TABLE IF NOT EXISTS Route_C (
+    FAC_Id INTEGER NOT NULL,
+    Rt_Id INTEGER NOT NULL,
+    Src_Id INTEGER NOT NULL,
+    PRIMARY KEY (FAC_Id, Rt_Id, Src_Id)) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS ZipRange_C (
+    Rt_Id INTEGER NOT NULL,
+    Start INTEGER NOT NULL,
+    End INTEGER NOT NULL,
+    Src_Id INTEGER NOT NULL,
+    PRIMARY KEY (Rt_Id, Start, Src_Id)) WITHOUT ROWID;
+
+CREATE VIEW IF NOT EXISTS Service_Area AS
+    SELECT SA, CTRY FROM Service_Area_C;
+
+CREATE VIEW IF NOT EXISTS Facility AS
+    SELECT f.FAC, s.SA FROM Facility_C f JOIN Service_Area_C s ON s.SA_Id = f.SA_Id;
+
+CREATE VIEW IF NOT EXISTS Route AS
+    SELECT n.Rt, f.FAC, src.Src FROM Route_C r
+    JOIN Route_Name n ON n.Rt_Id = r.Rt_Id
+    JOIN Facility_C f ON f.FAC_Id = r.FAC_Id
+    JOIN Source_Name src ON src.Src_Id = r.Src_Id;
+
+CREATE VIEW IF NOT EXISTS ZipRange AS
+    SELECT n.Rt, z.Start, z.End, src.Src FROM ZipRange_C z
+    JOIN Route_Name n ON n.Rt_Id = z.Rt_Id
+    JOIN Source_Name src ON src.Src_Id = z.Src_Id;
+
+CREATE TRIGGER IF NOT EXISTS Service_Area_insert INSTEAD OF INSERT ON Service_Area BEGIN
+    INSERT INTO Service_Area_C (SA, CTRY) VALUES (NEW.SA, NEW.CTRY);
+END;
+
+CREATE TRIGGER IF NOT EXISTS Service_Area_delete INSTEAD OF DELETE ON Service_Area BEGIN
+    DELETE FROM Service_Area_C WHERE SA = OLD.SA;
+END;
+
+CREATE TRIGGER IF NOT EXISTS Facility_insert INSTEAD OF INSERT ON Facility BEGIN
+    INSERT INTO Facility_C (FAC, SA_Id) VALUES (NEW.FAC, (SELECT SA_Id FROM Service_Area_C WHERE SA = NEW.SA))
+        ON CONFLICT (FAC) DO UPDATE SET SA_Id = excluded.SA_Id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS Facility_delete INSTEAD OF DELETE ON Facility BEGIN
+    DELETE FROM Facility_C WHERE FAC = OLD.FAC;
+END;
+
+CREATE TRIGGER IF NOT EXISTS Route_insert INSTEAD OF INSERT ON Route BEGIN
+    INSERT OR IGNORE INTO Route_Name (Rt) VALUES (NEW.Rt);
+    INSERT OR IGNORE INTO Source_Name (Src) VALUES (COALESCE(NEW.Src, ''));
+    -- a route can name a facility that never got an SA; intern it so the route is kept
+    INSERT OR IGNORE INTO Facility_C (FAC) VALUES (NEW.FAC);
+    INSERT OR IGNORE INTO Route_C (FAC_Id, Rt_Id, Src_Id) VALUES (
+        (SELECT FAC_Id FROM Facility_C WHERE FAC = NEW.FAC),
+        (SELECT Rt_Id FROM Route_Name WHERE Rt = NEW.Rt),
+        (SELECT Src_Id FROM Source_Name WHERE Src = COALESCE(NEW.Src, '')));
+END;
+
+CREATE TRIGGER IF NOT EXISTS Route_delete INSTEAD OF DELETE ON Route BEGIN
+    DELETE FROM Route_C
+    WHERE FAC_Id = (SELECT FAC_Id FROM Facility_C WHERE FAC = OLD.FAC)
+    AND Rt_Id = (SELECT Rt_Id FROM Route_Name WHERE Rt = OLD.Rt)
+    AND Src_Id = (SELECT Src_Id FROM Source_Name WHERE Src = OLD.Src);
+END;
+
+CREATE TRIGGER IF NOT EXISTS ZipRange_insert INSTEAD OF INSERT ON ZipRange BEGIN
+    INSERT OR IGNORE INTO Route_Name (Rt) VALUES (NEW.Rt);
+    INSERT OR IGNORE INTO Source_Name (Src) VALUES (COALESCE(NEW.Src, ''));
+    INSERT OR IGNORE INTO ZipRange_C (Rt_Id, Start, End, Src_Id) VALUES (
+        (SELECT Rt_Id FROM Route_Name WHERE Rt = NEW.Rt),
+        NEW.Start,
+        NEW.End,
+        (SELECT Src_Id FROM Source_Name WHERE Src = COALESCE(NEW.Src, '')));
+END;
+
+CREATE TRIGGER IF NOT EXISTS ZipRange_delete INSTEAD OF DELETE ON ZipRange BEGIN
+    DELETE FROM ZipRange_C
+    WHERE Rt_Id = (SELECT Rt_Id FROM Route_Name WHERE Rt = OLD.Rt)
+    AND Start = OLD.Start
+    AND Src_Id = (SELECT Src_Id FROM Source_Name WHERE Src = OLD.Src);
+END;
+"""
+
+# pragmas for the duration of a bulk load; the previous values are restored afterwards
+BULK_PRAGMAS = {
+    'journal_mode': 'MEMORY',
+    'synchronous': 'OFF',
+    'cache_size': -256000,  # negative means KiB, so ~250 MB
+}
+
+# A checkpointed load on disk has to survive a crash with every committed workbook intact, which a
+# memory journal without syncs can't promise. WAL with synchronous=NORMAL still skips the fsync per
+# commit but never leaves a half-written page behind; a crash only loses the last few checkpoints.
+CHECKPOINT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+}
+
+
+def _value(row, index):
+    # read-only rows can come back shorter than the header when trailing cells are empty
+    return row[index] if index < len(row) else None
+
+
+# Loads build a new generation file (A4G.1.db, A4G.2.db, ...) and publish it by rewriting a small
+# pointer file. Readers resolve the pointer when they connect and keep reading their generation until
+# they close it. The database file itself is never replaced, which Windows refuses while it is open.
+DB_NAME = 'A4G.db'
+POINTER_SUFFIX = '.current'
+
+
+def generations(path=DB_NAME):
+    """Return the (number, file) generations of a database, oldest first"""
+    folder = os.path.dirname(os.path.abspath(path))
+    stem, ext = os.path.splitext(os.path.basename(path))
+    found = []
+    for name in os.listdir(folder):
+        number = name[len(stem) + 1:-len(ext)] if name.startswith(stem + '.') and name.endswith(ext) else ''
+        if number.isdigit():
+            found.append((int(number), os.path.join(os.path.dirname(path), name)))
+    return sorted(found)
+
+
+def resolve_db(path=DB_NAME):
+    """Return the generation file path currently points at, or path itself before the first swap"""
+    try:
+        with open(path + POINTER_SUFFIX) as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return path
+    current = os.path.join(os.path.dirname(path), name)
+    return current if name and os.path.exists(current) else path
+
+
+def connect(path=DB_NAME, timeout=30):
+    """Open the current generation of the database in WAL mode"""
+    conn = sqlite3.connect(resolve_db(path), timeout=timeout)
+    conn.execute("PRAGMA journal_mode = WAL")
+    return conn
+
+
+def building_generation(path=DB_NAME):
+    """Return the generation the next load builds into: always the one after the published generation"""
+    current = os.path.abspath(resolve_db(path))
+    number = next((number for number, file in generations(path) if os.path.abspath(file) == current), 0)
+    stem, ext = os.path.splitext(path)
+    # a fixed name lets an interrupted load find its half-built file again
+    return f"{stem}.{number + 1}{ext}"
+
+
+def remove_db(file):
+    """Delete a database file with its WAL, shared-memory and journal files"""
+    for name in (file, file + '-wal', file + '-shm', file + '-journal'):
+        try:
+            os.remove(name)
+        except FileNotFoundError:
+            pass
+
+
+def publish_generation(path, generation):
+    """Point path at a finished generation and delete every generation but it and the one it replaces"""
+    previous = resolve_db(path)
+    tmp = path + POINTER_SUFFIX + '.tmp'
+    with open(tmp, 'w') as f:
+        f.write(os.path.basename(generation))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path + POINTER_SUFFIX)
+
+    # the previous generation is kept for readers that opened it before the swap
+    keep = {os.path.abspath(generation), os.path.abspath(previous)}
+    for _, file in generations(path):
+        if os.path.abspath(file) in keep:
+            continue
+        try:
+            remove_db(file)
+        except OSError:
+            # still open somewhere (Windows); the next publish tries again
+            pass
+
+
+def merge_ranges(ranges):
+    """Sort (start, end) ranges and merge the ones that overlap or touch"""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_ranges(ranges, other):
+    """Return the parts of merged ranges that are not covered by the merged ranges in other"""
+    result = []
+    i = 0
+    for start, end in ranges:
+        while i < len(other) and other[i][1] < start:
+            i += 1
+        j = i
+        while j < len(other) and other[j][0] <= end:
+            if other[j][0] > start:
+                result.append((start, other[j][0] - 1))
+            start = max(start, other[j][1] + 1)
+            j += 1
+        if start <= end:
+            result.append((start, end))
+    return result
+
+
+def iter_zips(ranges):
+    """Lazily yield the distinct zero-padded zips covered by (start, end) ranges"""
+    for start, end in merge_ranges(ranges):
+        for code in range(start, end + 1):
+            yield str(code).zfill(5)
+
+
+# ranges expanded per vectorised pass; bounds the int64 arrays to a few tens of MB
+EXPAND_CODES = 2_000_000
+
+
+def expand_ranges(rows):
+    """Expand (key, start, end) rows in one pass into (keys, key_index, codes), distinct and sorted per key"""
+    if not rows:
+        return [], np.empty(0, np.int64), np.empty(0, np.int64)
+    keys, starts, ends = zip(*rows)
+    ids = {}
+    index = np.fromiter((ids.setdefault(key, len(ids)) for key in keys), np.int64, len(keys))
+    starts = np.asarray(starts, np.int64)
+    lengths = np.maximum(np.asarray(ends, np.int64) - starts + 1, 0)
+    # each range becomes a run of consecutive integers: arange shifted back to the start of its run
+    offsets = np.cumsum(lengths) - lengths
+    codes = np.arange(int(lengths.sum()), dtype=np.int64) - np.repeat(offsets - starts, lengths)
+    index = np.repeat(index, lengths)
+    if not codes.size:
+        return list(ids), index, codes
+    # pack (key, code) into one integer so a single sort dedups and orders both
+    span = int(codes.max()) + 1
+    packed = np.sort(index * span + codes)
+    distinct = np.empty(packed.size, bool)
+    distinct[0] = True
+    np.not_equal(packed[1:], packed[:-1], out=distinct[1:])
+    packed = packed[distinct]
+    return list(ids), packed // span, packed % span
+
+
+_zip_table = None
+
+
+def format_zips(codes):
+    """Zero-pad an integer code array to five-character zip strings"""
+    global _zip_table
+    top = int(codes.max()) + 1 if codes.size else 0
+    if _zip_table is None or top > len(_zip_table):
+        # each code is formatted once per process, then every expansion is a gather
+        _zip_table = np.array([str(code).zfill(5) for code in range(max(top, 100000))])
+    return _zip_table[codes]
+
+
+def iter_zip_batches(rows, max_codes=EXPAND_CODES):
+    """Yield (key, [zips]) per key for (key, start, end) rows grouped by key, expanding whole groups at once"""
+    if np is None:
+        key, ranges = None, []
+        for row_key, start, end in rows:
+            if row_key != key:
+                if key is not None:
+                    yield key, list(iter_zips(ranges))
+                key, ranges = row_key, []
+            ranges.append((start, end))
+        if key is not None:
+            yield key, list(iter_zips(ranges))
+        return
+
+    def expand(pending):
+        keys, index, codes = expand_ranges(pending)
+        zips = format_zips(codes).tolist()
+        # index is sorted, so each key owns one contiguous slice
+        bounds = np.searchsorted(index, np.arange(len(keys) + 1)).tolist()
+        for i, key in enumerate(keys):
+            if bounds[i] < bounds[i + 1]:
+                yield key, zips[bounds[i]:bounds[i + 1]]
+
+    pending, codes, key = [], 0, None
+    for row in rows:
+        # only cut between keys so every key is deduplicated within a single pass
+        if row[0] != key and codes >= max_codes:
+            yield from expand(pending)
+            pending, codes = [], 0
+        key = row[0]
+        pending.append(row)
+        codes += max(row[2] - row[1] + 1, 0)
+    if pending:
+        yield from expand(pending)
+
+
+def route_zips(cur, route):
+    """Drop-in for SELECT DISTINCT Zip FROM ZipCode WHERE Rt = route, lazily yielding the zips in order
+
+    The route's ranges are merged once, then expanded at most EXPAND_CODES zips at a time, so a wide
+    route is never held as one list.
+    """
+    ranges = merge_ranges(cur.execute(HOT_QUERIES['route_ranges'], (route,)).fetchall())
+    if np is None:
+        yield from iter_zips(ranges)
+        return
+    for start, end in ranges:
+        for low in range(start, end + 1, EXPAND_CODES):
+            yield from format_zips(np.arange(low, min(low + EXPAND_CODES, end + 1), dtype=np.int64)).tolist()
+
+
+def check_query_plans(cur):
+    """Raise if any hot query falls back to a full table scan; returns the plans otherwise"""
+    plans = {}
+    scans = []
+    for name, query in HOT_QUERIES.items():
+        params = ('',) * query.count('?')
+        plans[name] = [row[3] for row in cur.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+        # "SCAN t USING [COVERING] INDEX" walks an index; a bare "SCAN t" reads the whole table
+        scans.extend(f"{name}: {detail}" for detail in plans[name]
+                     if detail.startswith('SCAN') and 'INDEX' not in detail)
+    if scans:
+        raise RuntimeError("Hot queries fall back to table scans:\n" + "\n".join(scans))
+    return plans
+
+
+def iter_joined_zips(cur):
+    """Yield (Country, ServiceArea, Facility, Route, ZipCode) rows with the ranges expanded"""
+    cur.execute("""
+        SELECT sa.CTRY, sa.SA, f.FAC, r.Rt, z.Start, z.End
+        FROM Service_Area sa
+        INNER JOIN Facility f ON sa.SA = f.SA
+        INNER JOIN Route r ON f.FAC = r.FAC
+        INNER JOIN ZipRange z ON r.Rt = z.Rt
+        ORDER BY sa.CTRY, sa.SA, f.FAC, r.Rt
+    """)
+    rows = (((ctry, sa, fac, rt), start, end) for ctry, sa, fac, rt, start, end in cur)
+    for key, zips in iter_zip_batches(rows):
+        for code in zips:
+            yield key + (code,)
+
+
+# rows between two on_rows callbacks while a sheet is read
+PROGRESS_ROWS = 5000
+
+
+def _counted(rows, max_row, on_rows):
+    if on_rows is None:
+        yield from rows
+        return
+    # max_row comes from the sheet's dimension record and can be missing
+    total = max_row - 1 if max_row else None
+    for n, row in enumerate(rows, 1):
+        if n % PROGRESS_ROWS == 0:
+            on_rows(n, total)
+        yield row
+
+
+def read_rows(file, sheet, streaming=True, on_rows=None):
+    """Yield the data rows of a sheet as tuples of plain cell values, calling on_rows(done, total) now and then"""
+    if streaming:
+        # read-only mode parses the sheet XML lazily, so memory stays flat as the sheet grows
+        wb = load_workbook(file, read_only=True, data_only=True)
+        try:
+            ws = wb[sheet]
+            yield from _counted(ws.iter_rows(min_row=2, values_only=True), ws.max_row, on_rows)
+        finally:
+            wb.close()
+    else:
+        wb = load_workbook(file)
+        ws = wb[sheet]
+        rows = (tuple(cell.value for cell in row) for row in ws.iter_rows(2, ws.max_row + 1))
+        yield from _counted(rows, ws.max_row, on_rows)
+
+
+def workbooks(folder):
+    return [os.path.join(folder, f) for f in sorted(os.listdir(folder)) if f.endswith('xlsx')]
+
+
+def source_id(kind, file):
+    # keyed by file name so the GUI's temporary copies map onto the same source
+    return f"{kind}/{os.path.basename(file)}"
+
+
+def file_hash(file):
+    digest = hashlib.sha1()
+    with open(file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Parsers return batches whose data lazily yields plain tuples, so a sheet streams straight into the
+# writer without being held in memory; batch['rows'] counts the sheet rows read so far. Parsing happens
+# while the writer consumes the rows, so its time is counted there and 'seconds' starts at 0.
+def parse_kt(file, streaming=True, on_rows=None):
+    batch = {'file': file, 'rows': 0, 'seconds': 0.0}
+
+    def data():
+        for row in read_rows(file, 'TacticalTours', streaming, on_rows):
+            batch['rows'] += 1
+            yield str(_value(row, 0)).strip(), str(_value(row, 9)).strip(), str(_value(row, 11)).strip()
+
+    batch['data'] = data()
+    return batch
+
+
+def parse_att(file, streaming=True, on_rows=None):
+    batch = {'file': file, 'rows': 0, 'seconds': 0.0}
+
+    def data():
+        for row in read_rows(file, 'ATTPostalCode_SP1', streaming, on_rows):
+            batch['rows'] += 1
+            if _value(row, 0) is None or _value(row, 1) is None or _value(row, 2) is None:
+                continue
+            yield str(row[0]).strip(), int(row[1]), int(row[2])
+
+    batch['data'] = data()
+    return batch
+
+
+PARSERS = {'KT': parse_kt, 'ATT': parse_att}
+
+# Binary sidecars: the typed columns of a parsed workbook, stored under .a4gcache next to it.
+# Layout: CACHE_MAGIC, digest and kind as length-prefixed UTF-8, chunks of up to CHUNK_ROWS rows
+# (row count, then each column), a zero row count and the sheet's row total. Integer columns are
+# little-endian int64; text columns are int64 character lengths and one UTF-8 blob. Reading one
+# back only decodes numbers and text, so a file planted in a shared drop folder can't run code.
+CACHE_DIR = '.a4gcache'
+CACHE_MAGIC = b'A4GC2'
+CACHE_BYTES = 512 * 1024 * 1024
+CHUNK_ROWS = 50000
+
+# column types of a parsed row per kind: s = text, q = integer
+COLUMNS = {'KT': 'sss', 'ATT': 'sqq'}
+
+
+def sidecar_path(file, kind, digest):
+    return os.path.join(os.path.dirname(os.path.abspath(file)), CACHE_DIR, f"{digest}.{kind}.bin")
+
+
+def _read_exact(f, size):
+    # read in pieces so a damaged length can't allocate more than the file holds
+    parts = []
+    while size > 0:
+        part = f.read(min(size, 1 << 20))
+        if not part:
+            raise EOFError("truncated sidecar")
+        parts.append(part)
+        size -= len(part)
+    return b''.join(parts)
+
+
+def _write_count(f, n):
+    f.write(struct.pack('<q', n))
+
+
+def _read_count(f):
+    n, = struct.unpack('<q', _read_exact(f, 8))
+    if n < 0:
+        raise ValueError("negative count in sidecar")
+    return n
+
+
+def _write_ints(f, values):
+    column = array('q', values)
+    if sys.byteorder == 'big':
+        column.byteswap()
+    f.write(column.tobytes())
+
+
+def _read_ints(f, n):
+    column = array('q')
+    column.frombytes(_read_exact(f, 8 * n))
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return column
+
+
+def _write_text(f, values):
+    _write_ints(f, [len(value) for value in values])
+    blob = ''.join(values).encode('utf-8')
+    _write_count(f, len(blob))
+    f.write(blob)
+
+
+def _read_text(f, n):
+    lengths = _read_ints(f, n)
+    text = _read_exact(f, _read_count(f)).decode('utf-8')
+    values = []
+    offset = 0
+    for length in lengths:
+        if length < 0:
+            raise ValueError("negative length in sidecar")
+        values.append(text[offset:offset + length])
+        offset += length
+    if offset != len(text):
+        raise ValueError("text lengths don't match the sidecar blob")
+    return values
+
+
+def write_chunk(f, kind, rows):
+    """Write parsed rows as one chunk of typed columns"""
+    _write_count(f, len(rows))
+    for i, column in enumerate(COLUMNS[kind]):
+        (_write_text if column == 's' else _write_ints)(f, [row[i] for row in rows])
+
+
+def read_chunk(f, kind):
+    """Read one chunk back as row tuples; None at the end marker"""
+    n = _read_count(f)
+    if not n:
+        return None
+    columns = [(_read_text if column == 's' else _read_ints)(f, n) for column in COLUMNS[kind]]
+    return list(zip(*columns))
+
+
+def chunked(rows, size=None):
+    """Group rows into lists of up to size rows, CHUNK_ROWS by default"""
+    size = size or CHUNK_ROWS
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class SidecarWriter:
+    """Writes a sidecar chunk by chunk; the first OSError drops it and is kept in error"""
+
+    def __init__(self, path, digest, kind):
+        self.path = path
+        self.kind = kind
+        # written under a temporary name so a parallel worker never reads half a file
+        self.tmp = f"{path}.{os.getpid()}.tmp"
+        self.f = None
+        self.error = None
+        self._try(self._open, digest)
+
+    def _try(self, step, *args):
+        if self.error is None:
+            try:
+                step(*args)
+            except OSError as e:
+                self.error = e
+                self.discard()
+
+    def _open(self, digest):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.f = open(self.tmp, 'wb')
+        self.f.write(CACHE_MAGIC)
+        for value in (digest, self.kind):
+            encoded = value.encode('utf-8')
+            _write_count(self.f, len(encoded))
+            self.f.write(encoded)
+
+    def write(self, rows):
+        self._try(write_chunk, self.f, self.kind, rows)
+
+    def _publish(self, rows):
+        _write_count(self.f, 0)
+        _write_count(self.f, rows)
+        self.f.close()
+        os.replace(self.tmp, self.path)
+        self.f = None
+
+    def publish(self, rows):
+        """Finish the sidecar with the sheet's row count and move it into place; False if it was dropped"""
+        self._try(self._publish, rows)
+        return self.error is None
+
+    def discard(self):
+        if self.f is not None:
+            with suppress(OSError):
+                self.f.close()
+            with suppress(OSError):
+                os.remove(self.tmp)
+            self.f = None
+
+
+def _write_through(batch, rows, path, digest, kind, cache_bytes):
+    """Yield a parsed batch's rows while writing them to its sidecar, published once the sheet is read"""
+    sidecar = SidecarWriter(path, digest, kind)
+    try:
+        for chunk in chunked(rows):
+            sidecar.write(chunk)
+            yield from chunk
+        if sidecar.publish(batch['rows']):
+            evict_sidecars(os.path.dirname(path), cache_bytes)
+    finally:
+        # a sheet that was not read to the end (cancelled, unreadable) leaves no sidecar behind
+        sidecar.discard()
+    if sidecar.error:
+        # this may run in a worker process; the writer reports it with the file
+        batch['warnings'] = [f"Could not write cache: {sidecar.error}"]
+
+
+def open_sidecar(path, digest, kind):
+    """Open a sidecar at its first chunk, or None when it is missing, unreadable or belongs to other content"""
+    f = None
+    try:
+        f = open(path, 'rb')
+        if f.read(len(CACHE_MAGIC)) == CACHE_MAGIC:
+            if [_read_exact(f, _read_count(f)).decode('utf-8') for _ in range(2)] == [digest, kind]:
+                return f
+    except Exception:
+        # whatever is wrong with the file, it is a cache miss
+        pass
+    if f is not None:
+        f.close()
+    return None
+
+
+def _sidecar_rows(f, batch, kind, reparse):
+    """Yield the rows of an open sidecar; if it turns out damaged, the rest come from reparse()
+
+    Chunks are decoded whole before any of their rows is passed on, and the workbook yields its rows in
+    the same order as the sidecar, so the rows already passed on are skipped rather than repeated.
+    """
+    passed = 0
+    try:
+        with f:
+            chunk = read_chunk(f, kind)
+            while chunk is not None:
+                yield from chunk
+                passed += len(chunk)
+                chunk = read_chunk(f, kind)
+            batch['rows'] = _read_count(f)
+            return
+    except Exception:
+        # whatever is wrong with the file, the rest of it is a cache miss
+        pass
+    fallback = reparse()
+    batch['cached'] = False
+    yield from islice(fallback['data'], passed, None)
+    batch['rows'] = fallback['rows']
+    if 'warnings' in fallback:
+        batch['warnings'] = fallback['warnings']
+
+
+def evict_sidecars(folder, max_bytes):
+    """Delete the least recently used sidecars until the cache fits in max_bytes"""
+    try:
+        entries = [entry for entry in os.scandir(folder) if entry.name.endswith('.bin')]
+    except OSError:
+        return
+    sidecars = []
+    for entry in entries:
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        sidecars.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in sidecars)
+    for _, size, path in sorted(sidecars):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+
+def parse_cached(kind, file, streaming=True, digest=None, cache_bytes=CACHE_BYTES, reparse=False, on_rows=None):
+    """Parse a workbook through its sidecar; cache_bytes=0 disables the cache, reparse ignores it
+
+    The batch's data is lazy either way: rows are read back or parsed, and written to a new sidecar, as
+    the caller consumes them.
+    """
+    if not cache_bytes:
+        return PARSERS[kind](file, streaming, on_rows)
+    digest = digest or file_hash(file)
+    path = sidecar_path(file, kind, digest)
+    f = None if reparse else open_sidecar(path, digest, kind)
+    if f is not None:
+        os.utime(path)  # mtime doubles as last use for eviction
+        batch = {'file': file, 'rows': 0, 'seconds': 0.0, 'cached': True}
+        # a sidecar that is damaged past its header is replaced by parsing the workbook again
+        batch['data'] = _sidecar_rows(f, batch, kind,
+                                      lambda: parse_cached(kind, file, streaming, digest, cache_bytes, True, on_rows))
+        return batch
+    batch = PARSERS[kind](file, streaming, on_rows)
+    batch['data'] = _write_through(batch, batch['data'], path, digest, kind, cache_bytes)
+    return batch
+
+
+def parse_packed(kind, file, streaming=True, digest=None, cache_bytes=CACHE_BYTES, reparse=False, events=None):
+    """parse_cached for a worker process: rows come back as packed chunks instead of a list of tuples
+
+    events is a queue shared with the loading process; it gets ('start', file) when the worker picks the
+    file up and ('rows', file, done, total) as the sheet is read.
+    """
+    start = time.perf_counter()
+    on_rows = None
+    if events is not None:
+        events.put(('start', file))
+
+        def on_rows(done, total):
+            events.put(('rows', file, done, total))
+
+    batch = parse_cached(kind, file, streaming, digest, cache_bytes, reparse, on_rows)
+    chunks = []
+    for rows in chunked(batch['data']):
+        f = io.BytesIO()
+        write_chunk(f, kind, rows)
+        chunks.append(f.getvalue())
+    batch['data'] = chunks
+    batch['seconds'] = time.perf_counter() - start
+    return batch
+
+
+def unpack_chunks(kind, chunks):
+    """Yield the rows of parse_packed chunks, letting go of each chunk once it is read"""
+    chunks.reverse()
+    while chunks:
+        yield from read_chunk(io.BytesIO(chunks.pop()), kind)
+
+
+def print_progress(event):
+    """Default progress sink: one console line per finished file, message or throttled row count"""
+    name = os.path.basename(event.get('file') or '')
+    if event['type'] == 'file_done':
+        print(f"{name}: {event['rows']} rows in {event['seconds']:.2f}s ({event['rows_per_sec']:,.0f} rows/sec)"
+              + (" from cache" if event['cached'] else ""))
+        for warning in event['warnings']:
+            print(f"  {warning}")
+    elif event['type'] == 'rows':
+        eta = f", ETA {event['eta']:.0f}s" if event['eta'] is not None else ""
+        print(f"{name}: {event['rows']} rows ({event['rows_per_sec']:,.0f} rows/sec){eta}")
+    elif event['type'] == 'message':
+        print(event['message'])
+
+
+class LoadProgress:
+    """Turns load milestones into structured events for a sink; row counts are rate-limited"""
+
+    def __init__(self, sink=None, interval=0.5):
+        self.sink = sink or print_progress
+        self.interval = interval
+        self.started = time.perf_counter()
+        self.last = 0.0
+
+        # progress is measured in workbook bytes, the only size known before a file is parsed
+        self.planned = False
+        self.total_bytes = 0
+        self.done_bytes = 0
+
+        # the workbooks being read, several at once with workers: file -> [kind, bytes, started, fraction read]
+        self.active = {}
+        # the file started last, which rows() reports on when not told otherwise
+        self.file = None
+        self.warnings = {}
+
+    def _emit(self, event):
+        now = time.perf_counter()
+        elapsed = now - self.started
+        fraction = None
+        eta = None
+        if self.total_bytes:
+            reading = sum(size * read for _, size, _, read in self.active.values())
+            fraction = min(1.0, (self.done_bytes + reading) / self.total_bytes)
+            if fraction > 0:
+                eta = elapsed / fraction * (1 - fraction)
+        event.update(elapsed=elapsed, fraction=fraction, eta=eta)
+        self.last = now
+        self.sink(event)
+
+    def plan(self, files):
+        """Set the workbooks the whole load will go through"""
+        self.planned = True
+        self.total_bytes = sum(os.path.getsize(file) for file in files)
+        self._emit({'type': 'plan', 'files': len(files), 'bytes': self.total_bytes})
+
+    def skip(self, file):
+        """Count an unchanged workbook as done"""
+        self.done_bytes += os.path.getsize(file)
+
+    def start_file(self, kind, file):
+        self.file = file
+        self.active[file] = [kind, os.path.getsize(file), time.perf_counter(), 0.0]
+        self._emit({'type': 'file_started', 'kind': kind, 'file': file})
+
+    def rows(self, done, total=None, file=None):
+        """Rows read so far in a file, the last one started by default; dropped unless interval has passed"""
+        file = file or self.file
+        if file not in self.active:
+            return
+        kind, _, started, _ = self.active[file]
+        if total:
+            self.active[file][3] = min(1.0, done / total)
+        if time.perf_counter() - self.last < self.interval:
+            return
+        seconds = time.perf_counter() - started
+        self._emit({'type': 'rows', 'kind': kind, 'file': file, 'rows': done, 'total_rows': total,
+                    'rows_per_sec': done / seconds if seconds > 0 else 0.0})
+
+    def warn(self, file, message):
+        """Hold a warning until its file is done"""
+        self.warnings.setdefault(file, []).append(message)
+
+    def file_done(self, kind, file, rows, seconds, cached=False):
+        if file in self.active:
+            self.done_bytes += self.active.pop(file)[1]
+        elif os.path.exists(file):
+            self.done_bytes += os.path.getsize(file)
+        if file == self.file:
+            self.file = None
+        self._emit({'type': 'file_done', 'kind': kind, 'file': file, 'rows': rows, 'seconds': seconds,
+                    'rows_per_sec': rows / seconds if seconds > 0 else 0.0, 'cached': cached,
+                    'warnings': self.warnings.pop(file, [])})
+
+    def phase(self, name):
+        """A step of the load that is not tied to a file (writing, indexing, done)"""
+        self._emit({'type': 'phase', 'phase': name})
+
+    def message(self, text):
+        self._emit({'type': 'message', 'message': text})
+
+
+class KTStaging:
+    """Service_Area -> Facility -> Route hierarchy staged in memory before it is written"""
+
+    def __init__(self, country_of):
+        # SA -> country, or None for SAs that are never loaded (gateways, AAA)
+        self.country_of = country_of
+
+        # everything known so far, from the database and from staged rows
+        self.sa_country = {}
+        self.fac_sa = {}
+        self.route_facs = {}
+
+        # rows not written yet; routes is an ordered set of (route, facility, src)
+        self.new_sas = []
+        self.new_facilities = []
+        self.routes = {}
+        self.keys = set()
+        self.conflicts = []
+
+    def seed(self, cur):
+        self.sa_country.update(cur.execute("SELECT SA, CTRY FROM Service_Area"))
+        self.fac_sa.update(cur.execute("SELECT FAC, SA FROM Facility"))
+        for route, facility in cur.execute("SELECT Rt, FAC FROM Route"):
+            self.route_facs.setdefault(route, set()).add(facility)
+
+    def forget(self, table, key):
+        if table == 'Service_Area':
+            self.sa_country.pop(key, None)
+        else:
+            self.fac_sa.pop(key, None)
+
+    def add(self, src, route, sa, facility):
+        country = self.country_of.get(sa, 'US')
+        if country is None:
+            return
+
+        # "None" is an empty cell: never a row of its own, same as the old caches
+        if sa != "None":
+            self.keys.add((src, 'Service_Area', sa))
+            if sa not in self.sa_country:
+                self.sa_country[sa] = country
+                self.new_sas.append((sa, country))
+
+        if facility != "None":
+            self.keys.add((src, 'Facility', facility))
+            if facility not in self.fac_sa:
+                self.fac_sa[facility] = sa
+                self.new_facilities.append((facility, sa))
+            elif self.fac_sa[facility] != sa:
+                self.conflicts.append({'type': 'facility_sa', 'source': src, 'facility': facility,
+                                       'service_area': sa, 'existing': self.fac_sa[facility]})
+
+        if route != "None":
+            # every (route, facility, source) row is kept, so a route listed under two facilities is
+            # synced to both and retracting one source leaves the other's row in place
+            owners = self.route_facs.setdefault(route, set())
+            if owners and facility not in owners:
+                self.conflicts.append({'type': 'route_facility', 'source': src, 'route': route,
+                                       'facility': facility, 'existing': sorted(owners)})
+            owners.add(facility)
+            self.routes[(route, facility, src)] = None
+
+    def drain(self):
+        """Return the staged rows per table and forget them"""
+        rows = {
+            'Service_Area': self.new_sas,
+            'Facility': self.new_facilities,
+            'Route': list(self.routes),
+            'Source_Key': sorted(self.keys),
+        }
+        self.new_sas, self.new_facilities, self.routes, self.keys = [], [], {}, set()
+        return rows
+
+
+def _owner_key(owner):
+    # owners of ATT-only routes carry None for facility, SA and country
+    return tuple('' if value is None else value for value in owner)
+
+
+class ZipIndex:
+    """Disjoint zip segments with their owning (route, facility, SA, country) rows, built in one sweep"""
+
+    def __init__(self, rows):
+        # rows are (start, end, owner); the sweep opens an owner at start and closes it after end
+        events = {}
+        for start, end, owner in rows:
+            if end >= start:
+                events.setdefault(start, []).append((owner, 1))
+                events.setdefault(end + 1, []).append((owner, -1))
+
+        self.starts, self.ends, self.owners = [], [], []
+        active = {}
+        points = sorted(events)
+        for i, point in enumerate(points):
+            for owner, step in events[point]:
+                count = active.get(owner, 0) + step
+                if count:
+                    active[owner] = count
+                else:
+                    del active[owner]
+            if active and i + 1 < len(points):
+                self.starts.append(point)
+                self.ends.append(points[i + 1] - 1)
+                self.owners.append(frozenset(active))
+
+    def lookup(self, code):
+        """Return the owners of one zip, an empty tuple when no range covers it"""
+        code = int(code)
+        i = bisect_right(self.starts, code) - 1
+        if i >= 0 and code <= self.ends[i]:
+            return tuple(sorted(self.owners[i], key=_owner_key))
+        return ()
+
+    def overlaps(self):
+        """Yield {'start', 'end', 'routes', 'owners', 'conflict'} for zips claimed by more than one route"""
+        current = None
+        for start, end, owners in zip(self.starts, self.ends, self.owners):
+            if len(owners) < 2 or len({owner[0] for owner in owners}) < 2:
+                owners = None
+            # adjacent segments with the same owners are one overlap
+            if current and owners == current['owners'] and start == current['end'] + 1:
+                current['end'] = end
+                continue
+            if current:
+                yield current
+            current = None
+            if owners:
+                facilities = {owner[1] for owner in owners}
+                # the same zip on routes of different facilities is a conflict, not just an overlap
+                current = {'start': start, 'end': end, 'routes': sorted({owner[0] for owner in owners}),
+                           'owners': owners, 'conflict': len(facilities) > 1}
+        if current:
+            yield current
+
+
+# estimated sync cost of a facility: reaching it and clearing its rules, then each route dialog and zip chip
+SYNC_COST = {'facility': 10.0, 'route': 3.0, 'zip': 0.02}
+
+
+class SyncPlan:
+    """Country -> SA -> Facility -> Route -> merged zip ranges, read with two queries and JSON-serialisable"""
+
+    def __init__(self, tree, built=None):
+        # {country: {sa: {facility: {route: [[start, end], ...]}}}}, in the order the bot visits them
+        self.tree = tree
+        self.built = built or time.strftime("%Y-%m-%dT%H:%M:%S")
+
+    @classmethod
+    def build(cls, cur):
+        """Read the whole plan from the database in two set-based queries"""
+        ranges = {}
+        for route, start, end in cur.execute("SELECT Rt, Start, End FROM ZipRange ORDER BY Rt, Start"):
+            ranges.setdefault(route, []).append((start, end))
+        ranges = {route: [list(r) for r in merge_ranges(rs)] for route, rs in ranges.items()}
+
+        # SAs and facilities without routes stay in the plan; the bot still visits and clears them
+        tree = {}
+        cur.execute("""
+            SELECT sa.CTRY, sa.SA, f.FAC, r.Rt
+            FROM Service_Area sa
+            LEFT JOIN Facility f ON f.SA = sa.SA
+            LEFT JOIN Route r ON r.FAC = f.FAC
+            ORDER BY sa.CTRY, sa.SA, f.FAC, r.Rt
+        """)
+        for ctry, sa, fac, rt in cur:
+            facilities = tree.setdefault(ctry, {}).setdefault(sa, {})
+            if fac is None:
+                continue
+            routes = facilities.setdefault(fac, {})
+            # routes without ranges are skipped, as facility_routes does
+            if rt in ranges:
+                routes[rt] = ranges[rt]
+        return cls(tree)
+
+    def to_dict(self):
+        return {'built': self.built, 'tree': self.tree}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['tree'], data.get('built'))
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    @staticmethod
+    def zips(ranges):
+        """Zero-padded zips of one route's ranges"""
+        for _, zips in iter_zip_batches([(None, start, end) for start, end in ranges]):
+            return zips
+        return []
+
+    @staticmethod
+    def cost(routes):
+        """Estimated sync cost of one facility's {route: ranges}"""
+        zips = sum(end - start + 1 for ranges in routes.values() for start, end in ranges)
+        return SYNC_COST['facility'] + SYNC_COST['route'] * len(routes) + SYNC_COST['zip'] * zips
+
+    def units(self, by='facility'):
+        """Yield (key, cost) for the pieces a sync can be split into: (country, sa) or (country, sa, facility)"""
+        for country, sas in self.tree.items():
+            for sa, facilities in sas.items():
+                if by == 'service_area':
+                    yield (country, sa), sum(self.cost(routes) for routes in facilities.values()) or SYNC_COST['facility']
+                elif not facilities:
+                    yield (country, sa, None), SYNC_COST['facility']
+                else:
+                    for facility, routes in facilities.items():
+                        yield (country, sa, facility), self.cost(routes)
+
+    def shard(self, n, by='facility'):
+        """Split into at most n plans of similar estimated cost, handing the largest units out first (LPT)"""
+        loads = [(0.0, i) for i in range(max(1, n))]
+        owner = {}
+        for key, cost in sorted(self.units(by), key=lambda unit: -unit[1]):
+            load, i = heapq.heappop(loads)
+            owner[key] = i
+            heapq.heappush(loads, (load + cost, i))
+
+        # rebuilt in plan order, so every shard still walks country by country
+        trees = [{} for _ in loads]
+        for country, sas in self.tree.items():
+            for sa, facilities in sas.items():
+                if by == 'service_area':
+                    trees[owner[(country, sa)]].setdefault(country, {})[sa] = facilities
+                elif not facilities:
+                    trees[owner[(country, sa, None)]].setdefault(country, {})[sa] = {}
+                else:
+                    for facility, routes in facilities.items():
+                        shard = trees[owner[(country, sa, facility)]]
+                        shard.setdefault(country, {}).setdefault(sa, {})[facility] = routes
+        return [SyncPlan(tree, self.built) for tree in trees if tree]
+
+    def summary(self):
+        counts = {'countries': len(self.tree), 'service_areas': 0, 'facilities': 0, 'routes': 0, 'zips': 0}
+        for sas in self.tree.values():
+            counts['service_areas'] += len(sas)
+            for facilities in sas.values():
+                counts['facilities'] += len(facilities)
+                for routes in facilities.values():
+                    counts['routes'] += len(routes)
+                    counts['zips'] += sum(end - start + 1 for r in routes.values() for start, end in r)
+        counts['cost'] = sum(cost for _, cost in self.units())
+        return counts
+
+
+class LoadCancelled(Exception):
+    """Raised inside a load once cancel() was called; finished workbooks stay checkpointed"""
+
+
 class A4GDB:
-    def __init__ (self, ATTFolderPath, KTFolderPath):
+    def __init__ (self, ATTFolderPath, KTFolderPath, streaming=True, workers=1, incremental=False, compact=False,
+                  cache_bytes=CACHE_BYTES, reparse=False, db_path=DB_NAME, progress=None, checkpoint=True,
+                  cancel_event=None, in_memory=False):
 
         self.PuertoRicoSA = ["PSE", "SJU" ]
         self.VirginIslandsSA = ["STT", "STX"]
         self.gateways = ['LAX', 'JFK', 'JFB', 'ATL', 'MIA', 'CVG']
 
+        # one lookup for the SA classification; anything not listed is US
+        self.country_of = {sa: 'PR' for sa in self.PuertoRicoSA}
+        self.country_of.update({sa: 'VI' for sa in self.VirginIslandsSA})
+        self.country_of.update({sa: None for sa in self.gateways + ["AAA"]})
+
         self.ATTpath = ATTFolderPath
         self.KTpath = KTFolderPath
 
-        self.conn = sqlite3.connect('A4G.db')
+        # streaming reads sheets in read-only mode as plain values; False keeps the old full load
+        self.streaming = streaming
+        self.load_stats = []
+
+        # progress sink called with structured events, see LoadProgress; None prints to the console
+        self.progress = LoadProgress(progress)
+
+        # number of processes parsing workbooks; all writes still go through this connection
+        self.workers = workers
+
+        # sidecar cache of parsed workbooks; cache_bytes=0 turns it off, reparse ignores what is cached
+        self.cache_bytes = cache_bytes
+        self.reparse = reparse
+
+        # KT hierarchy staged across every file of a load, see KTStaging
+        self.staging = None
+        self.conflicts = []
+
+        # zip -> route interval index over ZipRange, built on first lookup after a load
+        self._zip_index = None
+
+        # bulk-load state, see bulk_load()
+        self.bulk = False
+
+        # ATT ranges waiting to be merged per route, and the routes already written
+        self.pending_ranges = {}
+        self.range_routes = set()
+
+        # checkpoint commits every finished workbook, even inside bulk_load(), so an interrupted load
+        # resumes after it; cancel_event (or cancel()) stops the load between files or row chunks
+        self.checkpoint = checkpoint
+        self.cancel_event = cancel_event or threading.Event()
+
+        # the load is written to a generation that nobody reads until publish() swaps it in
+        self.db_path = db_path
+        self.generation = building_generation(db_path)
+        current = resolve_db(db_path)
+        seed = os.path.basename(current)
+        layout = SCHEMA_VERSION + (COMPACT_LAYOUT if compact else 0)
+        self.resumed = self._can_resume(seed, layout)
+        if not self.resumed:
+            remove_db(self.generation)
+
+        # in_memory builds in :memory: and writes the generation file in one pass in persist()
+        self.in_memory = in_memory
+        self.conn = sqlite3.connect(':memory:' if in_memory else self.generation)
+        # start from the published data so the manifest and the last snapshot carry over;
+        # an in-memory build picks up an interrupted building file the same way
+        source = self.generation if self.resumed else current
+        if source != self.generation or in_memory:
+            if os.path.exists(source):
+                with closing(sqlite3.connect(source)) as published:
+                    published.backup(self.conn)
+        if not in_memory:
+            self.conn.execute("PRAGMA journal_mode = WAL")
 
         self.cur = self.conn.cursor()
 
-        self.cur.execute("DROP TABLE IF EXISTS ZipCode")
-        self.cur.execute("DROP TABLE IF EXISTS Route")
-        self.cur.execute("DROP TABLE IF EXISTS Facility")
-        self.cur.execute("DROP TABLE IF EXISTS Service_Area")
-        self.conn.commit()
+        # incremental keeps the tables and only re-ingests workbooks whose content changed
+        self.incremental = incremental
+        self.sources = {}
+
+        # compact interns names to integer ids behind views, see COMPACT_SCHEMA
+        self.compact = compact
+
+        version = self.cur.execute("PRAGMA user_version").fetchone()[0]
+        # a resumed load keeps what its earlier run already checkpointed
+        rebuild = (not incremental and not self.resumed) or version != layout
+        # whether this load has anything to publish; set again as workbooks are ingested or retracted
+        self.changed = rebuild or self.resumed
+        if rebuild:
+            # names can be tables or views depending on the layout (ZipCode used to be a table)
+            for name in LAYOUT_OBJECTS:
+                for (kind,) in self.cur.execute("SELECT type FROM sqlite_master WHERE name = ?", (name,)).fetchall():
+                    self.cur.execute(f"DROP {kind.upper()} IF EXISTS {name}")
+            self.conn.commit()
 
         try:
-            self.cur.execute("""CREATE TABLE Service_Area (
+            if compact:
+                self.cur.executescript(COMPACT_SCHEMA)
+
+            self.cur.execute("""CREATE TABLE IF NOT EXISTS Service_Area (
                              SA CHAR(3) NOT NULL,
                              CTRY CHAR(2), 
                              PRIMARY KEY (SA));""")
             
-            self.cur.execute("""CREATE TABLE Facility (
+            self.cur.execute("""CREATE TABLE IF NOT EXISTS Facility (
                              FAC CHAR(3) NOT NULL, 
                              SA CHAR(3), 
                              PRIMARY KEY(FAC),
                              FOREIGN KEY(SA) REFERENCES Service_Area(SA));""")
 
-            self.cur.execute("""CREATE TABLE Route (
+            # Src is the workbook a row came from, so a changed file can be retracted
+            self.cur.execute("""CREATE TABLE IF NOT EXISTS Route (
                              Rt VARCHAR(10) NOT NULL,
                              FAC CHAR(3),
+                             Src TEXT,
                              FOREIGN KEY(FAC) REFERENCES Facility(FAC));""")
             
-            self.cur.execute("""CREATE TABLE ZipCode (
-                             Zip VARCHAR(5) NOT NULL,
-                             Rt VARCHAR(10),
+            # ATT postal codes are kept as merged (Start, End) ranges per route and source
+            self.cur.execute("""CREATE TABLE IF NOT EXISTS ZipRange (
+                             Rt VARCHAR(10) NOT NULL,
+                             Start INTEGER NOT NULL,
+                             End INTEGER NOT NULL,
+                             Src TEXT,
                              FOREIGN KEY(Rt) REFERENCES Route(Rt));""")
+
+            # Expanded one-row-per-zip view for ad-hoc queries; the app itself reads ZipRange
+            self.cur.execute("""CREATE VIEW IF NOT EXISTS ZipCode AS
+                             WITH RECURSIVE codes(Zip, Rt, Last) AS (
+                                 SELECT Start, Rt, End FROM ZipRange
+                                 UNION ALL
+                                 SELECT Zip + 1, Rt, Last FROM codes WHERE Zip < Last)
+                             SELECT printf('%05d', Zip) AS Zip, Rt FROM codes;""")
+
+            # Every source that mentions a deduped SA or facility, so shared rows survive a retraction
+            self.cur.execute("""CREATE TABLE IF NOT EXISTS Source_Key (
+                             Src TEXT NOT NULL,
+                             Tbl TEXT NOT NULL,
+                             Key TEXT NOT NULL,
+                             PRIMARY KEY (Src, Tbl, Key));""")
+
+            # Manifest of ingested workbooks
+            self.cur.execute("""CREATE TABLE IF NOT EXISTS Source_File (
+                             Src TEXT NOT NULL,
+                             Kind CHAR(3) NOT NULL,
+                             Path TEXT,
+                             Size INTEGER,
+                             MTime REAL,
+                             Hash TEXT,
+                             PRIMARY KEY (Src));""")
+            # The previous load and the change set against it; these survive the DROPs above
+            self.cur.execute("""CREATE TABLE IF NOT EXISTS Snapshot_Range (
+                             Rt VARCHAR(10) NOT NULL,
+                             Start INTEGER NOT NULL,
+                             End INTEGER NOT NULL);""")
+
+            self.cur.execute("""CREATE TABLE IF NOT EXISTS Route_Change (
+                             Rt VARCHAR(10) NOT NULL,
+                             Status TEXT NOT NULL,
+                             PRIMARY KEY (Rt));""")
+
+            self.cur.execute("""CREATE TABLE IF NOT EXISTS Zip_Change (
+                             Rt VARCHAR(10) NOT NULL,
+                             Op CHAR(1) NOT NULL,
+                             Start INTEGER NOT NULL,
+                             End INTEGER NOT NULL);""")
+
+            # which published generation this file was built from, so a later run knows it can resume
+            self.cur.execute("""CREATE TABLE IF NOT EXISTS Load_State (
+                             Key TEXT NOT NULL,
+                             Value TEXT,
+                             PRIMARY KEY (Key));""")
+            self.cur.execute("INSERT OR REPLACE INTO Load_State (Key, Value) VALUES ('seed', ?)", (seed,))
+            self.cur.execute(f"PRAGMA user_version = {layout}")
+            self.conn.commit()
         except Exception as e:
             print(f"An error occured: {e}")
 
+        if self.resumed:
+            done = self.cur.execute("SELECT COUNT(*) FROM Source_File").fetchone()[0]
+            self.progress.message(f"Resuming {os.path.basename(self.generation)}: {done} workbooks already loaded")
+
+        # a full load builds the indexes after its rows are in; incremental retractions need them up front
+        if incremental:
+            self.build_indexes()
 
-    def kt_files(self):
-        for filename in os.listdir(self.KTpath):
-            if filename.endswith('xlsx'):
-                file_path = os.path.join(self.KTpath, filename)
-                self.load_kt(file_path)
+
+    def _can_resume(self, seed, layout):
+        """True when the building file is left over from an interrupted load of the same published data"""
+        if not os.path.exists(self.generation):
+            return False
+        try:
+            with closing(sqlite3.connect(self.generation)) as conn:
+                if conn.execute("PRAGMA user_version").fetchone()[0] != layout:
+                    return False
+                row = conn.execute("SELECT Value FROM Load_State WHERE Key = 'seed'").fetchone()
+                if row is None or row[0] != seed:
+                    return False
+                # a file torn by a crash is started over rather than built on
+                return conn.execute("PRAGMA quick_check").fetchone()[0] == 'ok'
+        except sqlite3.DatabaseError:
+            return False
+
+    def cancel(self):
+        """Ask a running load to stop at the next file or row chunk; safe to call from another thread"""
+        self.cancel_event.set()
+
+    def _check_cancel(self):
+        if self.cancel_event.is_set():
+            raise LoadCancelled("Load cancelled")
+
+    def _on_rows(self, done, total=None):
+        self._check_cancel()
+        self.progress.rows(done, total)
+
+    def _checkpoint(self):
+        # inside bulk_load() each finished workbook is committed with its manifest row
+        if self.bulk and self.checkpoint:
+            self.flush()
+            self.conn.commit()
+            self.cur.execute("BEGIN")
+
+    def _parse_all(self, kind, files, workers):
+        """Parse workbooks, in worker processes when more than one worker is configured"""
+        workers = self.workers if workers is None else workers
+        n = len(files)
+        # the manifest scan already hashed these files; hand the digests on to the sidecar cache
+        digests = [self.sources[file][5] if file in self.sources else None for file in files]
+        args = ([kind] * n, files, [self.streaming] * n, digests, [self.cache_bytes] * n, [self.reparse] * n)
+        if workers > 1 and n > 1:
+            # workers report the file they pick up and their row counts through a managed queue
+            manager = Manager()
+            events = manager.Queue()
+            pool = ProcessPoolExecutor(max_workers=min(workers, n))
+            try:
+                futures = [pool.submit(parse_packed, *(arg[i] for arg in args), events) for i in range(n)]
+                # results are taken in submission order, so the single writer stays deterministic
+                for future in futures:
+                    while not future.done():
+                        self._check_cancel()
+                        self._worker_events(kind, events, 0.1)
+                    self._worker_events(kind, events, 0)
+                    batch = future.result()
+                    batch['data'] = unpack_chunks(kind, batch['data'])
+                    yield batch
+            finally:
+                # with the queue gone a running worker fails at its next row count instead of finishing
+                # its file; files not yet picked up by a worker are dropped instead of parsed
+                manager.shutdown()
+                pool.shutdown(wait=True, cancel_futures=True)
+        else:
+            for i, file in enumerate(files):
+                self._check_cancel()
+                self.progress.start_file(kind, file)
+                # rows stream from the workbook into the writer, reporting progress and checking for cancel
+                yield parse_cached(*(arg[i] for arg in args), on_rows=self._on_rows)
+
+    def _worker_events(self, kind, events, timeout):
+        """Pass on what the workers reported, waiting up to timeout seconds for the first event"""
+        try:
+            event = events.get(timeout=timeout)
+            while True:
+                if event[0] == 'start':
+                    self.progress.start_file(kind, event[1])
+                else:
+                    self.progress.rows(event[2], event[3], event[1])
+                event = events.get_nowait()
+        except queue.Empty:
+            pass
+
+    def _plan_progress(self):
+        if not self.progress.planned:
+            self.progress.plan([file for folder in (self.KTpath, self.ATTpath) if os.path.isdir(folder)
+                                for file in workbooks(folder)])
+
+    def _changed_files(self, kind, folder):
+        """Return the workbooks that need ingesting and retract the sources that changed or disappeared"""
+        known = {row[0]: row[1:] for row in self.cur.execute(
+            "SELECT Src, Size, MTime, Hash FROM Source_File WHERE Kind = ?", (kind,))}
+        files = []
+        for file in workbooks(folder):
+            src = source_id(kind, file)
+            stat = os.stat(file)
+            previous = known.pop(src, None)
+            if previous and tuple(previous[:2]) == (stat.st_size, stat.st_mtime):
+                self.progress.skip(file)
+                continue
+            digest = file_hash(file)
+            if previous and previous[2] == digest:
+                # touched or copied but not changed; if nothing else changes the load is discarded, so
+                # the file is hashed again next time
+                self.cur.execute("UPDATE Source_File SET Path = ?, Size = ?, MTime = ? WHERE Src = ?",
+                                 (file, stat.st_size, stat.st_mtime, src))
+                self.progress.skip(file)
+                continue
+            if previous:
+                self.retract(src)
+            self.sources[file] = (src, kind, file, stat.st_size, stat.st_mtime, digest)
+            files.append(file)
+        for src in known:
+            self.retract(src)
+        if files:
+            self.changed = True
+        self._commit()
+        return files
+
+    def retract(self, src):
+        """Remove every row that came from one source workbook"""
+        self.flush()
+        self.cur.execute("DELETE FROM Route WHERE Src = ?", (src,))
+        self.cur.execute("DELETE FROM ZipRange WHERE Src = ?", (src,))
+        self.range_routes = {key for key in self.range_routes if key[1] != src}
+        self.cur.execute("DELETE FROM Source_Key WHERE Src = ?", (src,))
+        self.cur.execute("DELETE FROM Source_File WHERE Src = ?", (src,))
+
+        # SAs and facilities are shared; drop only the ones no other source still mentions
+        for table, column in (('Facility', 'FAC'), ('Service_Area', 'SA')):
+            self.cur.execute(f"DELETE FROM {table} WHERE {column} NOT IN "
+                             f"(SELECT Key FROM Source_Key WHERE Tbl = ?)", (table,))
+
+        # the staged view of the database is stale now; it is re-seeded on the next KT file
+        self.staging = None
+        self._zip_index = None
+        self.changed = True
+        self.progress.message(f"Retracted {src}")
+
+    def _record_source(self, file):
+        if file in self.sources:
+            self.cur.execute("INSERT OR REPLACE INTO Source_File (Src, Kind, Path, Size, MTime, Hash) "
+                             "VALUES (?, ?, ?, ?, ?, ?)", self.sources.pop(file))
+
+    def kt_files(self, workers=None):
+        self._plan_progress()
+        files = self._changed_files('KT', self.KTpath)
+        for batch in self._parse_all('KT', files, workers):
+            self.write_kt(batch)
         return
-    
+
+    def _report_rate(self, kind, batch, seconds):
+        rate = batch['rows'] / seconds if seconds > 0 else 0.0
+        self.load_stats.append({'file': batch['file'], 'rows': batch['rows'], 'seconds': seconds, 'rows_per_sec': rate})
+        for warning in batch.get('warnings', []):
+            self.progress.warn(batch['file'], warning)
+        self.progress.file_done(kind, batch['file'], batch['rows'], seconds, batch.get('cached', False))
+
     def load_kt(self, file):
-        wb = load_workbook(file)
-        ws = wb['TacticalTours']
-        serviceArea_cache = ["None"]
-        facility_cache = ["None"]
-
-        for row in ws.iter_rows(2, ws.max_row + 1):
-            route = str(row[0].value).strip()
-            serviceArea = str(row[9].value).strip()
-            facility = str(row[11].value).strip()
-            
-            if serviceArea in self.PuertoRicoSA:
-                if serviceArea != "AAA":
-                    if serviceArea not in serviceArea_cache:
-                        print(serviceArea)
-                        self.cur.execute(f"INSERT INTO Service_Area (SA, CTRY) VALUES ('{serviceArea}', 'PR');")
-                        serviceArea_cache.append(serviceArea)
-
-                    if facility not in facility_cache:
-                        print(facility)
-                        self.cur.execute(f"INSERT INTO Facility (FAC, SA) VALUES ('{facility}','{serviceArea}');")
-                        facility_cache.append(facility)
-                    if route != "None":
-                        print(route)
-                        self.cur.execute(f"INSERT INTO Route (Rt, FAC) VALUES('{route}', '{facility}');")
-            elif serviceArea in self.VirginIslandsSA:
-                if serviceArea != "AAA":
-                    if serviceArea not in serviceArea_cache:
-                        print(serviceArea)
-                        self.cur.execute(f"INSERT INTO Service_Area (SA, CTRY) VALUES ('{serviceArea}', 'VI');")
-                        serviceArea_cache.append(serviceArea)
-
-                    if facility not in facility_cache:
-                        print(facility)
-                        self.cur.execute(f"INSERT INTO Facility (FAC, SA) VALUES ('{facility}','{serviceArea}');")
-                        facility_cache.append(facility)
-                    if route != "None":
-                        print(route)
-                        self.cur.execute(f"INSERT INTO Route (Rt, FAC) VALUES('{route}', '{facility}');")
+        self.write_kt(parse_cached('KT', file, self.streaming, None, self.cache_bytes, self.reparse))
 
-            
-            elif serviceArea not in self.gateways:
-                if serviceArea != "AAA":
-                    if serviceArea not in serviceArea_cache:
-                        print(serviceArea)
-                        self.cur.execute(f"INSERT INTO Service_Area (SA, CTRY) VALUES ('{serviceArea}', 'US');")
-                        serviceArea_cache.append(serviceArea)
-
-                    if facility not in facility_cache:
-                        print(facility)
-                        self.cur.execute(f"INSERT INTO Facility (FAC, SA) VALUES ('{facility}','{serviceArea}');")
-                        facility_cache.append(facility)
-                    if route != "None":
-                        print(route)
-                        self.cur.execute(f"INSERT INTO Route (Rt, FAC) VALUES('{route}', '{facility}');")
-            
-        self.conn.commit()
+    def _staging(self):
+        if self.staging is None:
+            self.staging = KTStaging(self.country_of)
+            self.staging.seed(self.cur)
+        return self.staging
+
+    def write_kt(self, batch):
+        start = time.perf_counter()
+        src = source_id('KT', batch['file'])
+        staging = self._staging()
+        conflicts = len(staging.conflicts)
+
+        for route, serviceArea, facility in batch['data']:
+            staging.add(src, route, serviceArea, facility)
+
+        if len(staging.conflicts) > conflicts:
+            self.progress.warn(batch['file'], f"{len(staging.conflicts) - conflicts} hierarchy conflicts, "
+                                              f"see A4GDB.conflicts")
+
+        # in bulk mode the hierarchy is written at the file's checkpoint, or in one pass when the load is flushed
+        if not self.bulk:
+            self.flush()
+        self._record_source(batch['file'])
+        self._commit()
+        self._checkpoint()
+        self._report_rate('KT', batch, batch['seconds'] + time.perf_counter() - start)
         return
 
-    def att_files(self):
-        for filename in os.listdir(self.ATTpath):
-            if filename.endswith('xlsx'):
-                file_path = os.path.join(self.ATTpath, filename)
-                self.load_att(file_path)
+    def att_files(self, workers=None):
+        self._plan_progress()
+        files = self._changed_files('ATT', self.ATTpath)
+        for batch in self._parse_all('ATT', files, workers):
+            self.write_att(batch)
         return
 
     def load_att(self, file):
-        wb = load_workbook(file)
-        print( wb.sheetnames)
-        ws = wb['ATTPostalCode_SP1']
-        route_cache = []
+        self.write_att(parse_cached('ATT', file, self.streaming, None, self.cache_bytes, self.reparse))
+
+    def write_att(self, batch):
+        start = time.perf_counter()
+
+        src = source_id('ATT', batch['file'])
+
+        for route, code1, code2 in batch['data']:
+            if code2 >= code1:
+                self.pending_ranges.setdefault((route, src), []).append((code1, code2))
+
+        # in bulk mode the ranges are merged at the file's checkpoint, or when the load is flushed
+        if not self.bulk:
+            self._store_ranges()
+        self._record_source(batch['file'])
+        self._commit()
+        self._checkpoint()
+        self._report_rate('ATT', batch, batch['seconds'] + time.perf_counter() - start)
+
+
+    def flush(self):
+        """Write the staged hierarchy and pending ranges with one executemany per table"""
+        if self.staging:
+            rows = self.staging.drain()
+            for table in ('Service_Area', 'Facility', 'Route'):
+                self.cur.executemany(INSERTS[table], rows[table])
+            self.cur.executemany("INSERT OR IGNORE INTO Source_Key (Src, Tbl, Key) VALUES (?, ?, ?)",
+                                 rows['Source_Key'])
+            self.conflicts.extend(self.staging.conflicts)
+            self.staging.conflicts = []
+        if self.pending_ranges:
+            self._store_ranges()
+
+    def _store_ranges(self):
+        # ranges are merged per route within a source; route_zips merges across sources on read.
+        # Routes written earlier in this load are re-merged with their stored ranges.
+        rows = []
+        for (route, src), ranges in self.pending_ranges.items():
+            if (route, src) in self.range_routes:
+                ranges += self.cur.execute("SELECT Start, End FROM ZipRange WHERE Rt = ? AND Src = ?",
+                                           (route, src)).fetchall()
+                self.cur.execute("DELETE FROM ZipRange WHERE Rt = ? AND Src = ?", (route, src))
+            rows.extend((route, start, end, src) for start, end in merge_ranges(ranges))
+            self.range_routes.add((route, src))
+        self.cur.executemany(INSERTS['ZipRange'], rows)
+        self.pending_ranges.clear()
+        self._zip_index = None
+
+    def _commit(self):
+        # inside bulk_load() the whole load is a single transaction
+        if not self.bulk:
+            self.conn.commit()
 
-        for row in ws.iter_rows(2, ws.max_row + 1):
-            if row[0].value is None or row[1].value is None or row[2].value is None:
+    def build_indexes(self):
+        for sql in (COMPACT_INDEXES if self.compact else INDEXES).values():
+            self.cur.execute(sql)
+        self._commit()
+
+    def drop_indexes(self):
+        for name in (COMPACT_INDEXES if self.compact else INDEXES):
+            self.cur.execute(f"DROP INDEX IF EXISTS {name}")
+        self._commit()
+
+    def check_query_plans(self):
+        return check_query_plans(self.cur)
+
+    @contextmanager
+    def bulk_load(self):
+        """Stage rows and write them in batches inside one transaction with loader pragmas"""
+        if not self.incremental:
+            self.drop_indexes()
+        self.conn.commit()
+        pragmas = dict(BULK_PRAGMAS)
+        if self.checkpoint and not self.in_memory:
+            pragmas.update(CHECKPOINT_PRAGMAS)
+        saved = {name: self.cur.execute(f"PRAGMA {name}").fetchone()[0] for name in pragmas}
+        for name, value in pragmas.items():
+            self.cur.execute(f"PRAGMA {name} = {value}")
+        self.bulk = True
+        try:
+            self.cur.execute("BEGIN")
+            yield self
+            self.progress.phase('writing')
+            self.flush()
+            self.conn.commit()
+            # one sorted pass per index now that every row is in
+            self.progress.phase('indexing')
+            self.build_indexes()
+            self.progress.phase('done')
+        except BaseException as e:
+            self.staging = None
+            self._zip_index = None
+            self.pending_ranges.clear()
+            self.sources.clear()
+            self.conn.rollback()
+            if isinstance(e, LoadCancelled) and self.in_memory and self.checkpoint:
+                # the checkpoints only exist in memory; write them out so the next load can resume
+                self.persist()
+            raise
+        finally:
+            self.bulk = False
+            for name, value in saved.items():
+                self.cur.execute(f"PRAGMA {name} = {value}")
+
+    def _route_ranges(self, table):
+        ranges = {}
+        for route, start, end in self.cur.execute(f"SELECT Rt, Start, End FROM {table}"):
+            ranges.setdefault(route, []).append((start, end))
+        return {route: merge_ranges(r) for route, r in ranges.items()}
+
+    def snapshot_changes(self):
+        """Diff the loaded zips per route against the previous load and make this load the new snapshot"""
+        self.flush()
+        current = self._route_ranges('ZipRange')
+        previous = self._route_ranges('Snapshot_Range')
+
+        statuses = []
+        zips = []
+        for route in sorted(current.keys() | previous.keys()):
+            now, before = current.get(route, []), previous.get(route, [])
+            added = subtract_ranges(now, before)
+            removed = subtract_ranges(before, now)
+            if not added and not removed:
                 continue
+            status = 'added' if not before else 'removed' if not now else 'changed'
+            statuses.append((route, status))
+            zips.extend((route, '+', start, end) for start, end in added)
+            zips.extend((route, '-', start, end) for start, end in removed)
 
-            route = str(row[0].value).strip()
-            code1 = int(row[1].value)
-            code2 = int(row[2].value)
+        self.cur.execute("DELETE FROM Route_Change")
+        self.cur.execute("DELETE FROM Zip_Change")
+        self.cur.execute("DELETE FROM Snapshot_Range")
+        self.cur.executemany("INSERT INTO Route_Change (Rt, Status) VALUES (?, ?)", statuses)
+        self.cur.executemany("INSERT INTO Zip_Change (Rt, Op, Start, End) VALUES (?, ?, ?, ?)", zips)
+        self.cur.executemany("INSERT INTO Snapshot_Range (Rt, Start, End) VALUES (?, ?, ?)",
+                             [(route, start, end) for route, r in current.items() for start, end in r])
+        self._commit()
+        self.progress.message(f"Change set: {len(statuses)} of {len(current)} routes differ from the previous load")
+        return self.changes()
 
-            try:
-                for code in range(code1, code2 + 1):
-                    pCode = str(code).zfill(5)
-                    self.cur.execute(
-                        "INSERT INTO ZipCode (Zip, Rt) VALUES (?, ?)", (pCode, route)
-                    )
-            except Exception as e:
-                print(f"Route Doesn't Exist: {e}")
+    def changes(self):
+        """Return the last change set as {route: {'status', 'added', 'removed'}} with zips zero-padded"""
+        ranges = {}
+        for route, op, start, end in self.cur.execute("SELECT Rt, Op, Start, End FROM Zip_Change"):
+            ranges.setdefault((route, op), []).append((start, end))
+        return {
+            route: {
+                'status': status,
+                'added': list(iter_zips(ranges.get((route, '+'), []))),
+                'removed': list(iter_zips(ranges.get((route, '-'), []))),
+            }
+            for route, status in self.cur.execute("SELECT Rt, Status FROM Route_Change ORDER BY Rt").fetchall()
+        }
 
+    def export_changes(self, path):
+        """Write the last change set as JSON, or as Route/Status/Op/Zip rows for a .csv path"""
+        changes = self.changes()
+        if path.lower().endswith('.csv'):
+            with open(path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['Route', 'Status', 'Op', 'Zip'])
+                for route, change in changes.items():
+                    writer.writerows((route, change['status'], '+', code) for code in change['added'])
+                    writer.writerows((route, change['status'], '-', code) for code in change['removed'])
+        else:
+            with open(path, 'w') as f:
+                json.dump(changes, f, indent=2)
+        return path
+
+    def zip_index(self):
+        """Return the zip -> owner interval index, rebuilt once after every write to ZipRange"""
+        if self._zip_index is None:
+            self.flush()
+            self.cur.execute("""
+                SELECT DISTINCT z.Start, z.End, z.Rt, r.FAC, f.SA, sa.CTRY
+                FROM ZipRange z
+                LEFT JOIN Route r ON r.Rt = z.Rt
+                LEFT JOIN Facility f ON f.FAC = r.FAC
+                LEFT JOIN Service_Area sa ON sa.SA = f.SA
+            """)
+            self._zip_index = ZipIndex((start, end, (rt, fac, sa, ctry))
+                                       for start, end, rt, fac, sa, ctry in self.cur)
+        return self._zip_index
+
+    def lookup_zip(self, code):
+        """Return [{'route', 'facility', 'sa', 'country'}] for every route that claims a zip"""
+        return [dict(zip(('route', 'facility', 'sa', 'country'), owner))
+                for owner in self.zip_index().lookup(code)]
+
+    def overlaps(self):
+        """Return the ranges claimed by more than one route, zips zero-padded"""
+        return [{**overlap, 'start': str(overlap['start']).zfill(5), 'end': str(overlap['end']).zfill(5),
+                 'owners': [dict(zip(('route', 'facility', 'sa', 'country'), owner))
+                            for owner in sorted(overlap['owners'], key=_owner_key)]}
+                for overlap in self.zip_index().overlaps()]
+
+    def report_overlaps(self):
+        """Build the zip index for the loaded ranges and report how many of them overlap"""
+        overlaps = list(self.zip_index().overlaps())
+        conflicts = sum(1 for overlap in overlaps if overlap['conflict'])
+        self.progress.message(f"Overlaps: {len(overlaps)} ranges claimed by more than one route, "
+                              f"{conflicts} of them across facilities")
+        return overlaps
+
+    def export_overlaps(self, path):
+        """Write the overlap report as JSON, or as Start/End/Conflict/Route/Facility/SA/Country rows for a .csv path"""
+        overlaps = self.overlaps()
+        if path.lower().endswith('.csv'):
+            with open(path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['Start', 'End', 'Conflict', 'Route', 'Facility', 'SA', 'Country'])
+                for overlap in overlaps:
+                    writer.writerows((overlap['start'], overlap['end'], overlap['conflict'], *owner.values())
+                                     for owner in overlap['owners'])
+        else:
+            with open(path, 'w') as f:
+                json.dump(overlaps, f, indent=2)
+        return path
+
+    def persist(self):
+        """Write an in-memory build to its generation file with the online backup API and continue on disk"""
+        start = time.perf_counter()
+        self.flush()
+        self.conn.commit()
+        remove_db(self.generation)
+        disk = sqlite3.connect(self.generation)
+        # one backup step copies every page in order, a single sequential write
+        self.conn.backup(disk)
+        disk.execute("PRAGMA journal_mode = WAL")
+        self.conn.close()
+        self.conn, self.cur = disk, disk.cursor()
+        self.in_memory = False
+        self.progress.message(f"Wrote the in-memory build to {os.path.basename(self.generation)} "
+                              f"in {time.perf_counter() - start:.2f}s")
+
+    def publish(self):
+        """Swap this load's generation in as the database every new connection opens"""
+        if self.in_memory:
+            self.persist()
+        self.flush()
         self.conn.commit()
+        # fold the WAL back into the file so the generation is complete on its own
+        self.cur.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        publish_generation(self.db_path, self.generation)
+        self.progress.message(f"Published {os.path.basename(self.generation)} as {self.db_path}")
+        return self.generation
 
+    def discard(self):
+        """Drop this load's unpublished generation and reopen the published database instead
 
+        For a load that found nothing to change: the published generation, with its change set, stays current.
+        """
+        self.conn.close()
+        if not self.in_memory:
+            remove_db(self.generation)
+        self.generation = resolve_db(self.db_path)
+        self.in_memory = False
+        self.conn = sqlite3.connect(self.generation)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.cur = self.conn.cursor()
+        self.progress.message(f"No workbook changed; {os.path.basename(self.generation)} stays published")
+        return self.generation
 
     def main(self):
-        self.kt_files()
-        self.att_files()
+        with self.bulk_load():
+            self.kt_files()
+            self.att_files()
+        if not self.changed:
+            self.discard()
+            return
+        self.snapshot_changes()
+        self.report_overlaps()
+        self.publish()
 
 
 
 if __name__ == "__main__":
     att = "C:\\POcodeBot\\ATT Files"
     kt = "C:\\POcodeBot\\KT Files"
-    db = A4GDB(att, kt)
+    db = A4GDB(att, kt, workers=os.cpu_count() or 1)
     db.main()
 
 
@@ -0,0 +1,97 @@
+from steps import run_steps, run_steps_async
+
+OPTION_SELECTOR = "span.mdc-list-item__primary-text"
+
+# Text of every option of the open select, in order, in one browser call
+READ_SCRIPT = "spans => spans.map(span => span.textContent.trim())"
+
+# Clicks option `index` only if it still reads `text`, so a stale index never selects a different option
+CLICK_SCRIPT = """
+(spans, [index, text]) => {
+    const span = spans[index];
+    if (!span || span.textContent.trim() !== text) {
+        return false;
+    }
+    (span.closest('mat-option') || span).click();
+    return true;
+}
+"""
+
+
+def index_options(texts):
+    """text -> index of the first option with that text; blank options are left out"""
+    options = {}
+    for i, text in enumerate(texts):
+        if text:
+            options.setdefault(text, i)
+    return options
+
+
+class Dropdown:
+    """A mat-select whose options are read once per open and clicked by exact text
+
+    has_text matching is a substring match ("SJU" also finds "SJU2"); here the option must read exactly
+    the text asked for. With a cache dict the text -> index map is kept under (select_id, key) and reused
+    by later opens, and only read again when the wanted text is missing from it or no longer at its index.
+    """
+
+    def __init__(self, page, select_id, cache=None, key=None, timeout=10000):
+        self.page = page
+        self.selector = f"id={select_id}"
+        self.cache = cache
+        self.key = (select_id, key)
+        self.timeout = timeout
+        # option texts from the last read, for reporting what was there instead
+        self.available = []
+
+    # runs the steps below against a sync_api page; AsyncDropdown runs the same steps on an async_api page
+    run = staticmethod(run_steps)
+
+    def open(self):
+        return self.run(self._open())
+
+    def pick(self, text):
+        """Click the option reading exactly `text` in the open select; a multi-select stays open"""
+        return self.run(self._pick(text))
+
+    def choose(self, text):
+        """Open the select and pick `text`; False, with the select closed, if there is no such option"""
+        return self.run(self._choose(text))
+
+    def _open(self):
+        yield lambda: self.page.wait_for_selector(self.selector, timeout=self.timeout)
+        yield lambda: self.page.click(self.selector)
+        yield lambda: self.page.wait_for_selector(OPTION_SELECTOR, timeout=self.timeout)
+
+    def _read(self):
+        self.available = yield lambda: self.page.locator(OPTION_SELECTOR).evaluate_all(READ_SCRIPT)
+        options = index_options(self.available)
+        if self.cache is not None:
+            self.cache[self.key] = options
+        return options
+
+    def _click(self, options, text):
+        index = options.get(text)
+        if index is None:
+            return False
+        return (yield lambda: self.page.locator(OPTION_SELECTOR).evaluate_all(CLICK_SCRIPT, [index, text]))
+
+    def _pick(self, text):
+        text = text.strip()
+        cached = self.cache.get(self.key) if self.cache is not None else None
+        if cached is not None and (yield from self._click(cached, text)):
+            return True
+        return (yield from self._click((yield from self._read()), text))
+
+    def _choose(self, text):
+        yield from self._open()
+        if (yield from self._pick(text)):
+            return True
+        yield lambda: self.page.keyboard.press("Escape")
+        return False
+
+
+class AsyncDropdown(Dropdown):
+    """Dropdown for an async_api page; open, pick and choose return coroutines"""
+
+    run = staticmethod(run_steps_async)
@@ -8,9 +8,9 @@ import tempfile
 import time
 import queue
 from datetime import datetime
-from A4GDB import A4GDB
+from A4GDB import A4GDB, LoadCancelled, iter_joined_zips, HOT_QUERIES, connect, resolve_db, DB_NAME
 import playwright
-import aggressive
+from bot import run_bot
 #import bot
 from config import webpage
 import pandas as pd
@@ -30,10 +30,12 @@ class ModernSyncGUI:
         self.kt_files = []
         self.att_folder = ""
         self.kt_folder = ""
-        self.db_path = "A4G.db"  # Use A4GDB database name
+        self.db_path = DB_NAME  # Use A4GDB database name; connect() opens its current generation
         self.is_loading = False
         self.is_syncing = False
         self.a4g_db = None
+        # Processes used to parse workbooks (leave one core for the GUI)
+        self.load_workers = max(1, (os.cpu_count() or 2) - 1)
 
         self.temp_att_dir = None
         self.temp_kt_dir = None
@@ -94,6 +96,10 @@ class ModernSyncGUI:
         self.message_queue.put(formatted_message)
 
 
+    def load_progress_callback(self, event):
+        """Thread-safe sink for A4GDB load progress events"""
+        self.progress_queue.put({"type": "load", "event": event})
+
     def gui_summary_callback(self, summary_text):
         """Thread-safe callback for bot summary"""
         self.message_queue.put(summary_text)
@@ -152,7 +158,7 @@ class ModernSyncGUI:
         try:
             # Just check if we can connect to the database
             # A4GDB will handle the actual table creation
-            conn = sqlite3.connect(self.db_path)
+            conn = connect(self.db_path)
             conn.close()
             print("Database connection verified")  # Use print instead of log_message
         except Exception as e:
@@ -255,6 +261,11 @@ class ModernSyncGUI:
                                      command=self.load_files_to_db, 
                                      style='Accent.TButton', state=tk.DISABLED)
         self.load_button.pack(side=tk.LEFT, padx=(0, 10))
+
+        # Stops a running load after the current file; the next load resumes from there
+        self.cancel_load_button = ttk.Button(db_buttons_frame, text="Cancel Load",
+                                             command=self.cancel_load, style='Modern.TButton', state=tk.DISABLED)
+        self.cancel_load_button.pack(side=tk.LEFT, padx=(0, 10))
         
         self.view_button = ttk.Button(db_buttons_frame, text="View Database", 
                                      command=self.view_database, style='Modern.TButton')
@@ -268,6 +279,18 @@ class ModernSyncGUI:
                                        command=self.export_db_to_excel, style='Modern.TButton')
         self.export_button.pack(side=tk.LEFT, padx=(10, 10))
 
+        # Ignore the parsed-workbook cache and read every file again
+        self.reparse_var = tk.BooleanVar(value=False)
+        self.reparse_check = ttk.Checkbutton(db_buttons_frame, text="Force re-parse",
+                                             variable=self.reparse_var)
+        self.reparse_check.pack(side=tk.LEFT)
+
+        # Build the whole database in RAM and write it to disk once at the end
+        self.in_memory_var = tk.BooleanVar(value=False)
+        self.in_memory_check = ttk.Checkbutton(db_buttons_frame, text="Build in memory",
+                                               variable=self.in_memory_var)
+        self.in_memory_check.pack(side=tk.LEFT, padx=(10, 0))
+
 
     def create_progress_section(self, parent):
         """Create service area progress tracking section"""
@@ -308,6 +331,18 @@ class ModernSyncGUI:
                                      command=self.run_synchronization, 
                                      style='Accent.TButton', state=tk.DISABLED)
         self.sync_button.pack(anchor=tk.W)
+
+        # Sync several facilities at once on pages of one browser (async_bot) instead of one by one
+        engine_frame = ttk.Frame(sync_frame, style='Modern.TFrame')
+        engine_frame.pack(anchor=tk.W, pady=(10, 0))
+        self.async_var = tk.BooleanVar(value=False)
+        self.async_check = ttk.Checkbutton(engine_frame, text="Async engine, concurrent facilities:",
+                                           variable=self.async_var)
+        self.async_check.pack(side=tk.LEFT)
+        self.concurrency_var = tk.IntVar(value=4)
+        self.concurrency_spin = ttk.Spinbox(engine_frame, from_=1, to=16, width=4,
+                                            textvariable=self.concurrency_var)
+        self.concurrency_spin.pack(side=tk.LEFT, padx=(5, 0))
         
     def create_status_section(self, parent):
         status_frame = ttk.Frame(parent, style='Modern.TFrame')
@@ -340,12 +375,12 @@ class ModernSyncGUI:
     def initialize_route_progress(self):
         """Initialize route progress from database"""
         try:
-            if not os.path.exists(self.db_path):
+            if not os.path.exists(resolve_db(self.db_path)):
                 print(f"🚨 Database file not found: {self.db_path}")
                 self.log_message("⚠️ Database file not found - progress tracking unavailable")
                 return
 
-            conn = sqlite3.connect(self.db_path)
+            conn = connect(self.db_path)
             cursor = conn.cursor()
 
             # Check if Route table exists
@@ -359,16 +394,7 @@ class ModernSyncGUI:
                 return
 
             # Get all routes that have zip codes (only routes with zip codes get processed)
-            cursor.execute("""
-                SELECT DISTINCT r.Rt
-                FROM Route r
-                WHERE EXISTS (
-                    SELECT 1
-                    FROM ZipCode z
-                    WHERE z.Rt = r.Rt
-                )
-                ORDER BY r.Rt
-            """)
+            cursor.execute(HOT_QUERIES['routes_with_zips'])
             routes = cursor.fetchall()
 
             print(f"🔍 Found {len(routes)} routes with zip codes in database")
@@ -413,9 +439,38 @@ class ModernSyncGUI:
 
 
 
+    def update_load_progress(self, event):
+        """Render an A4GDB load event on the progress bar"""
+        if event.get("fraction") is not None:
+            self.progress_bar['value'] = event["fraction"] * 100
+        eta = f", about {event['eta']:.0f}s left" if event.get("eta") is not None else ""
+        name = os.path.basename(event.get("file") or "")
+
+        if event["type"] == "plan":
+            self.progress_bar['value'] = 0
+            self.progress_label.config(text=f"Loading {event['files']} workbooks...")
+        elif event["type"] == "file_started":
+            self.progress_label.config(text=f"Reading {name}{eta}")
+        elif event["type"] == "rows":
+            self.progress_label.config(text=f"Reading {name}: {event['rows']:,} rows "
+                                            f"({event['rows_per_sec']:,.0f} rows/sec){eta}")
+        elif event["type"] == "file_done":
+            source = " from cache" if event["cached"] else ""
+            self.log_message(f"📄 {name}: {event['rows']:,} rows in {event['seconds']:.1f}s{source}")
+            for warning in event["warnings"]:
+                self.log_message(f"⚠️ {name}: {warning}")
+        elif event["type"] == "phase":
+            text = {"writing": "Writing rows to the database...", "indexing": "Building indexes...",
+                    "done": "Load complete"}.get(event["phase"], event["phase"])
+            self.progress_label.config(text=text)
+        elif event["type"] == "message":
+            self.log_message(event["message"])
+
     def update_progress_from_callback(self, progress_data):
         """Update progress from sync process callbacks"""
-        if progress_data.get("type") == "service_area_complete":
+        if progress_data.get("type") == "load":
+            self.update_load_progress(progress_data["event"])
+        elif progress_data.get("type") == "service_area_complete":
             # Get the service area name from the bot's callback data
             service_area = progress_data.get("service_area", "")
             facilities_processed = progress_data.get('facilities_processed', 0)
@@ -538,7 +593,11 @@ class ModernSyncGUI:
             return
             
         self.is_loading = True
+        self.force_reparse = self.reparse_var.get()  # read Tk state here, not in the worker thread
+        self.load_cancel_event = threading.Event()
+        self.load_in_memory = self.in_memory_var.get()
         self.load_button.config(text="Loading...", state=tk.DISABLED)
+        self.cancel_load_button.config(state=tk.NORMAL)
         self.sync_button.config(state=tk.DISABLED)
         
         # Run loading in separate thread to prevent GUI freezing
@@ -548,37 +607,91 @@ class ModernSyncGUI:
         
     def _load_files_thread(self):
         try:
+            load_start = time.perf_counter()
             self.message_queue.put("Initializing A4G Database...")
             
             # Initialize A4GDB with the selected files/folders
             if self.upload_method.get() == "folder":
-                self.a4g_db = A4GDB(self.att_folder, self.kt_folder)
+                self.a4g_db = A4GDB(self.att_folder, self.kt_folder, workers=self.load_workers, incremental=True,
+                                    reparse=self.force_reparse, progress=self.load_progress_callback,
+                                    cancel_event=self.load_cancel_event, in_memory=self.load_in_memory)
             else:
                 # For individual files, we'll need to modify A4GDB to accept file lists
                 # For now, create temporary folders or modify the A4GDB constructor
-                self.a4g_db = A4GDB(self.att_folder, self.kt_folder)
+                self.a4g_db = A4GDB(self.att_folder, self.kt_folder, workers=self.load_workers, incremental=True,
+                                    reparse=self.force_reparse, progress=self.load_progress_callback,
+                                    cancel_event=self.load_cancel_event, in_memory=self.load_in_memory)
                 
             self.message_queue.put("A4G Database initialized successfully")
             
-            # Process KT files first
-            self.message_queue.put("Processing KT files...")
-            self.a4g_db.kt_files()
-            self.message_queue.put("KT files processed successfully")
-            
-            # Process ATT files
-            self.message_queue.put("Processing ATT files...")
-            self.a4g_db.att_files()
-            self.message_queue.put("ATT files processed successfully")
+            # Batch all inserts into one transaction for the whole load
+            with self.a4g_db.bulk_load():
+                # Process KT files first
+                self.message_queue.put("Processing KT files...")
+                self.a4g_db.kt_files()
+                self.message_queue.put("KT files processed successfully")
+
+                # Process ATT files
+                self.message_queue.put("Processing ATT files...")
+                self.a4g_db.att_files()
+                self.message_queue.put("ATT files processed successfully")
+
+            if not self.a4g_db.changed:
+                # keep the published database and its change set rather than publishing an identical copy
+                self.a4g_db.discard()
+                self.message_queue.put("No KT or ATT file changed since the last load")
+                self.message_queue.put(f"⏱️ Load checked in {time.perf_counter() - load_start:.1f}s")
+                self.root.after(0, self._load_complete)
+                return
+
+            conflicts = self.a4g_db.conflicts
+            if conflicts:
+                self.message_queue.put(f"⚠️ {len(conflicts)} route/facility conflicts in KT files (routes kept under every facility listing them)")
+
+            # Record what changed since the previous load
+            changes = self.a4g_db.snapshot_changes()
+            self.message_queue.put(f"{len(changes)} routes added, removed or changed since the last load")
+
+            # Build the zip -> route index now so lookups after the load are instant
+            overlaps = self.a4g_db.report_overlaps()
+            if overlaps:
+                conflicts = sum(1 for overlap in overlaps if overlap['conflict'])
+                self.message_queue.put(f"⚠️ {len(overlaps)} zip ranges claimed by more than one route "
+                                       f"({conflicts} across facilities)")
+
+            # Swap the finished database in; a sync that is already running keeps its own snapshot
+            self.a4g_db.publish()
+            self.message_queue.put(f"Published {os.path.basename(self.a4g_db.generation)}")
+            mode = "in memory" if self.load_in_memory else "on disk"
+            self.message_queue.put(f"⏱️ Load built {mode} in {time.perf_counter() - load_start:.1f}s")
             
             # Update GUI in main thread
             self.root.after(0, self._load_complete)
             
+        except LoadCancelled:
+            self.root.after(0, self._load_cancelled)
         except Exception as e:
             error_msg = str(e)
             self.root.after(0, lambda: self._load_error(error_msg))
             
+    def cancel_load(self):
+        """Ask the running load to stop at the next file or row chunk"""
+        if self.is_loading:
+            self.load_cancel_event.set()
+            self.cancel_load_button.config(state=tk.DISABLED)
+            self.log_message("⏹️ Cancelling load after the current file...")
+
+    def _load_cancelled(self):
+        self.is_loading = False
+        self.load_button.config(text="Load Files to Database", state=tk.NORMAL)
+        self.cancel_load_button.config(state=tk.DISABLED)
+        self.update_buttons()
+        self.progress_label.config(text="Load cancelled")
+        self.log_message("⏹️ Load cancelled. Files already loaded are kept; the next load resumes from there")
+
     def _load_complete(self):
         self.is_loading = False
+        self.cancel_load_button.config(state=tk.DISABLED)
         self.load_button.config(text="Load Files to Database", state=tk.NORMAL)
         self.update_buttons()
         self.log_message(f"✅ Successfully processed {len(self.att_files)} ATT files and {len(self.kt_files)} KT files!")
@@ -589,6 +702,7 @@ class ModernSyncGUI:
         
     def _load_error(self, error_msg):
         self.is_loading = False
+        self.cancel_load_button.config(state=tk.DISABLED)
         self.load_button.config(text="Load Files to Database", state=tk.NORMAL)
         self.update_buttons()
         self.log_message(f"❌ Error processing files: {error_msg}")
@@ -596,11 +710,11 @@ class ModernSyncGUI:
         
     def view_database(self):
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = connect(self.db_path)
             cursor = conn.cursor()
             
             # Check if tables exist and count records
-            tables = ['Service_Area', 'Facility', 'Route', 'ZipCode']
+            tables = ['Service_Area', 'Facility', 'Route']
             counts = {}
             
             for table in tables:
@@ -609,6 +723,13 @@ class ModernSyncGUI:
                     counts[table] = cursor.fetchone()[0]
                 except sqlite3.OperationalError:
                     counts[table] = 0
+
+            # Zip codes are stored as merged ranges, so count the codes they cover
+            try:
+                cursor.execute("SELECT COALESCE(SUM(End - Start + 1), 0) FROM ZipRange")
+                counts['ZipCode'] = cursor.fetchone()[0]
+            except sqlite3.OperationalError:
+                counts['ZipCode'] = 0
             
             conn.close()
             
@@ -630,11 +751,12 @@ class ModernSyncGUI:
     def clear_database(self):
         if messagebox.askyesno("Clear Database", "Are you sure you want to clear all data from the A4G database?"):
             try:
-                conn = sqlite3.connect(self.db_path)
+                conn = connect(self.db_path)
                 cursor = conn.cursor()
                 
-                # Clear A4G database tables in correct order (due to foreign key constraints)
-                tables = ['ZipCode', 'Route', 'Facility', 'Service_Area']
+                # Clear A4G database tables in correct order (due to foreign key constraints).
+                # The source manifest goes too, so the next load re-ingests every file.
+                tables = ['ZipRange', 'Route', 'Facility', 'Service_Area', 'Source_Key', 'Source_File']
                 for table in tables:
                     try:
                         cursor.execute(f"DELETE FROM {table}")
@@ -652,6 +774,15 @@ class ModernSyncGUI:
                 messagebox.showerror("Database Error", f"Failed to clear database: {str(e)}")
                 
     def run_synchronization(self):
+        # read Tk state here, not in the worker thread; the spinbox accepts any text typed into it
+        use_async = self.async_var.get()
+        try:
+            concurrency = self.concurrency_var.get()
+        except (tk.TclError, ValueError):
+            concurrency = None
+        if use_async and (concurrency is None or not 1 <= concurrency <= 16):
+            messagebox.showerror("Run Synchronization", "Concurrent facilities must be a whole number from 1 to 16.")
+            return
         if messagebox.askyesno("Run Synchronization", "Are you ready to run the synchronization process?"):
             self.is_syncing = True
             self.sync_button.config(text="Synchronizing...", state=tk.DISABLED)
@@ -672,19 +803,18 @@ class ModernSyncGUI:
             print(f"🎯 SYNC STARTED: Tracking {total_routes} routes")
 
             # Run sync in separate thread
-            thread = threading.Thread(target=self._sync_thread)
+            thread = threading.Thread(target=self._sync_thread, args=(use_async, concurrency))
             thread.daemon = True
             thread.start()
             
-    def _sync_thread(self):
+    def _sync_thread(self, use_async, concurrency):
         """Run synchronization in separate thread"""
         try:
-            # Initialize bot with thread-safe callbacks
-            bot = aggressive.Bot(self.url, self.filepath, self.gui_progress_callback, self.gui_summary_callback)
-            
-            # Run the bot main function
-            bot.bot_main()
-            
+            # the async engine syncs `concurrency` facilities at once on its own event loop on this thread;
+            # callbacks arrive here the same way with either engine
+            run_bot(self.url, self.filepath, self.gui_progress_callback, self.gui_summary_callback,
+                    workers=concurrency if use_async else 1, engine="async" if use_async else "sync")
+
             # Signal completion
             self.root.after(0, self._sync_complete)
             
@@ -801,31 +931,25 @@ class ModernSyncGUI:
             if not export_path:
                 return
 
-            conn = sqlite3.connect(self.db_path)
-            tables = ['Service_Area', 'Facility', 'Route', 'ZipCode']
+            conn = connect(self.db_path)
+            # the sheets keep the columns of the original tables; ZipCode is now a view expanding ZipRange
+            tables = {'Service_Area': "SELECT SA, CTRY FROM Service_Area",
+                      'Facility': "SELECT FAC, SA FROM Facility",
+                      'Route': "SELECT Rt, FAC FROM Route",
+                      'ZipCode': "SELECT Zip, Rt FROM ZipCode"}
             with pd.ExcelWriter(export_path, engine='openpyxl') as writer:
-                for table in tables:
+                for table, query in tables.items():
                     try:
-                        df = pd.read_sql_query(f"SELECT * FROM {table}", conn)
+                        df = pd.read_sql_query(query, conn)
                         df.to_excel(writer, sheet_name=table, index=False)
                     except Exception:
                         pass  # Table might not exist
 
              # Add joined sheet
                 try:
-                    join_query = """
-                    SELECT
-                        sa.CTRY AS Country,
-                        sa.SA AS ServiceArea,
-                        f.FAC AS Facility,
-                        r.Rt AS Route,
-                        z.Zip AS ZipCode
-                    FROM Service_Area sa
-                    INNER JOIN Facility f ON sa.SA = f.SA
-                    INNER JOIN Route r ON f.FAC = r.FAC
-                    INNER JOIN ZipCode z ON r.Rt = z.Rt
-                    """
-                    joined_df = pd.read_sql_query(join_query, conn)
+                    # ZipRange ranges are expanded to one row per zip code
+                    joined_df = pd.DataFrame(iter_joined_zips(conn.cursor()),
+                                             columns=['Country', 'ServiceArea', 'Facility', 'Route', 'ZipCode'])
                     joined_df.to_excel(writer, sheet_name="JoinedData", index=False)
                 except Exception as e:
                     self.log_message(f"❌ Failed to export joined data: {str(e)}")
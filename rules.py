@@ -0,0 +1,98 @@
+import re
+
+ROW_SELECTOR = "tr[role='row'][mat-row]"
+ROW_CHECKBOX = "label.checkbox-container"
+
+# Header texts, every row's cell texts and the paginator label of the postal code rules table, in one call
+RULES_SCRIPT = """
+([rowSelector]) => {
+    const text = cell => cell.textContent.trim();
+    const headers = [...document.querySelectorAll("th[role='columnheader']")].map(text);
+    const rows = [...document.querySelectorAll(rowSelector)].map(row => [...row.querySelectorAll("td")].map(text));
+    const range = document.querySelector(".mat-mdc-paginator-range-label, .mat-paginator-range-label");
+    return {headers: headers, rows: rows, range: range ? text(range) : null};
+}
+"""
+
+# Ticks the checkbox of each [index, route] row, but only once every one of those rows still shows its route;
+# false, with nothing ticked, if the table changed since RULES_SCRIPT read it
+TICK_SCRIPT = """
+(rows, [ticks, checkbox]) => {
+    const text = cell => cell.textContent.trim();
+    const headers = [...document.querySelectorAll("th[role='columnheader']")].map(text);
+    const column = headers.findIndex(header => header.toLowerCase().includes("route"));
+    const shows = (row, route) => {
+        const cells = [...row.querySelectorAll("td")].map(text);
+        return column >= 0 && column < cells.length ? cells[column] === route : cells.includes(route);
+    };
+    if (!ticks.every(([index, route]) => rows[index] && shows(rows[index], route))) {
+        return false;
+    }
+    for (const [index] of ticks) {
+        rows[index].querySelector(checkbox).click();
+    }
+    return true;
+}
+"""
+
+ZIP_PATTERN = re.compile(r"\b\d{5}\b")
+
+
+def _column(headers, *names):
+    for i, header in enumerate(headers):
+        if any(name in header.lower() for name in names):
+            return i
+    return None
+
+
+def parse_rules(table, routes):
+    """Rules shown in the table as ({route: set of zips}, route of each row), or None if it can't be trusted
+
+    table is what RULES_SCRIPT returned; routes are the facility's route names, used to find the route of
+    a row when the table has no Route column. None means a row without a known route or zips, or a
+    paginated table showing only some of its rows; the caller falls back to replacing every rule.
+    """
+    headers, rows = table["headers"], table["rows"]
+    if table["range"]:
+        numbers = re.findall(r"\d+", table["range"])
+        if numbers and int(numbers[-1]) > len(rows):
+            return None
+    route_column = _column(headers, "route")
+    zip_column = _column(headers, "postal", "zip")
+
+    rules = {}
+    row_routes = []
+    for cells in rows:
+        if route_column is not None and route_column < len(cells):
+            route = cells[route_column]
+        else:
+            route = next((cell for cell in cells if cell in routes), None)
+        if not route:
+            return None
+        if zip_column is not None and zip_column < len(cells):
+            zips = ZIP_PATTERN.findall(cells[zip_column])
+        else:
+            zips = [code for cell in cells if cell != route for code in ZIP_PATTERN.findall(cell)]
+        if not zips:
+            return None
+        rules.setdefault(route, set()).update(zips)
+        row_routes.append(route)
+    return rules, row_routes
+
+
+def rows_to_tick(row_routes, routes):
+    """[index, route] of every table row whose route is in routes, as TICK_SCRIPT takes them"""
+    return [[i, route] for i, route in enumerate(row_routes) if route in routes]
+
+
+def diff_rules(current, desired):
+    """(routes to delete, routes to add, routes already in sync) for a facility
+
+    desired maps route -> zip list from the sync plan. Routes shown but not planned are deleted, as
+    the full replace would; planned routes without zips are neither added nor counted as in sync.
+    """
+    wanted = {route: set(zips) for route, zips in desired.items()}
+    delete = [route for route, zips in current.items() if zips != wanted.get(route)]
+    add = [route for route, zips in wanted.items() if zips and current.get(route) != zips]
+    unchanged = [route for route, zips in wanted.items() if zips and current.get(route) == zips]
+    return delete, add, unchanged
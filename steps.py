@@ -0,0 +1,42 @@
+import inspect
+
+# Page interactions are written once, as generators that yield page calls and get each call's result
+# back from the yield. run_steps drives them against a sync_api page and run_steps_async against an
+# async_api page, so the decisions between the calls are shared by Bot and AsyncBot.
+#
+#     def choose(page, text):
+#         texts = yield lambda: page.locator(OPTION_SELECTOR).evaluate_all(READ_SCRIPT)
+#         ...
+#
+# A call that raises has its exception thrown back in at the yield, so try/except inside the steps
+# works as it would around the call itself; a sub-flow is delegated to with `yield from`.
+
+
+def run_steps(steps):
+    """Run steps against a sync_api page; returns what the generator returns"""
+    result, error = None, None
+    while True:
+        try:
+            step = steps.send(result) if error is None else steps.throw(error)
+        except StopIteration as stop:
+            return stop.value
+        try:
+            result, error = step(), None
+        except Exception as e:
+            result, error = None, e
+
+
+async def run_steps_async(steps):
+    """Run steps against an async_api page, awaiting every call that returns an awaitable"""
+    result, error = None, None
+    while True:
+        try:
+            step = steps.send(result) if error is None else steps.throw(error)
+        except StopIteration as stop:
+            return stop.value
+        try:
+            result, error = step(), None
+            if inspect.isawaitable(result):
+                result = await result
+        except Exception as e:
+            result, error = None, e
@@ -0,0 +1,76 @@
+import os
+import sys
+from contextlib import closing
+
+import pytest
+from openpyxl import Workbook
+
+# the modules live at the top of the repository, next to this folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import A4GDB, DB_NAME, connect, resolve_db  # noqa: E402
+
+
+class Workspace:
+    """KT and ATT drop folders under a temporary directory; loads write A4G.db next to them"""
+
+    def __init__(self, root):
+        self.root = root
+        self.kt = root / "KT"
+        self.att = root / "ATT"
+        self.kt.mkdir()
+        self.att.mkdir()
+        self.events = []
+
+    def kt_workbook(self, name, rows):
+        """A TacticalTours sheet of (route, SA, facility) rows, laid out as bench.py writes it"""
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet('TacticalTours')
+        header = [f"Col{i}" for i in range(12)]
+        header[0], header[9], header[11] = "Route", "SA", "Facility"
+        ws.append(header)
+        for route, sa, facility in rows:
+            row = [None] * 12
+            row[0], row[9], row[11] = route, sa, facility
+            ws.append(row)
+        return self._save(wb, self.kt / name)
+
+    def att_workbook(self, name, rows):
+        """An ATTPostalCode_SP1 sheet of (route, from, to) rows"""
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet('ATTPostalCode_SP1')
+        ws.append(["Route", "From", "To"])
+        for row in rows:
+            ws.append(list(row))
+        return self._save(wb, self.att / name)
+
+    def _save(self, wb, path):
+        existed = path.exists()
+        wb.save(path)
+        if existed:
+            # a rewrite within the same clock tick must still look changed to the manifest
+            stat = os.stat(path)
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        return str(path)
+
+    def loader(self, **options):
+        options.setdefault('cache_bytes', 0)
+        return A4GDB(str(self.att), str(self.kt), progress=self.events.append, **options)
+
+    def load(self, **options):
+        """Run a whole load the way A4GDB.main does and return the loader"""
+        db = self.loader(**options)
+        db.main()
+        db.conn.close()
+        return db
+
+    def rows(self, sql, params=()):
+        """Rows of a query against the published database, sorted"""
+        with closing(connect(resolve_db(DB_NAME))) as conn:
+            return sorted(conn.execute(sql, params).fetchall())
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return Workspace(tmp_path)
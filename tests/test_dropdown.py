@@ -0,0 +1,122 @@
+import asyncio
+
+from dropdown import Dropdown, AsyncDropdown, OPTION_SELECTOR, READ_SCRIPT, CLICK_SCRIPT
+
+
+class FakeOptions:
+    def __init__(self, page):
+        self.page = page
+
+    def evaluate_all(self, script, arg=None):
+        self.page.calls += 1
+        if script == READ_SCRIPT:
+            return list(self.page.options)
+        assert script == CLICK_SCRIPT
+        index, text = arg
+        if index >= len(self.page.options) or self.page.options[index] != text:
+            return False
+        self.page.clicked.append(text)
+        return True
+
+
+class FakeKeyboard:
+    def __init__(self):
+        self.pressed = []
+
+    def press(self, key):
+        self.pressed.append(key)
+
+
+class FakePage:
+    """The part of a Playwright page Dropdown uses; options are the texts the open select shows"""
+
+    def __init__(self, options):
+        self.options = options
+        self.calls = 0
+        self.clicked = []
+        self.keyboard = FakeKeyboard()
+
+    def wait_for_selector(self, selector, timeout=None):
+        pass
+
+    def click(self, selector):
+        pass
+
+    def locator(self, selector):
+        assert selector == OPTION_SELECTOR
+        return FakeOptions(self)
+
+
+def test_choose_matches_exact_text():
+    page = FakePage(["SJU2", "SJU", ""])
+    assert Dropdown(page, "service-area-select").choose("SJU")
+    assert page.clicked == ["SJU"]
+    # one read and one click
+    assert page.calls == 2
+
+
+def test_cached_index_skips_the_read():
+    page = FakePage(["SJU2", "SJU"])
+    cache = {}
+    assert Dropdown(page, "service-area-select", cache, "PR").choose("SJU")
+    page.calls = 0
+    assert Dropdown(page, "service-area-select", cache, "PR").choose(" SJU ")
+    assert page.calls == 1
+    assert page.clicked == ["SJU", "SJU"]
+
+
+def test_stale_cache_is_read_again():
+    page = FakePage(["SJU2", "SJU"])
+    cache = {}
+    Dropdown(page, "service-area-select", cache).choose("SJU2")
+    page.options = ["SJU", "SJU2"]
+    page.calls = 0
+    assert Dropdown(page, "service-area-select", cache).choose("SJU2")
+    # the cached index now holds another option: a refused click, a read and a click
+    assert page.calls == 3
+    assert page.clicked == ["SJU2", "SJU2"]
+
+
+def test_missing_option_closes_the_select():
+    page = FakePage(["SJU2", "SJU"])
+    dropdown = Dropdown(page, "service-area-select")
+    assert not dropdown.choose("SJ")
+    assert page.keyboard.pressed == ["Escape"]
+    assert dropdown.available == ["SJU2", "SJU"]
+    assert page.clicked == []
+
+
+class AsyncFakePage:
+    """FakePage behind async methods, as an async_api page"""
+
+    def __init__(self, page):
+        self.page = page
+        self.keyboard = self
+
+    async def wait_for_selector(self, selector, timeout=None):
+        self.page.wait_for_selector(selector, timeout)
+
+    async def click(self, selector):
+        self.page.click(selector)
+
+    async def press(self, key):
+        self.page.keyboard.press(key)
+
+    def locator(self, selector):
+        options = self.page.locator(selector)
+
+        class AsyncOptions:
+            async def evaluate_all(self, script, arg=None):
+                return options.evaluate_all(script, arg)
+        return AsyncOptions()
+
+
+def test_async_dropdown_takes_the_same_steps():
+    page = FakePage(["SJU2", "SJU"])
+    cache = {}
+    dropdown = AsyncDropdown(AsyncFakePage(page), "service-area-select", cache)
+    assert asyncio.run(dropdown.choose("SJU"))
+    assert not asyncio.run(dropdown.choose("SJ"))
+    assert page.clicked == ["SJU"]
+    assert page.keyboard.pressed == ["Escape"]
+    assert cache == {("service-area-select", None): {"SJU2": 0, "SJU": 1}}
@@ -0,0 +1,54 @@
+import random
+
+import pytest
+
+import db
+from db import expand_ranges, iter_zip_batches, iter_zips, format_zips
+
+np = pytest.importorskip("numpy")
+
+
+def random_rows(seed, keys=40):
+    rng = random.Random(seed)
+    rows = []
+    for k in range(keys):
+        for _ in range(rng.randint(0, 6)):
+            start = rng.randint(0, 99990)
+            # overlapping, touching, single-zip and inverted ranges
+            rows.append((f"R{k:03d}", start, start + rng.randint(-2, 40)))
+    return rows
+
+
+def loop_batches(rows):
+    grouped = {}
+    for key, start, end in rows:
+        grouped.setdefault(key, []).append((start, end))
+    return [(key, list(iter_zips(ranges))) for key, ranges in grouped.items() if list(iter_zips(ranges))]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_vectorised_batches_match_the_loop(seed):
+    rows = random_rows(seed)
+    expected = loop_batches(rows)
+    assert list(iter_zip_batches(rows)) == expected
+    # cut into many passes; a key is never split between two of them
+    assert list(iter_zip_batches(rows, max_codes=50)) == expected
+
+
+def test_without_numpy(monkeypatch):
+    rows = random_rows(7)
+    monkeypatch.setattr(db, 'np', None)
+    assert [(key, zips) for key, zips in iter_zip_batches(rows) if zips] == loop_batches(rows)
+
+
+def test_expand_ranges():
+    keys, index, codes = expand_ranges([("B", 5, 7), ("A", 1, 2), ("B", 6, 9), ("A", 3, 1)])
+    assert keys == ["B", "A"]
+    assert index.tolist() == [0, 0, 0, 0, 0, 1, 1]
+    assert codes.tolist() == [5, 6, 7, 8, 9, 1, 2]
+    keys, index, codes = expand_ranges([])
+    assert keys == [] and codes.size == 0
+
+
+def test_format_zips():
+    assert format_zips(np.array([1, 501, 99999, 123456])).tolist() == ["00001", "00501", "99999", "123456"]
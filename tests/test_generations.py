@@ -0,0 +1,49 @@
+import os
+import sqlite3
+from contextlib import closing
+
+from db import DB_NAME, generations, resolve_db, connect
+
+
+def names(found):
+    return [os.path.basename(file) for _, file in found]
+
+
+def test_publish_swaps_generations_and_prunes(workspace):
+    workspace.kt_workbook("a.xlsx", [("R1", "SA1", "F1")])
+    workspace.att_workbook("x.xlsx", [("R1", 100, 110)])
+    assert resolve_db(DB_NAME) == DB_NAME
+
+    workspace.load()
+    assert os.path.basename(resolve_db(DB_NAME)) == "A4G.1.db"
+
+    # a reader of the published generation keeps its view while the next load builds another
+    with closing(connect(DB_NAME)) as reader:
+        workspace.att_workbook("x.xlsx", [("R1", 100, 120)])
+        workspace.load()
+        assert reader.execute("SELECT End FROM ZipRange").fetchall() == [(110,)]
+    assert os.path.basename(resolve_db(DB_NAME)) == "A4G.2.db"
+    assert workspace.rows("SELECT End FROM ZipRange") == [(120,)]
+
+    # only the published generation and the one it replaced are kept
+    workspace.load()
+    assert os.path.basename(resolve_db(DB_NAME)) == "A4G.3.db"
+    assert names(generations(DB_NAME)) == ["A4G.2.db", "A4G.3.db"]
+
+
+def test_unpublished_build_is_never_read(workspace):
+    workspace.kt_workbook("a.xlsx", [("R1", "SA1", "F1")])
+    workspace.att_workbook("x.xlsx", [("R1", 100, 110)])
+    workspace.load()
+    published = resolve_db(DB_NAME)
+
+    db = workspace.loader()
+    with db.bulk_load():
+        db.kt_files()
+        db.att_files()
+    db.conn.close()
+    # the finished but unpublished generation exists next to the published one, which readers still get
+    assert resolve_db(DB_NAME) == published
+    assert os.path.exists("A4G.2.db")
+    with closing(sqlite3.connect(published)) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM Route").fetchone() == (1,)
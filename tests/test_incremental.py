@@ -0,0 +1,60 @@
+import os
+
+from db import DB_NAME, building_generation, resolve_db
+
+ROUTES = "SELECT Rt, FAC, Src FROM Route"
+RANGES = "SELECT Rt, Start, End, Src FROM ZipRange"
+SOURCES = "SELECT Src FROM Source_File"
+
+
+def fill(workspace):
+    workspace.kt_workbook("a.xlsx", [("R1", "SA1", "F1"), ("R2", "SA1", "F1")])
+    workspace.kt_workbook("b.xlsx", [("R3", "SA2", "F2")])
+    workspace.att_workbook("x.xlsx", [("R1", 100, 110), ("R2", 200, 200)])
+    workspace.att_workbook("y.xlsx", [("R3", 300, 305), ("R1", 111, 120)])
+
+
+def test_unchanged_workbooks_are_skipped(workspace):
+    fill(workspace)
+    workspace.load()
+    db = workspace.load(incremental=True)
+    assert db.load_stats == []
+    assert workspace.rows(SOURCES) == [("ATT/x.xlsx",), ("ATT/y.xlsx",), ("KT/a.xlsx",), ("KT/b.xlsx",)]
+
+
+def test_retract_matches_a_fresh_load(workspace):
+    fill(workspace)
+    workspace.load()
+
+    # one workbook changes, one disappears; only their rows are replaced
+    os.remove(os.path.join(workspace.kt, "a.xlsx"))
+    workspace.att_workbook("y.xlsx", [("R3", 300, 301)])
+    db = workspace.load(incremental=True)
+    assert [os.path.basename(stat['file']) for stat in db.load_stats] == ["y.xlsx"]
+    incremental = [workspace.rows(sql) for sql in (ROUTES, RANGES, SOURCES)]
+    assert incremental[0] == [("R3", "F2", "KT/b.xlsx")]
+    assert incremental[1] == [("R1", 100, 110, "ATT/x.xlsx"), ("R2", 200, 200, "ATT/x.xlsx"),
+                              ("R3", 300, 301, "ATT/y.xlsx")]
+    assert workspace.rows("SELECT FAC FROM Facility") == [("F2",)]
+
+    workspace.load()
+    assert [workspace.rows(sql) for sql in (ROUTES, RANGES, SOURCES)] == incremental
+
+
+def test_noop_reload_keeps_the_published_generation(workspace):
+    fill(workspace)
+    workspace.load()
+    workspace.att_workbook("y.xlsx", [("R3", 300, 301), ("R1", 111, 120)])
+    workspace.load(incremental=True)
+    published = resolve_db(DB_NAME)
+    changes = workspace.rows("SELECT Rt, Status FROM Route_Change")
+    assert changes == [("R3", "changed")]
+
+    db = workspace.load(incremental=True)
+    assert not db.changed
+    assert resolve_db(DB_NAME) == published
+    # the last real change set is still the one shown
+    assert workspace.rows("SELECT Rt, Status FROM Route_Change") == changes
+    # no half-built generation is left for the next load to resume
+    assert not os.path.exists(building_generation())
+    assert not workspace.loader(incremental=True).resumed
@@ -0,0 +1,20 @@
+from contextlib import closing
+
+import pytest
+
+from db import DB_NAME, HOT_QUERIES, check_query_plans, connect
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_hot_queries_use_indexes(workspace, compact):
+    workspace.kt_workbook("a.xlsx", [("R1", "SA1", "F1"), ("R2", "SA2", "F2")])
+    workspace.att_workbook("x.xlsx", [("R1", 100, 110), ("R2", 200, 205)])
+    workspace.load(compact=compact)
+
+    with closing(connect(DB_NAME)) as conn:
+        plans = check_query_plans(conn.cursor())
+    assert set(plans) == set(HOT_QUERIES)
+    # listing every country or route walks a covering index; only a bare table scan is a miss
+    for name, details in plans.items():
+        assert details, name
+        assert not [d for d in details if d.startswith('SCAN') and 'INDEX' not in d], (name, details)
@@ -0,0 +1,18 @@
+from db import merge_ranges, subtract_ranges, iter_zips
+
+
+def test_merge_ranges():
+    assert merge_ranges([(10, 20), (1, 3), (4, 5), (15, 25), (30, 30)]) == [(1, 5), (10, 25), (30, 30)]
+    assert merge_ranges([]) == []
+
+
+def test_subtract_ranges():
+    assert subtract_ranges([(1, 10)], [(3, 4), (8, 12)]) == [(1, 2), (5, 7)]
+    assert subtract_ranges([(1, 10), (20, 30)], [(5, 25)]) == [(1, 4), (26, 30)]
+    assert subtract_ranges([(1, 10)], [(1, 10)]) == []
+    assert subtract_ranges([(1, 10)], []) == [(1, 10)]
+    assert subtract_ranges([(5, 6)], [(1, 2), (9, 9)]) == [(5, 6)]
+
+
+def test_iter_zips():
+    assert list(iter_zips([(502, 503), (501, 502), (99999, 99999)])) == ["00501", "00502", "00503", "99999"]
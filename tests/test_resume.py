@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+from db import A4GDB, DB_NAME, LoadCancelled, building_generation
+
+TABLES = ("SELECT Rt, FAC, Src FROM Route", "SELECT Rt, Start, End, Src FROM ZipRange", "SELECT Src FROM Source_File")
+
+
+def fill(workspace):
+    workspace.kt_workbook("a.xlsx", [("R1", "SA1", "F1"), ("R2", "SA1", "F1")])
+    workspace.kt_workbook("b.xlsx", [("R3", "SA2", "F2")])
+    workspace.att_workbook("x.xlsx", [("R1", 100, 110), ("R2", 200, 200)])
+    workspace.att_workbook("y.xlsx", [("R3", 300, 305)])
+
+
+def cancel_after_first_file(workspace, **options):
+    """Start a load and cancel it from the progress sink once the first workbook is in"""
+    def progress(event):
+        workspace.events.append(event)
+        if event['type'] == 'file_done':
+            db.cancel()
+    db = A4GDB(str(workspace.att), str(workspace.kt), progress=progress, cache_bytes=0, **options)
+    with pytest.raises(LoadCancelled):
+        db.main()
+    db.conn.close()
+    return db
+
+
+@pytest.mark.parametrize("in_memory", [False, True])
+def test_cancelled_load_resumes(workspace, in_memory):
+    fill(workspace)
+    cancel_after_first_file(workspace, in_memory=in_memory)
+    # nothing was published, the half-built generation is kept for the next run
+    assert not os.path.exists(DB_NAME + ".current")
+    assert os.path.exists(building_generation())
+
+    db = workspace.load(in_memory=in_memory)
+    assert db.resumed
+    # the workbook finished before the cancel is not parsed again
+    assert len(db.load_stats) == 3
+    resumed = [workspace.rows(sql) for sql in TABLES]
+
+    workspace.load()
+    assert [workspace.rows(sql) for sql in TABLES] == resumed
+
+
+def test_damaged_building_file_starts_over(workspace):
+    fill(workspace)
+    cancel_after_first_file(workspace)
+    with open(building_generation(), "r+b") as f:
+        f.seek(100)
+        f.write(b"\xff" * 4096)
+
+    db = workspace.load()
+    assert not db.resumed
+    assert len(db.load_stats) == 4
+    assert workspace.rows("SELECT Rt FROM Route") == [("R1",), ("R2",), ("R3",)]
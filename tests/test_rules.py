@@ -0,0 +1,56 @@
+from rules import parse_rules, rows_to_tick, diff_rules
+
+HEADERS = ["", "Route", "Cycle", "Postal Codes"]
+
+
+def table(rows, headers=HEADERS, range_label=None):
+    return {"headers": headers, "rows": rows, "range": range_label}
+
+
+def test_parse_rules_by_column():
+    rows = [["", "R1", "A, B", "00501 00502"], ["", "R2", "A", "10001"], ["", "OLD", "A", "99999"]]
+    rules, row_routes = parse_rules(table(rows, range_label="1 – 3 of 3"), {"R1", "R2"})
+    assert rules == {"R1": {"00501", "00502"}, "R2": {"10001"}, "OLD": {"99999"}}
+    assert row_routes == ["R1", "R2", "OLD"]
+
+
+def test_parse_rules_merges_rows_of_one_route():
+    rows = [["", "R1", "A", "00501"], ["", "R1", "B", "00502"]]
+    rules, row_routes = parse_rules(table(rows), {"R1"})
+    assert rules == {"R1": {"00501", "00502"}}
+    assert row_routes == ["R1", "R1"]
+
+
+def test_parse_rules_without_headers_finds_known_routes():
+    rules, row_routes = parse_rules(table([["x", "R1", "00501, 00502"]], headers=[]), {"R1"})
+    assert rules == {"R1": {"00501", "00502"}}
+    assert row_routes == ["R1"]
+
+
+def test_parse_rules_distrusts_partial_tables():
+    rows = [["", "R1", "A", "00501"]]
+    assert parse_rules(table(rows, range_label="1 – 1 of 40"), {"R1"}) is None
+    # a row without a route or without zips can't be diffed either
+    assert parse_rules(table([["", "", "A", "00501"]]), {"R1"}) is None
+    assert parse_rules(table([["", "R1", "A", ""]]), {"R1"}) is None
+    assert parse_rules(table([["x", "00501"]], headers=[]), {"R1"}) is None
+
+
+def test_diff_rules():
+    current = {"R1": {"00501", "00502"}, "R2": {"10001"}, "OLD": {"99999"}}
+    desired = {"R1": ["00502", "00501"], "R2": ["10001", "10002"], "R3": ["20000"], "R4": []}
+    delete, add, unchanged = diff_rules(current, desired)
+    assert delete == ["R2", "OLD"]
+    assert add == ["R2", "R3"]
+    assert unchanged == ["R1"]
+
+
+def test_diff_rules_in_sync():
+    assert diff_rules({"R1": {"00501"}}, {"R1": ["00501"]}) == ([], [], ["R1"])
+    assert diff_rules({}, {}) == ([], [], [])
+
+
+def test_rows_to_tick_keeps_row_indexes():
+    row_routes = ["R1", "OLD", "R1", "R2"]
+    assert rows_to_tick(row_routes, {"R1", "OLD"}) == [[0, "R1"], [1, "OLD"], [2, "R1"]]
+    assert rows_to_tick(row_routes, set()) == []
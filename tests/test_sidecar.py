@@ -0,0 +1,75 @@
+import io
+import os
+import pickle
+
+import db
+from db import (CACHE_MAGIC, file_hash, sidecar_path, parse_cached, parse_packed, unpack_chunks,
+                write_chunk, read_chunk)
+
+KT_ROWS = [(f"R{i}", "SA1", f"F{i % 3}") for i in range(120)] + [("Rü", "SÅ", "F")]
+
+
+def consume(kind, file, **options):
+    batch = parse_cached(kind, file, **options)
+    data = list(batch['data'])
+    return batch, data
+
+
+def test_chunk_round_trip():
+    for kind, rows in (('KT', [("R1", "", "Fé")]), ('ATT', [("R1", -5, 10 ** 12), ("R2", 0, 1)])):
+        f = io.BytesIO()
+        write_chunk(f, kind, rows)
+        write_chunk(f, kind, [])
+        f.seek(0)
+        assert read_chunk(f, kind) == rows
+        assert read_chunk(f, kind) is None
+
+
+def test_sidecar_hit(workspace):
+    file = workspace.kt_workbook("a.xlsx", KT_ROWS)
+    batch, data = consume('KT', file)
+    assert 'cached' not in batch
+    assert os.path.exists(sidecar_path(file, 'KT', file_hash(file)))
+
+    cached, cached_data = consume('KT', file)
+    assert cached['cached'] and cached_data == data == KT_ROWS
+    assert cached['rows'] == batch['rows'] == len(KT_ROWS)
+    # reparse ignores the sidecar
+    assert 'cached' not in consume('KT', file, reparse=True)[0]
+
+
+def test_damaged_sidecar_falls_back_to_the_workbook(workspace, monkeypatch):
+    monkeypatch.setattr(db, 'CHUNK_ROWS', 100)
+    file = workspace.att_workbook("x.xlsx", [(f"R{i}", i, i + 5) for i in range(700)])
+    _, data = consume('ATT', file)
+    path = sidecar_path(file, 'ATT', file_hash(file))
+
+    # damaged after the first chunk: its rows are passed on once, the rest come from the workbook
+    size = os.path.getsize(path)
+    with open(path, 'r+b') as f:
+        f.truncate(size - 1000)
+    batch, fallback = consume('ATT', file)
+    assert fallback == data
+    assert not batch['cached'] and batch['rows'] == 700
+    # and the sidecar was written again
+    assert consume('ATT', file)[0]['cached']
+
+
+def test_foreign_sidecars_are_misses(workspace):
+    file = workspace.kt_workbook("a.xlsx", KT_ROWS)
+    path = sidecar_path(file, 'KT', file_hash(file))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # an old pickled sidecar, or anything else behind the magic, is never unpickled
+    for content in (CACHE_MAGIC + pickle.dumps(("x", "KT", 1, ())), b"A4GC1" + b"\x00" * 64, b""):
+        with open(path, 'wb') as f:
+            f.write(content)
+        batch, data = consume('KT', file)
+        assert 'cached' not in batch and data == KT_ROWS
+
+
+def test_packed_batches(workspace):
+    file = workspace.kt_workbook("a.xlsx", KT_ROWS)
+    batch = parse_packed('KT', file, cache_bytes=0)
+    assert all(isinstance(chunk, bytes) for chunk in batch['data'])
+    assert list(unpack_chunks('KT', batch['data'])) == KT_ROWS
+    assert batch['rows'] == len(KT_ROWS)
@@ -0,0 +1,53 @@
+from db import KTStaging
+
+
+def staged(rows, country_of=None):
+    staging = KTStaging(country_of or {})
+    for row in rows:
+        staging.add(*row)
+    return staging
+
+
+def test_rows_are_deduplicated():
+    staging = staged([("KT/a", "R1", "SA1", "F1"), ("KT/a", "R1", "SA1", "F1"), ("KT/a", "R2", "SA1", "F1")])
+    rows = staging.drain()
+    assert rows['Service_Area'] == [("SA1", "US")]
+    assert rows['Facility'] == [("F1", "SA1")]
+    assert rows['Route'] == [("R1", "F1", "KT/a"), ("R2", "F1", "KT/a")]
+    assert staging.conflicts == []
+    assert staging.drain()['Route'] == []
+
+
+def test_facility_under_two_service_areas_is_a_conflict():
+    staging = staged([("KT/a", "R1", "SA1", "F1"), ("KT/b", "R2", "SA2", "F1")])
+    assert staging.conflicts == [{'type': 'facility_sa', 'source': "KT/b", 'facility': "F1",
+                                  'service_area': "SA2", 'existing': "SA1"}]
+    # the first SA keeps the facility; the route is still staged under it
+    rows = staging.drain()
+    assert rows['Facility'] == [("F1", "SA1")]
+    assert rows['Route'] == [("R1", "F1", "KT/a"), ("R2", "F1", "KT/b")]
+
+
+def test_route_under_two_facilities_keeps_both_rows():
+    staging = staged([("KT/a", "R1", "SA1", "F1"), ("KT/b", "R1", "SA1", "F2")])
+    assert staging.conflicts == [{'type': 'route_facility', 'source': "KT/b", 'route': "R1",
+                                  'facility': "F2", 'existing': ["F1"]}]
+    assert staging.drain()['Route'] == [("R1", "F1", "KT/a"), ("R1", "F2", "KT/b")]
+
+
+def test_skipped_and_empty_cells():
+    staging = staged([("KT/a", "R1", "LAX", "F1"), ("KT/a", "R2", "SJU", "None"), ("KT/a", "None", "SA1", "F3")],
+                     {"LAX": None, "SJU": "PR"})
+    rows = staging.drain()
+    assert rows['Service_Area'] == [("SJU", "PR"), ("SA1", "US")]
+    assert rows['Facility'] == [("F3", "SA1")]
+    assert rows['Route'] == [("R2", "None", "KT/a")]
+
+
+def test_conflicts_of_a_load(workspace):
+    workspace.kt_workbook("a.xlsx", [("R1", "SA1", "F1")])
+    workspace.kt_workbook("b.xlsx", [("R1", "SA2", "F2"), ("R2", "SA2", "F1")])
+    workspace.att_workbook("x.xlsx", [("R1", 100, 110)])
+    db = workspace.load()
+    assert sorted(conflict['type'] for conflict in db.conflicts) == ["facility_sa", "route_facility"]
+    assert workspace.rows("SELECT Rt, FAC FROM Route") == [("R1", "F1"), ("R1", "F2"), ("R2", "F1")]
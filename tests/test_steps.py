@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+from steps import run_steps, run_steps_async
+
+
+def flow(calls):
+    """Sums what each call returns; a call that raises is counted as 0"""
+    total = 0
+    for call in calls:
+        try:
+            total += yield call
+        except ValueError:
+            pass
+    return total
+
+
+def fail():
+    raise ValueError("no such element")
+
+
+def test_run_steps_sends_results_and_throws_errors():
+    assert run_steps(flow([lambda: 1, fail, lambda: 2])) == 3
+
+
+def test_unhandled_errors_propagate():
+    def steps():
+        yield lambda: 1 / 0
+
+    with pytest.raises(ZeroDivisionError):
+        run_steps(steps())
+
+
+def test_run_steps_async_awaits_coroutines():
+    async def two():
+        await asyncio.sleep(0)
+        return 2
+
+    async def raises():
+        fail()
+
+    # plain values and coroutines can be mixed, as with an async page's properties and methods
+    assert asyncio.run(run_steps_async(flow([lambda: 1, two, raises]))) == 3
@@ -0,0 +1,51 @@
+from db import SyncPlan
+
+
+def plan():
+    # facility costs grow with their routes and zips, so the shards can be balanced
+    return SyncPlan({
+        "US": {
+            "S1": {"F1": {"R1": [[1, 100]], "R2": [[200, 300]]}, "F2": {"R3": [[400, 400]]}},
+            "S2": {"F3": {"R4": [[500, 2000]]}, "F4": {}},
+            "S3": {},
+        },
+        "PR": {"S4": {"F5": {"R5": [[600, 610]], "R6": [[620, 630]], "R7": [[640, 650]]}}},
+    })
+
+
+def facilities(shards):
+    return [(country, sa, facility) for shard in shards for country, sas in shard.tree.items()
+            for sa, facs in sas.items() for facility in (facs or [None])]
+
+
+def test_shard_covers_every_facility_once():
+    whole = plan()
+    for n in (1, 2, 3, 10):
+        shards = whole.shard(n)
+        assert 1 <= len(shards) <= n
+        assert sorted(facilities(shards), key=str) == sorted(facilities([whole]), key=str)
+        # every shard keeps the plan's country and facility order
+        for shard in shards:
+            assert facilities([shard]) == [key for key in facilities([whole]) if key in facilities([shard])]
+
+
+def test_shard_balances_cost():
+    costs = sorted(shard.summary()['cost'] for shard in plan().shard(2))
+    largest = max(cost for _, cost in plan().units())
+    # LPT: the lighter shard is never more than the largest unit behind
+    assert costs[1] - costs[0] <= largest
+
+
+def test_shard_by_service_area():
+    shards = plan().shard(2, by="service_area")
+    areas = [(country, sa) for shard in shards for country, sas in shard.tree.items() for sa in sas]
+    assert sorted(areas) == sorted([("US", "S1"), ("US", "S2"), ("US", "S3"), ("PR", "S4")])
+    # a service area goes to one shard with all of its facilities
+    for shard in shards:
+        for country, sas in shard.tree.items():
+            for sa, facs in sas.items():
+                assert facs == plan().tree[country][sa]
+
+
+def test_shard_empty_plan():
+    assert SyncPlan({}).shard(4) == []
@@ -0,0 +1,39 @@
+import sqlite3
+
+from db import route_zips, ZipIndex
+
+A = ("R1", "F1", "S1", "US")
+B = ("R2", "F1", "S1", "US")
+C = ("R3", "F2", "S1", "US")
+
+
+def test_route_zips():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE ZipRange (Rt, Start, End, Src)")
+    conn.executemany("INSERT INTO ZipRange VALUES (?, ?, ?, ?)",
+                     [("R1", 501, 503, "a"), ("R1", 502, 504, "b"), ("R1", 10001, 10001, "a"), ("R2", 7, 7, "a")])
+    assert list(route_zips(conn.cursor(), "R1")) == ["00501", "00502", "00503", "00504", "10001"]
+    assert list(route_zips(conn.cursor(), "R3")) == []
+
+
+def test_zip_index_lookup():
+    index = ZipIndex([(100, 199, A), (150, 249, B), (300, 300, C), (500, 400, C)])
+    assert index.lookup(99) == ()
+    assert index.lookup("00100") == (A,)
+    assert index.lookup(175) == (A, B)
+    assert index.lookup(249) == (B,)
+    assert index.lookup(250) == ()
+    assert index.lookup(300) == (C,)
+    # an inverted range covers nothing
+    assert index.lookup(450) == ()
+
+
+def test_zip_index_overlaps():
+    index = ZipIndex([(100, 199, A), (150, 249, B), (180, 260, C), (400, 410, A), (405, 409, A)])
+    overlaps = [(o['start'], o['end'], o['routes'], o['conflict']) for o in index.overlaps()]
+    # a route overlapping itself is not reported; routes of different facilities are a conflict
+    assert overlaps == [
+        (150, 179, ["R1", "R2"], False),
+        (180, 199, ["R1", "R2", "R3"], True),
+        (200, 249, ["R2", "R3"], True),
+    ]
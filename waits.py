@@ -0,0 +1,135 @@
+import time
+
+from steps import run_steps, run_steps_async
+# the async API raises the same class
+from playwright.sync_api import TimeoutError as PlaywrightTimeout
+
+# A wait slower than this is reported as it happens; every wait is counted in Waiter.stats
+SLOW_WAIT = 0.5
+
+# Resolves once nothing under the element has changed for `quiet` ms; false if it is still changing
+# after `timeout` ms. Replaces sleeping a fixed time "for the element to settle".
+STABLE_SCRIPT = """
+(element, [quiet, timeout]) => new Promise(resolve => {
+    let timer = null;
+    let limit = null;
+    const observer = new MutationObserver(() => {
+        clearTimeout(timer);
+        timer = setTimeout(() => done(true), quiet);
+    });
+    const done = settled => {
+        observer.disconnect();
+        clearTimeout(timer);
+        clearTimeout(limit);
+        resolve(settled);
+    };
+    observer.observe(element, {childList: true, subtree: true, attributes: true, characterData: true});
+    timer = setTimeout(() => done(true), quiet);
+    limit = setTimeout(() => done(false), timeout);
+})
+"""
+
+TITLE_SCRIPT = "title => document.title === title"
+
+# True once at most `count` elements match the selector, e.g. the table rows left after a delete
+ROWS_SCRIPT = "([selector, count]) => document.querySelectorAll(selector).length <= count"
+
+
+def is_save(response):
+    """A response to a request that changes data: an XHR or fetch other than GET"""
+    request = response.request
+    return request.method != "GET" and request.resource_type in ("xhr", "fetch")
+
+
+class Waiter:
+    """Waits on page readiness signals instead of fixed sleeps, timing every one
+
+    Each wait returns True as soon as its condition holds and False on timeout, and is recorded under
+    its name in stats as (count, total seconds, slowest seconds, timeouts). log(name, seconds, ok) is
+    called after every wait. Errors other than Playwright's TimeoutError, such as a closed page or a
+    failing page script, are raised to the caller.
+    """
+
+    def __init__(self, page, log=None):
+        self.page = page
+        self.log = log
+        self.stats = {}
+
+    def _done(self, name, start, ok):
+        seconds = time.perf_counter() - start
+        count, total, slowest, failed = self.stats.get(name, (0, 0.0, 0.0, 0))
+        self.stats[name] = (count + 1, total + seconds, max(slowest, seconds), failed + (not ok))
+        if self.log:
+            self.log(name, seconds, ok)
+        return ok
+
+    # runs the timed wait against a sync_api page; AsyncWaiter awaits the same steps on an async_api page
+    run = staticmethod(run_steps)
+
+    def _wait(self, name, wait, *args, **kwargs):
+        return self.run(self._timed(name, lambda: wait(*args, **kwargs)))
+
+    def _timed(self, name, step):
+        start = time.perf_counter()
+        try:
+            ok = (yield step) is not False
+        except PlaywrightTimeout:
+            ok = False
+        return self._done(name, start, ok)
+
+    def condition(self, name, script, arg=None, timeout=10000):
+        """Until a page function of arg returns something truthy"""
+        return self._wait(name, self.page.wait_for_function, script, arg=arg, timeout=timeout)
+
+    def title(self, expected, timeout=15000):
+        return self.condition(f"title '{expected}'", TITLE_SCRIPT, expected, timeout)
+
+    def visible(self, selector, timeout=10000):
+        return self._wait(f"visible {selector}", self.page.wait_for_selector, selector, state="visible", timeout=timeout)
+
+    def hidden(self, selector, timeout=10000):
+        return self._wait(f"hidden {selector}", self.page.wait_for_selector, selector, state="hidden", timeout=timeout)
+
+    def stable(self, selector, quiet=50, timeout=5000):
+        """Until the element exists and its subtree has stopped mutating for `quiet` ms"""
+        return self._wait(f"stable {selector}", self.page.locator(selector).first.evaluate,
+                          STABLE_SCRIPT, [quiet, timeout], timeout=timeout)
+
+    def rows(self, selector, count, timeout=10000):
+        """Until at most count elements match selector"""
+        return self.condition(f"rows {selector}", ROWS_SCRIPT, [selector, count], timeout)
+
+    def saved(self, action, timeout=10000):
+        """Run action and wait for the data-changing request it sends to be answered successfully
+
+        The dashboard is a single-page app that keeps connections open, so "network idle" holds right
+        away and says nothing about the save; the response to the save request does.
+        """
+        return self._wait("save response", self._saved, action, timeout)
+
+    def _saved(self, action, timeout):
+        with self.page.expect_response(is_save, timeout=timeout) as response:
+            action()
+        return response.value.ok
+
+    def report(self):
+        """One line per wait name, slowest total first"""
+        lines = []
+        for name, (count, total, slowest, failed) in sorted(self.stats.items(), key=lambda item: -item[1][1]):
+            line = f"{name}: {count} waits, {total:.2f}s total, {total / count * 1000:.0f} ms avg, {slowest * 1000:.0f} ms max"
+            if failed:
+                line += f", {failed} timed out"
+            lines.append(line)
+        return lines
+
+
+class AsyncWaiter(Waiter):
+    """Waiter for an async_api page; every wait method returns a coroutine"""
+
+    run = staticmethod(run_steps_async)
+
+    async def _saved(self, action, timeout):
+        # the response context manager is the one part with a different shape in the async API
+        async with self.page.expect_response(is_save, timeout=timeout) as response:
+            await action()
+        return (await response.value).ok